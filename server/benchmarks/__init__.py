@@ -0,0 +1,4 @@
+"""
+Offline benchmarks for the photo verification service
+Run from the server directory, e.g. python -m benchmarks.context_resolution
+"""
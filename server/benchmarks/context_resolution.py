@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Accuracy vs latency of the context checks at each analysis resolution
+
+For every image in a synthetic corpus (or a directory of real photos), runs
+the tree planting and pollution feature extraction at full resolution and
+at each downscaled tier, and reports latency and the deviation from the
+full-resolution result.
+
+Usage (from the server directory):
+    python -m benchmarks.context_resolution [--images DIR] [--json OUT]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import Dict, List, Optional, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_context import ImageContext
+from context_verifiers import get_context_verifier, count_tall_shapes
+from benchmarks.corpus import build_corpus, encode_jpeg
+
+DEFAULT_TIERS = [None, 2048, 1536, 1024, 768, 512, 256]
+DEFAULT_SIZES = [(1280, 960), (2016, 1512), (4032, 3024)]
+REPEATS = 3
+
+
+def load_images(directory: Optional[str]) -> List[tuple]:
+    """(name, encoded bytes) for the corpus"""
+    if directory:
+        names = sorted(
+            name for name in os.listdir(directory)
+            if name.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+        images = []
+        for name in names:
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append((name, f.read()))
+        return images
+    return [(image.name, encode_jpeg(image.bgr)) for image in build_corpus(DEFAULT_SIZES)]
+
+
+TREE_PLANTING = get_context_verifier("tree_planting")
+POLLUTION = get_context_verifier("pollution_report")
+
+
+def extract_features(view) -> Dict[str, float]:
+    """The quantities the tree planting and pollution verifiers judge on"""
+    trees = TREE_PLANTING.classify(view)
+    pollution = POLLUTION.classify(view)
+    return {
+        "green_percentage": trees.percentage("green", "dark_green"),
+        "brown_percentage": trees.percentage("brown"),
+        "blue_percentage": trees.percentage("blue"),
+        "tree_like_objects": count_tall_shapes(trees.mask("green", "dark_green"), trees.scale),
+        "dark_percentage": pollution.percentage("dark"),
+    }
+
+
+def measure(data: bytes, tier: Optional[int]) -> Dict[str, Any]:
+    """Best-of-N latency of building the tier and extracting both feature sets"""
+    timings = []
+    features = {}
+    for _ in range(REPEATS):
+        ctx = ImageContext.from_bytes(data)
+        ctx.bgr  # decode outside the timed region; every tier shares this cost
+        start = time.perf_counter()
+        features = extract_features(ctx.view(tier))
+        timings.append(time.perf_counter() - start)
+        ctx.close()
+    return {"latency_ms": min(timings) * 1000, "features": features}
+
+
+def verdicts(features: Dict[str, float]) -> tuple:
+    """The decisions the context verifiers make from the features"""
+    green = features["green_percentage"]
+    trees = features["tree_like_objects"]
+    return (
+        0 if green < 3 else (1 if green < 8 else 2),
+        features["blue_percentage"] > 20,
+        0 if trees == 0 else (1 if trees < 2 else 2),
+        features["dark_percentage"] < 10,
+    )
+
+
+def run(images: List[tuple], tiers: List[Optional[int]]) -> Dict[str, Any]:
+    per_tier = {str(tier): [] for tier in tiers}
+
+    for name, data in images:
+        reference = measure(data, None)
+        for tier in tiers:
+            result = reference if tier is None else measure(data, tier)
+            ref, got = reference["features"], result["features"]
+            per_tier[str(tier)].append({
+                "image": name,
+                "latency_ms": result["latency_ms"],
+                "green_error": abs(got["green_percentage"] - ref["green_percentage"]),
+                "blue_error": abs(got["blue_percentage"] - ref["blue_percentage"]),
+                "brown_error": abs(got["brown_percentage"] - ref["brown_percentage"]),
+                "dark_error": abs(got["dark_percentage"] - ref["dark_percentage"]),
+                "tree_count_delta": got["tree_like_objects"] - ref["tree_like_objects"],
+                "verdict_agrees": verdicts(got) == verdicts(ref),
+            })
+
+    summary = {}
+    for tier, rows in per_tier.items():
+        summary[tier] = {
+            "median_latency_ms": statistics.median(r["latency_ms"] for r in rows),
+            "max_color_error_pct": max(
+                max(r["green_error"], r["blue_error"], r["brown_error"], r["dark_error"]) for r in rows
+            ),
+            "mean_abs_tree_count_delta": statistics.mean(abs(r["tree_count_delta"]) for r in rows),
+            "verdict_agreement": sum(r["verdict_agrees"] for r in rows) / len(rows),
+        }
+    return {"summary": summary, "images": per_tier}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of JPEG/PNG photos (default: synthetic corpus)")
+    parser.add_argument("--tiers", help="Comma-separated long-edge sizes, 'full' for full resolution")
+    parser.add_argument("--json", help="Write the full results to this file")
+    args = parser.parse_args()
+
+    tiers = DEFAULT_TIERS
+    if args.tiers:
+        tiers = [None if t == "full" else int(t) for t in args.tiers.split(",")]
+        if None not in tiers:
+            tiers.insert(0, None)
+
+    images = load_images(args.images)
+    results = run(images, tiers)
+
+    print(f"{len(images)} images")
+    print(f"{'tier':>6} {'median ms':>10} {'max color err %':>16} {'tree count d':>13} {'verdict agree':>14}")
+    for tier, row in results["summary"].items():
+        label = "full" if tier == "None" else tier
+        print(f"{label:>6} {row['median_latency_ms']:>10.2f} {row['max_color_error_pct']:>16.3f} "
+              f"{row['mean_abs_tree_count_delta']:>13.2f} {row['verdict_agreement']:>14.0%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Synthetic image corpus for benchmarks
+Scenes are generated with NumPy and OpenCV only, so runs are reproducible
+and fully offline
+"""
+
+import io
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import piexif
+from PIL import Image
+
+# Camera position written into the GPS block of generated photos
+DEFAULT_GPS = (40.7128, -74.0060)
+
+
+@dataclass
+class SyntheticImage:
+    """One generated image and how it was made"""
+    name: str
+    kind: str
+    bgr: np.ndarray
+
+    @property
+    def megapixels(self) -> float:
+        return self.bgr.shape[0] * self.bgr.shape[1] / 1e6
+
+
+def outdoor_scene(width: int, height: int, rng: np.random.Generator, trees: int = 6) -> np.ndarray:
+    """Sky gradient, brown ground and tall green tree blobs with sensor noise"""
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    horizon = int(height * rng.uniform(0.35, 0.55))
+
+    # Sky: blue fading toward the horizon
+    ramp = np.linspace(0.0, 1.0, horizon, dtype=np.float32)[:, None]
+    sky = np.array([235, 160, 90], dtype=np.float32) * (1 - ramp) + np.array([230, 215, 190], dtype=np.float32) * ramp
+    image[:horizon] = sky[:, None, :].astype(np.uint8)
+
+    # Ground: brown soil
+    image[horizon:] = (40, 80, 130)
+
+    for _ in range(trees):
+        cx = int(rng.uniform(0.05, 0.95) * width)
+        base = int(horizon + rng.uniform(0.05, 0.3) * height)
+        tree_height = int(rng.uniform(0.2, 0.45) * height)
+        axes = (max(2, int(tree_height * rng.uniform(0.15, 0.3))), max(2, tree_height // 2))
+        center = (cx, max(axes[1], base - axes[1]))
+        color = tuple(int(c) for c in (rng.integers(20, 60), rng.integers(110, 180), rng.integers(20, 60)))
+        cv2.ellipse(image, center, axes, 0, 0, 360, color, -1)
+        cv2.line(image, (cx, base - axes[1] // 3), (cx, base), (30, 60, 90), max(1, axes[0] // 5))
+
+    return add_noise(image, 6, rng)
+
+
+def green_scene(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """Dense vegetation filling most of the frame, over a thin strip of sky"""
+    image = outdoor_scene(width, height, rng, trees=0)
+    top = int(height * rng.uniform(0.1, 0.2))
+    image[top:] = (40, 140, 50)
+    for _ in range(24):
+        center = (int(rng.uniform(0, width)), int(rng.uniform(top, height)))
+        axes = (max(2, int(rng.uniform(0.05, 0.15) * width)), max(2, int(rng.uniform(0.1, 0.3) * height)))
+        color = tuple(int(c) for c in (rng.integers(10, 50), rng.integers(90, 200), rng.integers(10, 50)))
+        cv2.ellipse(image, center, axes, 0, 0, 360, color, -1)
+    return add_noise(image, 6, rng)
+
+
+def dark_scene(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """Mostly dark, low-contrast image (smoke, sludge, night shots)"""
+    image = np.full((height, width, 3), 30, dtype=np.uint8)
+    for _ in range(8):
+        center = (int(rng.uniform(0, width)), int(rng.uniform(0, height)))
+        radius = int(rng.uniform(0.05, 0.2) * max(width, height))
+        shade = int(rng.integers(40, 110))
+        cv2.circle(image, center, radius, (shade, shade, shade), -1)
+    return add_noise(image, 8, rng)
+
+
+def add_noise(image: np.ndarray, sigma: float, rng: np.random.Generator, rows: int = 512) -> np.ndarray:
+    """Gaussian sensor noise, added in strips so 48MP frames stay cheap on memory"""
+    for top in range(0, image.shape[0], rows):
+        strip = image[top:top + rows]
+        noise = rng.standard_normal(strip.shape, dtype=np.float32) * sigma
+        strip[...] = np.clip(strip + noise, 0, 255).astype(np.uint8)
+    return image
+
+
+def size_for_megapixels(megapixels: float, aspect: float = 4 / 3) -> Tuple[int, int]:
+    """(width, height) of a frame with this many megapixels"""
+    height = int(round(math.sqrt(megapixels * 1e6 / aspect)))
+    return int(round(height * aspect)), height
+
+
+def build_corpus(sizes: List[Tuple[int, int]], per_size: int = 2, seed: int = 0) -> List[SyntheticImage]:
+    """Outdoor and dark scenes at each (width, height)"""
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for width, height in sizes:
+        for index in range(per_size):
+            corpus.append(SyntheticImage(
+                f"outdoor_{width}x{height}_{index}", "outdoor", outdoor_scene(width, height, rng)
+            ))
+        corpus.append(SyntheticImage(f"dark_{width}x{height}", "dark", dark_scene(width, height, rng)))
+    return corpus
+
+
+def encode_jpeg(bgr: np.ndarray, quality: int = 90) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return encoded.tobytes()
+
+
+def encode_png(bgr: np.ndarray, compression: int = 3) -> bytes:
+    ok, encoded = cv2.imencode(".png", bgr, [cv2.IMWRITE_PNG_COMPRESSION, compression])
+    if not ok:
+        raise RuntimeError("PNG encoding failed")
+    return encoded.tobytes()
+
+
+def recompress(bgr: np.ndarray, qualities: Sequence[int] = (92, 80, 70)) -> np.ndarray:
+    """Pixels after a JPEG round trip at each quality in turn, as from re-shared photos"""
+    for quality in qualities:
+        bgr = cv2.imdecode(np.frombuffer(encode_jpeg(bgr, quality), np.uint8), cv2.IMREAD_COLOR)
+    return bgr
+
+
+def _rational(value: float, denominator: int = 10000) -> Tuple[int, int]:
+    return int(round(value * denominator)), denominator
+
+
+def _dms(value: float) -> Tuple[Tuple[int, int], ...]:
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = (value - degrees - minutes / 60) * 3600
+    return (degrees, 1), (minutes, 1), _rational(seconds, 100)
+
+
+def camera_exif(taken_at: datetime, gps: Optional[Tuple[float, float]] = DEFAULT_GPS) -> bytes:
+    """EXIF block of a phone photo: make, model, capture time and GPS position"""
+    stamp = taken_at.strftime("%Y:%m:%d %H:%M:%S").encode()
+    exif = {
+        "0th": {piexif.ImageIFD.Make: b"Civitas", piexif.ImageIFD.Model: b"Bench Cam",
+                piexif.ImageIFD.DateTime: stamp, piexif.ImageIFD.Software: b"benchmarks"},
+        "Exif": {piexif.ExifIFD.DateTimeOriginal: stamp, piexif.ExifIFD.DateTimeDigitized: stamp},
+        "GPS": {},
+    }
+    if gps is not None:
+        lat, lng = gps
+        exif["GPS"] = {
+            piexif.GPSIFD.GPSLatitudeRef: b"N" if lat >= 0 else b"S",
+            piexif.GPSIFD.GPSLatitude: _dms(lat),
+            piexif.GPSIFD.GPSLongitudeRef: b"E" if lng >= 0 else b"W",
+            piexif.GPSIFD.GPSLongitude: _dms(lng),
+        }
+    return piexif.dump(exif)
+
+
+def with_exif(encoded: bytes, exif: bytes, fmt: str) -> bytes:
+    """Attach an EXIF block to an encoded JPEG or PNG without re-encoding JPEGs"""
+    output = io.BytesIO()
+    if fmt == "jpeg":
+        piexif.insert(exif, encoded, output)
+    else:
+        with Image.open(io.BytesIO(encoded)) as image:
+            image.save(output, format="PNG", exif=exif, compress_level=3)
+    return output.getvalue()
+
+
+@dataclass
+class EncodedImage:
+    """One corpus file as it would be uploaded"""
+    name: str
+    kind: str
+    format: str
+    width: int
+    height: int
+    has_exif: bool
+    data: bytes
+
+    @property
+    def megapixels(self) -> float:
+        return self.width * self.height / 1e6
+
+
+# (kind, scene, format, EXIF+GPS, recompressed) for every resolution
+VARIANTS = [
+    ("outdoor", "outdoor", "jpeg", True, False),
+    ("outdoor_no_exif", "outdoor", "jpeg", False, False),
+    ("outdoor_png", "outdoor", "png", True, False),
+    ("green", "green", "jpeg", True, False),
+    ("dark", "dark", "jpeg", False, False),
+    ("recompressed", "outdoor", "jpeg", False, True),
+]
+
+SCENES = {"outdoor": outdoor_scene, "green": green_scene, "dark": dark_scene}
+
+
+def iter_encoded_corpus(megapixels: Sequence[float] = (0.3, 2, 12, 48),
+                        variants: Sequence[tuple] = VARIANTS,
+                        taken_at: Optional[datetime] = None,
+                        seed: int = 0) -> Iterator[EncodedImage]:
+    """
+    Upload-ready files for every variant at every resolution, generated one
+    at a time so only one full frame is in memory
+    """
+    taken_at = taken_at or datetime.now().replace(microsecond=0)
+    for mp in megapixels:
+        width, height = size_for_megapixels(mp)
+        for index, (kind, scene, fmt, has_exif, recompressed) in enumerate(variants):
+            # Seeded per image so any subset of the corpus is reproducible
+            rng = np.random.default_rng([seed, int(mp * 1000), index])
+            bgr = SCENES[scene](width, height, rng)
+            if recompressed:
+                bgr = recompress(bgr)
+            data = encode_jpeg(bgr) if fmt == "jpeg" else encode_png(bgr)
+            del bgr
+            if has_exif:
+                data = with_exif(data, camera_exif(taken_at), fmt)
+            yield EncodedImage(f"{kind}_{mp:g}mp", kind, fmt, width, height, has_exif, data)
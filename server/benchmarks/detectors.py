@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Throughput and failure behaviour of the external detector connectors
+
+Starts detector_stub.py with the given latency, error and hang rates and
+drives a DetectorHub (both providers, result cache off) with concurrent
+uploads, reporting answers per second, latency percentiles, errors,
+hedged requests and where each circuit breaker ended up.
+
+Usage (from the server directory):
+    python -m benchmarks.detectors [--requests 400] [--concurrency 32]
+        [--latency 0.05] [--jitter 0.2] [--error-rate 0.05] [--hang-rate 0.01]
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+import subprocess
+from typing import Any, Dict
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from detectors import DetectorHub, azure_provider, hive_provider
+from benchmarks.pipeline import _free_port
+
+
+async def _wait_for_port(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Detector stub did not come up on port {port}")
+
+
+async def drive(base_url: str, total: int, concurrency: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    hub = DetectorHub(
+        [azure_provider(base_url, "stub", **options),
+         hive_provider(f"{base_url}/api/v2/task/sync", "stub", **options)],
+        {"detector_cache_max_bytes": 0}
+    )
+    rng = random.Random(0)
+    uploads = [b"\xff\xd8\xff" + rng.randbytes(64 * 1024) for _ in range(min(total, 64))]
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with limit:
+            start = time.perf_counter()
+            # Distinct digests, so the hub does not share work between requests
+            results = await hub.detect(uploads[index % len(uploads)], digest=str(index))
+            latencies.append(time.perf_counter() - start)
+            errors += sum(1 for answer in results.values() if "error" in answer)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await hub.aclose()
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "uploads_per_second": total / elapsed,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "provider_errors": errors,
+        "providers": hub.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub base latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Stub extra latency, uniform (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--hang-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=2.0, help="Connector deadline (seconds)")
+    parser.add_argument("--hedge-after", type=float, default=0.2, help="Hedge delay, negative to disable")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Requests in flight per provider")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    port = _free_port()
+    stub = subprocess.Popen(
+        [sys.executable, "detector_stub.py", "--port", str(port),
+         "--latency", str(args.latency), "--jitter", str(args.jitter),
+         "--error-rate", str(args.error_rate), "--hang-rate", str(args.hang_rate)],
+        cwd=SERVER_DIR
+    )
+    try:
+        asyncio.run(_wait_for_port(port, timeout=30))
+        options = {
+            "timeout": args.timeout,
+            "hedge_after": args.hedge_after if args.hedge_after >= 0 else None,
+            "max_concurrency": args.max_concurrency,
+        }
+        results = asyncio.run(drive(f"http://127.0.0.1:{port}", args.requests, args.concurrency, options))
+    finally:
+        stub.terminate()
+        try:
+            stub.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            stub.kill()
+            stub.wait()
+
+    print(f"{results['uploads_per_second']:.1f} uploads/s, p50 {results['p50_ms']:.0f} ms, "
+          f"p95 {results['p95_ms']:.0f} ms, p99 {results['p99_ms']:.0f} ms, "
+          f"{results['provider_errors']} provider errors")
+    for name, stats in results["providers"].items():
+        print(f"  {name}: {stats}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Latency of every verification stage over a synthetic corpus
+
+Generates JPEG and PNG uploads from 0.3 to 48 megapixels (with and without
+EXIF+GPS, green-heavy, dark and recompressed) and times each stage of
+PhotoVerificationService on them, the end-to-end verify_photo and
+verify_photo_bytes calls, and HTTP throughput against a local API server.
+Everything runs offline. Save results with --json and pass an earlier file
+to --compare to see which stages got slower between commits.
+
+Usage (from the server directory):
+    python -m benchmarks.pipeline [--megapixels 0.3,2,12,48] [--repeats N]
+        [--http-requests N] [--json OUT] [--compare BASELINE]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import requests
+
+from image_context import ImageContext
+from perceptual_hash import compute_hashes
+from photo_verification import PhotoVerificationService, TaskRequirements
+from benchmarks.corpus import EncodedImage, iter_encoded_corpus, DEFAULT_GPS
+
+DEFAULT_MEGAPIXELS = [0.3, 2, 12, 48]
+REPEATS = 3
+# Largest upload the API accepts by default (config["max_file_size"])
+HTTP_MAX_BYTES = 10 * 1024 * 1024
+
+
+def _decoded(data: bytes) -> ImageContext:
+    ctx = ImageContext.from_bytes(data)
+    ctx.bgr
+    return ctx
+
+
+def _time_metadata(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    with ImageContext.from_bytes(data) as ctx:
+        start = time.perf_counter()
+        service._extract_exif_metadata(ctx)
+        return time.perf_counter() - start
+
+
+def _time_decode(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    with ImageContext.from_bytes(data) as ctx:
+        start = time.perf_counter()
+        ctx.bgr
+        return time.perf_counter() - start
+
+
+def _time_hashing(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    with _decoded(data) as ctx:
+        pil_image = ctx.pil
+        start = time.perf_counter()
+        compute_hashes(pil_image)
+        return time.perf_counter() - start
+
+
+def _time_grayscale(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    with _decoded(data) as ctx:
+        start = time.perf_counter()
+        ctx.gray
+        return time.perf_counter() - start
+
+
+def _time_ela(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    with _decoded(data) as ctx:
+        gray = ctx.gray
+        start = time.perf_counter()
+        service._calculate_ela_score(gray)
+        return time.perf_counter() - start
+
+
+def _time_noise(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    with _decoded(data) as ctx:
+        gray = ctx.gray
+        start = time.perf_counter()
+        service._calculate_noise_score(gray)
+        return time.perf_counter() - start
+
+
+def _time_context(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    with _decoded(data) as ctx:
+        start = time.perf_counter()
+        service._verify_context(ctx, requirements)
+        return time.perf_counter() - start
+
+
+def _time_verify_bytes(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    start = time.perf_counter()
+    service.verify_photo_bytes(data, requirements, "bench-user", datetime.now())
+    return time.perf_counter() - start
+
+
+def _time_verify_photo(service: PhotoVerificationService, data: bytes, requirements) -> float:
+    with tempfile.NamedTemporaryFile(suffix=".img", delete=False) as f:
+        f.write(data)
+    try:
+        start = time.perf_counter()
+        service.verify_photo(f.name, requirements, "bench-user", datetime.now())
+        return time.perf_counter() - start
+    finally:
+        os.unlink(f.name)
+
+
+# Stage name -> timer. Every timer starts from the encoded upload; what it
+# needs before its own stage (decoding, grayscale) is prepared untimed
+STAGES: Dict[str, Callable[[PhotoVerificationService, bytes, TaskRequirements], float]] = {
+    "metadata": _time_metadata,
+    "decode": _time_decode,
+    "hashing": _time_hashing,
+    "grayscale": _time_grayscale,
+    "ela": _time_ela,
+    "noise": _time_noise,
+    "context_tree_planting": _time_context,
+    "verify_photo_bytes": _time_verify_bytes,
+    "verify_photo": _time_verify_photo,
+}
+
+
+def task_requirements() -> TaskRequirements:
+    """A tree planting task at the corpus GPS position, open around now"""
+    return TaskRequirements(
+        task_type="tree_planting",
+        required_objects=[],
+        location_coordinates=DEFAULT_GPS,
+        location_radius_meters=100,
+        deadline_start=datetime.now() - timedelta(days=1),
+        deadline_end=datetime.now() + timedelta(days=1)
+    )
+
+
+def run_stages(images, stages: List[str], repeats: int,
+               keep: Optional[Callable[[EncodedImage], bool]] = None) -> tuple:
+    """
+    Per-image stage timings, plus the images keep() selects (held in memory
+    for the HTTP run; everything else is dropped as soon as it is timed)
+    """
+    # No result cache or duplicate index, so repeats measure real work
+    service = PhotoVerificationService({"result_cache_max_bytes": 0, "hash_index_path": None})
+    service.warm_up()
+    requirements = task_requirements()
+
+    rows = []
+    kept = []
+    for image in images:
+        row = {
+            "image": image.name,
+            "kind": image.kind,
+            "format": image.format,
+            "megapixels": round(image.megapixels, 2),
+            "has_exif": image.has_exif,
+            "bytes": len(image.data),
+            "stages_ms": {},
+        }
+        for stage in stages:
+            samples = [STAGES[stage](service, image.data, requirements) for _ in range(repeats)]
+            row["stages_ms"][stage] = statistics.median(samples) * 1000
+        rows.append(row)
+        print(f"  {image.name:<28} " + " ".join(f"{s}={ms:.1f}" for s, ms in row["stages_ms"].items()),
+              flush=True)
+        if keep is not None and keep(image):
+            kept.append(image)
+    return rows, kept
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Median milliseconds per stage at each resolution"""
+    summary: Dict[str, Dict[str, float]] = {}
+    for mp in sorted({row["megapixels"] for row in rows}):
+        at_mp = [row for row in rows if row["megapixels"] == mp]
+        for stage in at_mp[0]["stages_ms"]:
+            summary.setdefault(stage, {})[f"{mp:g}mp"] = statistics.median(
+                row["stages_ms"][stage] for row in at_mp
+            )
+    return summary
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_http(images: List[EncodedImage], total: int, concurrency: int, workers: int) -> Dict[str, Any]:
+    """Requests per second and latency of POST /verify-photo on a local server"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as scratch:
+        env = {
+            **os.environ,
+            "HASH_INDEX_PATH": "",
+            "WATERMARK_DIR": os.path.join(scratch, "watermarks"),
+            "VERIFICATION_WORKERS": str(workers),
+            "VERIFICATION_QUEUE_DEPTH": str(max(32, concurrency * 2)),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "photo_verification_api:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=SERVER_DIR, env=env
+        )
+        try:
+            _wait_for(base_url + "/health", timeout=120)
+            form = {
+                "task_type": "tree_planting",
+                "location_lat": str(DEFAULT_GPS[0]),
+                "location_lng": str(DEFAULT_GPS[1]),
+                "deadline_start": (datetime.now() - timedelta(days=1)).isoformat(),
+                "deadline_end": (datetime.now() + timedelta(days=1)).isoformat(),
+                "user_id": "bench-user",
+            }
+
+            def post(index: int) -> tuple:
+                image = images[index % len(images)]
+                content_type = "image/png" if image.format == "png" else "image/jpeg"
+                start = time.perf_counter()
+                response = requests.post(
+                    base_url + "/verify-photo", data=form,
+                    files={"file": (f"{image.name}.{image.format}", image.data, content_type)}
+                )
+                return time.perf_counter() - start, response.status_code
+
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(post, range(concurrency)))  # warm the workers
+                start = time.perf_counter()
+                samples = list(pool.map(post, range(total)))
+                elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    latencies = sorted(seconds for seconds, _ in samples)
+    statuses: Dict[str, int] = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "workers": workers,
+        "images": [image.name for image in images],
+        "requests_per_second": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "statuses": statuses,
+    }
+
+
+def _wait_for(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"API server did not come up at {url}")
+
+
+def environment() -> Dict[str, Any]:
+    """Where and on what the results were measured"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Stage/resolution pairs more than threshold slower than in baseline"""
+    regressions = []
+    for stage, by_mp in current["summary"].items():
+        for mp, ms in by_mp.items():
+            before = baseline.get("summary", {}).get(stage, {}).get(mp)
+            if before and ms > before * (1 + threshold):
+                regressions.append(f"{stage} @ {mp}: {before:.1f} ms -> {ms:.1f} ms (+{ms / before - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", help="Comma-separated resolutions (default: 0.3,2,12,48)")
+    parser.add_argument("--stages", help=f"Comma-separated subset of: {', '.join(STAGES)}")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Runs per stage and image (median kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--http-requests", type=int, default=64, help="Requests for the HTTP run, 0 to skip it")
+    parser.add_argument("--http-concurrency", type=int, default=8)
+    parser.add_argument("--http-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Earlier --json output to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Slowdown reported as a regression")
+    args = parser.parse_args()
+
+    megapixels = [float(mp) for mp in args.megapixels.split(",")] if args.megapixels else DEFAULT_MEGAPIXELS
+    stages = args.stages.split(",") if args.stages else list(STAGES)
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    print(f"Timing {len(stages)} stages at {', '.join(f'{mp:g}' for mp in megapixels)} MP")
+    rows, http_images = run_stages(
+        iter_encoded_corpus(megapixels, seed=args.seed), stages, args.repeats,
+        keep=lambda image: args.http_requests > 0 and len(image.data) <= HTTP_MAX_BYTES
+    )
+    results = {"environment": environment(), "summary": summarize(rows), "images": rows}
+
+    print(f"\n{'stage':>22} " + " ".join(f"{f'{mp:g}mp':>9}" for mp in megapixels) + "   (median ms)")
+    for stage, by_mp in results["summary"].items():
+        print(f"{stage:>22} " + " ".join(f"{by_mp.get(f'{mp:g}mp', float('nan')):>9.1f}" for mp in megapixels))
+
+    if args.http_requests > 0 and http_images:
+        results["http"] = run_http(http_images, args.http_requests, args.http_concurrency, args.http_workers)
+        http = results["http"]
+        print(f"\nHTTP /verify-photo: {http['requests_per_second']:.1f} req/s, p50 {http['p50_ms']:.0f} ms, "
+              f"p95 {http['p95_ms']:.0f} ms, statuses {http['statuses']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        print(f"\n{len(regressions)} regressions over {args.threshold:.0%} against {args.compare}")
+        for line in regressions:
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
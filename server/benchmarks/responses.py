@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Encoding cost of verification responses
+
+Verifies one synthetic photo with EXIF and GPS, then times encoding its
+response body many times over: the full body and the default projection
+(is_valid, score, issues), each with the standard library json (through
+FastAPI's jsonable_encoder, as the API used to), orjson and msgpack where
+installed. Also reports the pickled size of VerificationResult, which is
+what every worker sends back.
+
+Usage (from the server directory):
+    python -m benchmarks.responses [--results 1000] [--repeats 5]
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+import response_encoding
+from response_encoding import DEFAULT_FIELDS, JSON, MSGPACK, encode, project
+from photo_verification import PhotoVerificationService, TaskRequirements
+from benchmarks.corpus import camera_exif, encode_jpeg, outdoor_scene, with_exif, DEFAULT_GPS
+
+
+def sample_body() -> Dict[str, Any]:
+    """Full /verify-photo body for a 2 MP outdoor photo"""
+    rng = np.random.default_rng(0)
+    data = with_exif(encode_jpeg(outdoor_scene(1632, 1224, rng)), camera_exif(datetime.now()), "jpeg")
+    service = PhotoVerificationService({"result_cache_max_bytes": 0})
+    requirements = TaskRequirements(
+        task_type="tree_planting",
+        required_objects=[],
+        location_coordinates=DEFAULT_GPS,
+        location_radius_meters=100,
+        deadline_start=datetime.now() - timedelta(days=1),
+        deadline_end=datetime.now() + timedelta(days=1)
+    )
+    result = service.verify_photo_bytes(data, requirements, "benchmark", datetime.now())
+    print(f"pickled VerificationResult: {len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))} bytes")
+    return {
+        "is_valid": result.is_valid,
+        "score": result.score,
+        "issues": result.issues,
+        "metadata": result.metadata,
+        "ai_checks": result.ai_checks,
+        "recommendations": result.recommendations,
+        "verification_tier": result.tier,
+        "watermark": {"id": "0" * 64, "url": "/watermarks/" + "0" * 64},
+        "verification_timestamp": datetime.now().isoformat()
+    }
+
+
+def _time(encoder: Callable[[Dict[str, Any]], bytes], bodies: List[Dict[str, Any]], repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        size = sum(len(encoder(body)) for body in bodies)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=1000, help="Response bodies encoded per run")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    body = sample_body()
+    encoders = {"stdlib json": lambda b: json.dumps(jsonable_encoder(b)).encode("utf-8")}
+    if response_encoding.orjson is not None:
+        encoders["orjson"] = lambda b: encode(b, JSON)
+    if response_encoding.msgpack_available():
+        encoders["msgpack"] = lambda b: encode(b, MSGPACK)
+
+    print(f"{'body':>10} {'encoder':>12} {'ms / 1k':>9} {'bytes each':>11}")
+    for name, fields in (("full", None), ("default", DEFAULT_FIELDS)):
+        bodies = [project(dict(body), fields) for _ in range(args.results)]
+        for encoder_name, encoder in encoders.items():
+            seconds, size = _time(encoder, bodies, args.repeats)
+            print(f"{name:>10} {encoder_name:>12} {seconds * 1000 * 1000 / args.results:>9.2f} {size / args.results:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
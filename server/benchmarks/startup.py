@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of the verification service
+
+Imports each target in a fresh interpreter and reports the import time, the
+resident set size afterwards and which heavy modules were loaded. The
+"warm" scenario also runs PhotoVerificationService.warm_up(), which is what
+each pool worker pays before taking traffic.
+
+Usage (from the server directory):
+    python -m benchmarks.startup [--repeats N] [--json OUT]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Any
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["cv2", "scipy", "requests", "sklearn", "fastapi"]
+
+SCENARIOS = {
+    "service": ("photo_verification", False),
+    "api": ("photo_verification_api", False),
+    "service+warm_up": ("photo_verification", True),
+}
+
+PROBE = r"""
+import json, sys, time
+sys.path.insert(0, {server_dir!r})
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+baseline_rss = rss_mb()
+start = time.perf_counter()
+module = __import__({target!r})
+import_seconds = time.perf_counter() - start
+warm_up_seconds = None
+if {warm!r}:
+    from photo_verification import PhotoVerificationService
+    start = time.perf_counter()
+    PhotoVerificationService({{"result_cache_max_bytes": 0}}).warm_up()
+    warm_up_seconds = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": import_seconds,
+    "warm_up_seconds": warm_up_seconds,
+    "baseline_rss_mb": baseline_rss,
+    "rss_mb": rss_mb(),
+    "heavy_loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def probe(target: str, warm: bool) -> Dict[str, Any]:
+    code = PROBE.format(server_dir=SERVER_DIR, target=target, warm=warm, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(repeats: int) -> Dict[str, Any]:
+    results = {}
+    for name, (target, warm) in SCENARIOS.items():
+        runs = [probe(target, warm) for _ in range(repeats)]
+        results[name] = {
+            "import_ms": statistics.median(r["import_seconds"] for r in runs) * 1000,
+            "warm_up_ms": (statistics.median(r["warm_up_seconds"] for r in runs) * 1000) if warm else None,
+            "rss_mb": statistics.median(r["rss_mb"] for r in runs),
+            "rss_delta_mb": statistics.median(r["rss_mb"] - r["baseline_rss_mb"] for r in runs),
+            "heavy_loaded": runs[-1]["heavy_loaded"],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per scenario")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.repeats)
+
+    print(f"{'scenario':>16} {'import ms':>10} {'warm-up ms':>11} {'RSS MB':>8} {'+RSS MB':>8}  heavy modules loaded")
+    for name, row in results.items():
+        warm_up = f"{row['warm_up_ms']:.0f}" if row["warm_up_ms"] is not None else "-"
+        print(f"{name:>16} {row['import_ms']:>10.0f} {warm_up:>11} {row['rss_mb']:>8.1f} "
+              f"{row['rss_delta_mb']:>8.1f}  {', '.join(row['heavy_loaded']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
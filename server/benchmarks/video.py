@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Video verification cost against clip length
+
+Writes synthetic panning clips of each length with OpenCV, then verifies
+each one in a fresh worker process and reports wall time, frames sampled,
+frames pulled through the decoder, seeks and the worker's peak RSS. Peak
+memory should stay flat as clips get longer.
+
+Usage (from the server directory):
+    python -m benchmarks.video [--seconds 10 60 300] [--width 1280 --height 720]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import cv2
+import numpy as np
+
+from benchmarks.corpus import outdoor_scene, DEFAULT_GPS
+from photo_verification import PhotoVerificationService, TaskRequirements
+
+
+def write_clip(path: str, seconds: float, width: int, height: int, fps: int = 30, seed: int = 0) -> None:
+    """A slow pan across one outdoor scene, as a single continuous take"""
+    rng = np.random.default_rng(seed)
+    scene = outdoor_scene(width * 2, height, rng)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    frames = int(seconds * fps)
+    for index in range(frames):
+        left = int(index / frames * width)
+        writer.write(np.ascontiguousarray(scene[:, left:left + width]))
+    writer.release()
+
+
+def _verify(path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    service = PhotoVerificationService(config)
+    requirements = TaskRequirements(
+        task_type="tree_planting",
+        required_objects=[],
+        location_coordinates=DEFAULT_GPS,
+        location_radius_meters=100,
+        deadline_start=datetime.now() - timedelta(days=1),
+        deadline_end=datetime.now() + timedelta(days=1),
+        requires_video=True
+    )
+    start = time.perf_counter()
+    result = service.verify_video(path, requirements, "benchmark", datetime.now(), collect_timings=True)
+    return {
+        "seconds": time.perf_counter() - start,
+        "counters": result.counters,
+        "splice_detected": result.ai_checks.get("splice_detected"),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run(lengths: List[float], width: int, height: int, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for seconds in lengths:
+            path = os.path.join(directory, f"clip_{seconds:g}s.mp4")
+            write_clip(path, seconds, width, height)
+            # A fresh process per clip, so peak RSS belongs to that clip alone
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                row = pool.submit(_verify, path, config).result()
+            row.update(clip_seconds=seconds, file_mb=os.path.getsize(path) / 1e6)
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 60, 300])
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between sampled frames")
+    parser.add_argument("--max-frames", type=int, default=120)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    config = {
+        "video_sample_interval": args.interval,
+        "video_max_frames": args.max_frames,
+        "result_cache_max_bytes": 0,
+    }
+    results = run(args.seconds, args.width, args.height, config)
+
+    print(f"{'clip s':>7} {'file MB':>8} {'verify s':>9} {'sampled':>8} {'grabbed':>8} {'seeks':>6} {'peak RSS MB':>12}")
+    for row in results:
+        counters = row["counters"] or {}
+        print(f"{row['clip_seconds']:>7g} {row['file_mb']:>8.1f} {row['seconds']:>9.2f} "
+              f"{counters.get('sampled_frames', 0):>8.0f} {counters.get('grabbed_frames', 0):>8.0f} "
+              f"{counters.get('seeks', 0):>6.0f} {row['peak_rss_mb']:>12.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
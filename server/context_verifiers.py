@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Task-type context verifiers
+Each verifier registers the color ranges it needs and an evaluate function.
+All of a verifier's ranges are classified in one LUT pass over the shared
+analysis view instead of one cv2.inRange call per range.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lazy_imports import lazy_import
+from image_context import AnalysisView
+from tiling import needs_tiling, row_bands
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+# Ranges are packed as bits of a uint8 class code per pixel
+MAX_RANGES_PER_VERIFIER = 8
+
+
+@dataclass(frozen=True)
+class ColorRange:
+    """Inclusive HSV box, same semantics as cv2.inRange on an HSV image"""
+    name: str
+    lower: Tuple[int, int, int]
+    upper: Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class GrayRange:
+    """Inclusive grayscale interval"""
+    name: str
+    lower: int
+    upper: int
+
+
+@dataclass
+class ContextVerifier:
+    """Color ranges a task type needs and how it judges the result"""
+    task_type: str
+    ranges: Tuple = ()
+    evaluate: Callable[["ContextFeatures"], Tuple[bool, List[str]]] = None
+    resolution: Optional[int] = 1024  # long edge in pixels, None = full resolution
+    bits: Dict[str, int] = field(init=False)
+
+    def __post_init__(self):
+        if len(self.ranges) > MAX_RANGES_PER_VERIFIER:
+            raise ValueError(
+                f"{self.task_type}: at most {MAX_RANGES_PER_VERIFIER} color ranges per verifier"
+            )
+        self.bits = {r.name: 1 << index for index, r in enumerate(self.ranges)}
+        self._hsv_luts, self._gray_lut = self._build_luts()
+
+    def _build_luts(self):
+        """Per-channel lookup tables mapping a channel value to the set of ranges it satisfies"""
+        hsv_luts = [np.zeros(256, dtype=np.uint8) for _ in range(3)]
+        gray_lut = np.zeros(256, dtype=np.uint8)
+        values = np.arange(256)
+        for r in self.ranges:
+            bit = self.bits[r.name]
+            if isinstance(r, GrayRange):
+                gray_lut[(values >= r.lower) & (values <= r.upper)] |= bit
+            else:
+                for channel in range(3):
+                    inside = (values >= r.lower[channel]) & (values <= r.upper[channel])
+                    hsv_luts[channel][inside] |= bit
+        uses_hsv = any(not isinstance(r, GrayRange) for r in self.ranges)
+        uses_gray = any(isinstance(r, GrayRange) for r in self.ranges)
+        return (hsv_luts if uses_hsv else None), (gray_lut if uses_gray else None)
+
+    def classify(self, view: AnalysisView, tile_pixels: Optional[int] = None) -> "ContextFeatures":
+        """
+        Class code of every pixel for all ranges at once. Views larger than
+        tile_pixels are converted and classified band by band, so only the
+        codes are ever held at full size
+        """
+        if not needs_tiling(view.bgr, tile_pixels):
+            hsv = view.hsv if self._hsv_luts is not None else None
+            gray = view.gray if self._gray_lut is not None else None
+            return ContextFeatures(view, self._codes(hsv, gray, view.shape[:2]), self.bits)
+
+        height, width = view.shape[:2]
+        codes = np.empty((height, width), dtype=np.uint8)
+        for top, bottom in row_bands(height, width, tile_pixels, align=1):
+            band = view.bgr[top:bottom]
+            hsv = cv2.cvtColor(band, cv2.COLOR_BGR2HSV) if self._hsv_luts is not None else None
+            gray = cv2.cvtColor(band, cv2.COLOR_BGR2GRAY) if self._gray_lut is not None else None
+            codes[top:bottom] = self._codes(hsv, gray, band.shape[:2])
+        return ContextFeatures(view, codes, self.bits)
+
+    def _codes(self, hsv: Optional[np.ndarray], gray: Optional[np.ndarray], shape: Tuple[int, int]) -> np.ndarray:
+        codes = None
+        if hsv is not None:
+            # A pixel is in an HSV box iff each channel is in that box's interval
+            h, s, v = (cv2.LUT(channel, lut) for channel, lut in zip(cv2.split(hsv), self._hsv_luts))
+            codes = cv2.bitwise_and(cv2.bitwise_and(h, s), v)
+        if gray is not None:
+            gray_codes = cv2.LUT(gray, self._gray_lut)
+            codes = gray_codes if codes is None else cv2.bitwise_or(codes, gray_codes)
+        if codes is None:
+            codes = np.zeros(shape, dtype=np.uint8)
+        return codes
+
+
+class ContextFeatures:
+    """Per-pixel class codes for one analysis view"""
+
+    def __init__(self, view: AnalysisView, codes: np.ndarray, bits: Dict[str, int]):
+        self.view = view
+        self.codes = codes
+        self.bits = bits
+        self.total_pixels = codes.shape[0] * codes.shape[1]
+        self._histogram = None
+
+    @property
+    def scale(self) -> float:
+        return self.view.scale
+
+    @property
+    def histogram(self) -> np.ndarray:
+        """Pixel count of each of the 256 class codes"""
+        if self._histogram is None:
+            self._histogram = cv2.calcHist([self.codes], [0], None, [256], [0, 256]).ravel()
+        return self._histogram
+
+    def _bits(self, names: Sequence[str]) -> int:
+        mask = 0
+        for name in names:
+            mask |= self.bits[name]
+        return mask
+
+    def percentage(self, *names: str) -> float:
+        """Share of pixels (0-100) inside any of the named ranges"""
+        selected = cv2.countNonZero(cv2.bitwise_and(self.codes, self._bits(names)))
+        return selected / self.total_pixels * 100
+
+    def mask(self, *names: str) -> np.ndarray:
+        """0/255 mask of pixels inside any of the named ranges"""
+        selected = cv2.bitwise_and(self.codes, self._bits(names))
+        return cv2.compare(selected, 0, cv2.CMP_GT)
+
+
+_REGISTRY: Dict[str, ContextVerifier] = {}
+
+
+def register_context_verifier(task_type: str,
+                              ranges: Sequence = (),
+                              resolution: Optional[int] = 1024):
+    """Decorator registering fn(features) -> (valid, issues) for a task type"""
+    def decorator(evaluate):
+        _REGISTRY[task_type] = ContextVerifier(task_type, tuple(ranges), evaluate, resolution)
+        return evaluate
+    return decorator
+
+
+def get_context_verifier(task_type: str) -> Optional[ContextVerifier]:
+    return _REGISTRY.get(task_type)
+
+
+def registered_task_types() -> List[str]:
+    return sorted(_REGISTRY)
+
+
+@register_context_verifier("tree_planting", ranges=[
+    # Tree green is typically in this range
+    ColorRange("green", (35, 50, 50), (85, 255, 255)),
+    # Darker green (tree trunks, branches)
+    ColorRange("dark_green", (25, 30, 30), (35, 255, 255)),
+    # Brown colors (soil, tools, tree trunks)
+    ColorRange("brown", (10, 50, 50), (20, 255, 255)),
+    # Sky (blue) to ensure outdoor photo
+    ColorRange("blue", (100, 50, 50), (130, 255, 255)),
+])
+def verify_tree_planting(features: ContextFeatures) -> Tuple[bool, List[str]]:
+    """Verify tree planting context - enhanced for tree detection"""
+    issues = []
+
+    # More lenient threshold for tree detection
+    green_percentage = features.percentage("green", "dark_green")
+    if green_percentage < 3:
+        issues.append("No trees or vegetation detected in the image")
+    elif green_percentage < 8:
+        issues.append("Very little vegetation detected - ensure trees are clearly visible")
+
+    if features.percentage("blue") > 20:
+        issues.append("Image appears to be taken outdoors (good for tree planting)")
+
+    tree_like_objects = count_tall_shapes(features.mask("green", "dark_green"), features.scale)
+    if tree_like_objects == 0:
+        issues.append("No tree-like objects detected in the image")
+    elif tree_like_objects < 2:
+        issues.append("Very few tree-like objects detected - ensure trees are clearly visible")
+
+    return len(issues) == 0, issues
+
+
+@register_context_verifier("pollution_report", ranges=[
+    # Dark areas (potential pollution)
+    GrayRange("dark", 0, 50),
+])
+def verify_pollution(features: ContextFeatures) -> Tuple[bool, List[str]]:
+    """Verify pollution report context"""
+    issues = []
+    if features.percentage("dark") < 10:
+        issues.append("Image doesn't show sufficient pollution indicators")
+    return len(issues) == 0, issues
+
+
+@register_context_verifier("corruption_report", resolution=None)
+def verify_corruption(features: ContextFeatures) -> Tuple[bool, List[str]]:
+    """Corruption reports are hard to verify automatically and go to human review"""
+    return True, []
+
+
+@register_context_verifier("beach_cleanup", ranges=[
+    # Sand: low-saturation yellows and beiges in daylight
+    ColorRange("sand", (10, 20, 120), (30, 150, 255)),
+    # Sea and sky
+    ColorRange("water", (85, 40, 40), (130, 255, 255)),
+])
+def verify_beach_cleanup(features: ContextFeatures) -> Tuple[bool, List[str]]:
+    """Verify beach cleanup context"""
+    issues = []
+    if features.percentage("sand") < 5:
+        issues.append("No beach or shoreline detected in the image")
+    if features.percentage("water") < 1:
+        issues.append("No water or sky visible - include the shoreline if possible")
+    return len(issues) == 0, issues
+
+
+@register_context_verifier("graffiti_removal", ranges=[
+    # Spray paint is strongly saturated
+    ColorRange("paint", (0, 150, 80), (179, 255, 255)),
+    # Bare walls are low-saturation greys and whites
+    ColorRange("wall", (0, 0, 60), (179, 40, 255)),
+])
+def verify_graffiti_removal(features: ContextFeatures) -> Tuple[bool, List[str]]:
+    """Verify graffiti removal context"""
+    issues = []
+    if features.percentage("paint", "wall") < 20:
+        issues.append("No wall or painted surface detected in the image")
+    return len(issues) == 0, issues
+
+
+@register_context_verifier("water_testing", ranges=[
+    # Open water, from clear blue to green-tinted
+    ColorRange("water", (80, 30, 30), (130, 255, 255)),
+    # Murky or turbid water
+    ColorRange("murky_water", (15, 30, 30), (40, 150, 180)),
+])
+def verify_water_testing(features: ContextFeatures) -> Tuple[bool, List[str]]:
+    """Verify water testing context"""
+    issues = []
+    if features.percentage("water", "murky_water") < 10:
+        issues.append("No body of water detected in the image")
+    return len(issues) == 0, issues
+
+
+def count_tall_shapes(mask: np.ndarray, scale: float, min_area: float = 100) -> int:
+    """
+    Contours taller than wide (aspect > 1.2) and larger than min_area pixels
+    at full resolution, scaled to the analysis view
+    """
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = min_area * scale ** 2
+    tall_shapes = 0
+    for contour in contours:
+        if cv2.contourArea(contour) > min_area:
+            x, y, w, h = cv2.boundingRect(contour)
+            aspect_ratio = h / w if w > 0 else 0
+            if aspect_ratio > 1.2:
+                tall_shapes += 1
+    return tall_shapes
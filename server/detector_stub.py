@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the external AI detectors
+Serves the Azure Content Moderator and Hive endpoints detectors.py calls,
+with scores derived from the image bytes (the same photo always gets the
+same answer) and configurable latency, errors and hangs, so throughput,
+hedging and circuit breaking can be exercised offline.
+
+Usage (from the server directory):
+    python detector_stub.py [--port 8090] [--latency 0.05] [--jitter 0.05]
+        [--error-rate 0] [--hang-rate 0] [--ai-score SCORE]
+
+then point the API at it:
+    AZURE_CONTENT_MODERATOR_KEY=stub AZURE_CONTENT_MODERATOR_ENDPOINT=http://127.0.0.1:8090
+    HIVE_AI_KEY=stub HIVE_AI_URL=http://127.0.0.1:8090/api/v2/task/sync
+"""
+
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+# Behaviour knobs, set from the command line or by create_app
+settings = {
+    "latency": 0.05,  # seconds before answering
+    "jitter": 0.05,  # extra random seconds, uniform in [0, jitter]
+    "error_rate": 0.0,  # share of requests answered with HTTP 503
+    "hang_rate": 0.0,  # share of requests that never answer in time
+    "hang_seconds": 60.0,
+    "ai_score": None,  # fixed AI-generated score instead of one derived from the bytes
+}
+
+
+def _score(data: bytes, salt: bytes) -> float:
+    """Stable pseudo-score in [0, 1) for these bytes"""
+    digest = hashlib.sha256(salt + data).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32
+
+
+async def _behave() -> None:
+    """Sleep, fail or hang as configured"""
+    roll = random.random()
+    if roll < settings["hang_rate"]:
+        await asyncio.sleep(settings["hang_seconds"])
+    await asyncio.sleep(settings["latency"] + random.uniform(0, settings["jitter"]))
+    if roll >= 1 - settings["error_rate"]:
+        raise HTTPException(status_code=503, detail="Stub provider error")
+
+
+def create_app(**overrides) -> FastAPI:
+    settings.update(overrides)
+    app = FastAPI(title="Civitas detector stub")
+
+    @app.post("/contentmoderator/moderate/v1.0/ProcessImage/Evaluate")
+    async def azure_evaluate(request: Request):
+        data = await request.body()
+        await _behave()
+        adult = _score(data, b"adult") * 0.2
+        racy = _score(data, b"racy") * 0.3
+        return JSONResponse({
+            "AdultClassificationScore": adult,
+            "IsImageAdultClassified": adult > 0.5,
+            "RacyClassificationScore": racy,
+            "IsImageRacyClassified": racy > 0.5,
+            "Status": {"Code": 3000, "Description": "OK"},
+        })
+
+    @app.post("/api/v2/task/sync")
+    async def hive_task(request: Request):
+        form = await request.form()
+        media = form.get("media")
+        if media is None:
+            raise HTTPException(status_code=400, detail="Missing media")
+        data = await media.read()
+        await _behave()
+        score = settings["ai_score"] if settings["ai_score"] is not None else _score(data, b"ai") * 0.5
+        return JSONResponse({
+            "status": [{
+                "response": {
+                    "output": [{
+                        "classes": [
+                            {"class": "ai_generated", "score": score},
+                            {"class": "not_ai_generated", "score": 1 - score},
+                        ]
+                    }]
+                }
+            }]
+        })
+
+    return app
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=settings["latency"])
+    parser.add_argument("--jitter", type=float, default=settings["jitter"])
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"])
+    parser.add_argument("--hang-rate", type=float, default=settings["hang_rate"])
+    parser.add_argument("--ai-score", type=float, default=None, help="Fixed Hive ai_generated score")
+    args = parser.parse_args(argv)
+
+    app = create_app(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        ai_score=args.ai_score
+    )
+    # Hung requests must not hold up shutdown
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", timeout_graceful_shutdown=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Async connectors for external AI-image detectors
+Each provider gets a pooled keep-alive HTTP client, a concurrency limit, a
+deadline with a hedged second request for slow answers, and a circuit
+breaker that stops calling a provider that keeps failing. Results are
+cached by the upload's SHA-256, so a resubmitted photo costs no calls.
+The API runs DetectorHub.detect on its event loop while the worker pool
+runs the CPU checks
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from result_cache import ResultCache
+from upload_ingest import sniff_format
+
+logger = logging.getLogger(__name__)
+
+HIVE_DEFAULT_URL = "https://api.thehive.ai/api/v2/task/sync"
+
+
+class DetectorError(Exception):
+    """A provider call that failed, timed out or was not attempted"""
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures. Once reset_after
+    seconds have passed one trial call goes through (half-open) and its
+    outcome closes or re-opens the circuit
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+    def release_trial(self) -> None:
+        """Let another call be the trial, leaving the state as it was (the call was abandoned)"""
+        self._trial = False
+
+
+@dataclass
+class DetectorProvider:
+    """Where a detector lives, how to send it an image and how to read its answer"""
+    name: str
+    url: str
+    build_request: Callable[[bytes, str], Dict[str, Any]]  # httpx request kwargs from (data, content type)
+    parse: Callable[[Dict[str, Any]], Dict[str, Any]]
+    max_concurrency: int = 8
+    timeout: float = 5.0  # deadline for the whole call, hedge included
+    hedge_after: Optional[float] = 1.0  # seconds before a second request is raced against the first
+
+
+def azure_provider(endpoint: str, key: str, **options) -> DetectorProvider:
+    """Azure Content Moderator image evaluation"""
+    return DetectorProvider(
+        name="azure",
+        url=f"{endpoint.rstrip('/')}/contentmoderator/moderate/v1.0/ProcessImage/Evaluate",
+        build_request=lambda data, content_type: {
+            "content": data,
+            "headers": {"Ocp-Apim-Subscription-Key": key, "Content-Type": content_type},
+        },
+        parse=_parse_azure,
+        **options
+    )
+
+
+def _parse_azure(body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "adult_score": float(body.get("AdultClassificationScore", 0.0)),
+        "racy_score": float(body.get("RacyClassificationScore", 0.0)),
+        "flagged": bool(body.get("IsImageAdultClassified") or body.get("IsImageRacyClassified")),
+    }
+
+
+def hive_provider(url: str, key: str, **options) -> DetectorProvider:
+    """Hive synchronous task API with the AI-generated media model"""
+    return DetectorProvider(
+        name="hive",
+        url=url,
+        build_request=lambda data, content_type: {
+            "files": {"media": ("upload", data, content_type)},
+            "headers": {"Authorization": f"Token {key}"},
+        },
+        parse=_parse_hive,
+        **options
+    )
+
+
+def _parse_hive(body: Dict[str, Any]) -> Dict[str, Any]:
+    classes = body["status"][0]["response"]["output"][0]["classes"]
+    scores = {c["class"]: float(c["score"]) for c in classes}
+    return {"ai_generated_score": scores.get("ai_generated", 0.0)}
+
+
+class DetectorClient:
+    """One provider's pooled client, concurrency limit and circuit breaker"""
+
+    def __init__(self, provider: DetectorProvider, breaker_failures: int = 5, breaker_reset: float = 30.0):
+        self.provider = provider
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self.stats = {"calls": 0, "failures": 0, "hedges": 0, "short_circuited": 0}
+        self._slots = asyncio.Semaphore(provider.max_concurrency)
+        # Room for hedges on top of the concurrency limit
+        self._client = httpx.AsyncClient(
+            timeout=provider.timeout,
+            limits=httpx.Limits(
+                max_connections=provider.max_concurrency * 2,
+                max_keepalive_connections=provider.max_concurrency
+            )
+        )
+
+    async def detect(self, data: bytes, content_type: str) -> Dict[str, Any]:
+        """The provider's parsed answer, or DetectorError"""
+        name = self.provider.name
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise DetectorError(f"{name} circuit is open")
+        try:
+            result = await asyncio.wait_for(self._hedged(data, content_type), self.provider.timeout)
+        except asyncio.CancelledError:
+            # Nobody wants the answer any more; that says nothing about the provider
+            self.breaker.release_trial()
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            self.stats["failures"] += 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise DetectorError(f"{name} did not answer within {self.provider.timeout}s") from None
+            raise DetectorError(f"{name} failed: {e}") from e
+        self.breaker.record_success()
+        return result
+
+    async def _hedged(self, data: bytes, content_type: str) -> Dict[str, Any]:
+        """First successful answer of the request and, if it is slow, a second copy"""
+        attempts = [asyncio.ensure_future(self._call(data, content_type))]
+        try:
+            if self.provider.hedge_after is not None:
+                await asyncio.wait(attempts, timeout=self.provider.hedge_after)
+                # Only hedge with a free slot, so a loaded provider is not sent twice the traffic
+                if not attempts[0].done() and not self._slots.locked():
+                    self.stats["hedges"] += 1
+                    attempts.append(asyncio.ensure_future(self._call(data, content_type)))
+            pending = set(attempts)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def _call(self, data: bytes, content_type: str) -> Dict[str, Any]:
+        async with self._slots:
+            self.stats["calls"] += 1
+            response = await self._client.post(
+                self.provider.url, **self.provider.build_request(data, content_type)
+            )
+            response.raise_for_status()
+            return self.provider.parse(response.json())
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class DetectorHub:
+    """Every configured provider, queried together with a shared result cache"""
+
+    def __init__(self, providers: List[DetectorProvider], config: Dict[str, Any] = None):
+        config = config or {}
+        self.clients = {
+            provider.name: DetectorClient(
+                provider,
+                breaker_failures=config.get("detector_breaker_failures", 5),
+                breaker_reset=config.get("detector_breaker_reset", 30)
+            )
+            for provider in providers
+        }
+        cache_bytes = config.get("detector_cache_max_bytes", 8 * 1024 * 1024)
+        self.cache = ResultCache(
+            max_bytes=cache_bytes,
+            ttl_seconds=config.get("detector_cache_ttl", 24 * 3600)
+        ) if cache_bytes else None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any] = None) -> "DetectorHub":
+        """
+        Providers whose API keys are set: AZURE_CONTENT_MODERATOR_KEY (with
+        config["azure_endpoint"]) and HIVE_AI_KEY (config["hive_ai_url"])
+        """
+        config = config or {}
+        options = {
+            "max_concurrency": config.get("detector_max_concurrency", 8),
+            "timeout": config.get("detector_timeout", 5.0),
+            "hedge_after": config.get("detector_hedge_after", 1.0),
+        }
+        providers = []
+        azure_key = os.getenv("AZURE_CONTENT_MODERATOR_KEY")
+        if azure_key and config.get("azure_endpoint"):
+            providers.append(azure_provider(config["azure_endpoint"], azure_key, **options))
+        hive_key = os.getenv("HIVE_AI_KEY")
+        if hive_key:
+            providers.append(hive_provider(config.get("hive_ai_url") or HIVE_DEFAULT_URL, hive_key, **options))
+        return cls(providers, config)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.clients)
+
+    async def detect(self, data: bytes, digest: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Every provider's answer for one upload, keyed by provider name.
+        Failed providers map to {"error": ...}; only answers are cached
+        """
+        if digest is None:
+            digest = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+        results = dict((self.cache.get(digest) if self.cache is not None else None) or {})
+        missing = [name for name in self.clients if name not in results]
+        if not missing:
+            return results
+
+        content_type = f"image/{sniff_format(bytes(data[:12])) or 'jpeg'}"
+        outcomes = await asyncio.gather(
+            *(self.clients[name].detect(data, content_type) for name in missing),
+            return_exceptions=True
+        )
+        answers = {}
+        for name, outcome in zip(missing, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.warning(str(outcome))
+                results[name] = {"error": str(outcome)}
+            else:
+                results[name] = answers[name] = outcome
+        if answers and self.cache is not None:
+            self.cache.update(digest, answers)
+        return results
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Call counters and circuit state per provider"""
+        return {
+            name: {**client.stats, "circuit": client.breaker.state}
+            for name, client in self.clients.items()
+        }
+
+    async def aclose(self) -> None:
+        for client in self.clients.values():
+            await client.aclose()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Header-only EXIF reader for JPEG, PNG and HEIC
+Walks the container structure just far enough to find the EXIF block and
+decodes only the tags the app uses, never touching pixel data
+"""
+
+import io
+import struct
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Optional, Union, BinaryIO, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tags read from IFD0, the Exif sub-IFD and the GPS IFD
+_TAG_MAKE = 0x010F
+_TAG_MODEL = 0x0110
+_TAG_ORIENTATION = 0x0112
+_TAG_SOFTWARE = 0x0131
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_GPS_IFD = 0x8825
+_TAG_DATETIME_ORIGINAL = 0x9003
+_GPS_LATITUDE_REF = 1
+_GPS_LATITUDE = 2
+_GPS_LONGITUDE_REF = 3
+_GPS_LONGITUDE = 4
+_GPS_ALTITUDE_REF = 5
+_GPS_ALTITUDE = 6
+
+# TIFF field type -> (struct code, size in bytes)
+_TIFF_TYPES = {
+    1: ("B", 1), 2: ("s", 1), 3: ("H", 2), 4: ("L", 4), 5: ("LL", 8),
+    7: ("s", 1), 9: ("l", 4), 10: ("ll", 8),
+}
+
+# Safety bound on how much header we are willing to walk through
+_MAX_SEGMENT_SCAN = 64
+
+
+@dataclass
+class ExifHeader:
+    """Typed subset of EXIF used by the verification app"""
+    format: str
+    make: Optional[str] = None
+    model: Optional[str] = None
+    software: Optional[str] = None
+    orientation: Optional[int] = None
+    date_time: Optional[datetime] = None
+    date_time_original: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    altitude: Optional[float] = None
+
+    @property
+    def has_gps(self) -> bool:
+        return self.latitude is not None and self.longitude is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-safe dict using the same key names as the full metadata dict"""
+        metadata: Dict[str, Any] = {"Format": self.format}
+        for key, value in (("Make", self.make), ("Model", self.model),
+                           ("Software", self.software), ("Orientation", self.orientation)):
+            if value is not None:
+                metadata[key] = value
+        if self.date_time is not None:
+            metadata["DateTime"] = self.date_time.isoformat()
+        if self.date_time_original is not None:
+            metadata["DateTimeOriginal"] = self.date_time_original.isoformat()
+        if self.has_gps:
+            metadata["GPS_Decimal"] = {"latitude": self.latitude, "longitude": self.longitude}
+        if self.altitude is not None:
+            metadata["GPSAltitude"] = self.altitude
+        return metadata
+
+
+class _BufferReader:
+    """Minimal read/seek/tell over a buffer without copying it"""
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]):
+        self._view = memoryview(data)
+        self._pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size < 0 else min(self._pos + size, len(self._view))
+        chunk = bytes(self._view[self._pos:end])
+        self._pos = end
+        return chunk
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def read_exif_header(source: Union[str, bytes, bytearray, memoryview, BinaryIO]) -> Optional[ExifHeader]:
+    """
+    Read the EXIF header of a JPEG, PNG or HEIC image
+
+    Accepts a path, an in-memory buffer or a seekable binary stream. Returns
+    None for unsupported formats; an image without EXIF gives an empty record.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return read_exif_header(f)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return read_exif_header(_BufferReader(source))
+
+    try:
+        head = source.read(12)
+        source.seek(0)
+        if head[:2] == b"\xff\xd8":
+            return _parse_tiff(_find_jpeg_exif(source), ExifHeader(format="jpeg"))
+        if head[:8] == b"\x89PNG\r\n\x1a\n":
+            return _parse_tiff(_find_png_exif(source), ExifHeader(format="png"))
+        if head[4:8] == b"ftyp":
+            return _parse_tiff(_find_heif_exif(source), ExifHeader(format="heic"))
+    except (struct.error, ValueError, IndexError, OSError) as e:
+        logger.warning(f"Malformed image header: {e}")
+        return None
+    return None
+
+
+def exif_prefix_length(data: Union[bytes, bytearray, memoryview]) -> Optional[int]:
+    """
+    How many leading bytes of a JPEG or PNG read_exif_header needs, or None
+    while data is too short to tell. A streaming reader can parse EXIF as
+    soon as this many bytes have arrived, long before the pixel data. Other
+    formats (HEIC keeps EXIF wherever its iloc points) always give None
+    """
+    view = memoryview(data)
+    try:
+        if bytes(view[:2]) == b"\xff\xd8":
+            return _jpeg_prefix_length(view)
+        if bytes(view[:8]) == b"\x89PNG\r\n\x1a\n":
+            return _png_prefix_length(view)
+    except struct.error:
+        return None
+    return None
+
+
+def _jpeg_prefix_length(view: memoryview) -> Optional[int]:
+    """End of the APP1 Exif segment, or where the scan starts if there is none"""
+    pos = 2
+    for _ in range(_MAX_SEGMENT_SCAN):
+        if pos + 2 > len(view):
+            return None
+        if view[pos] != 0xFF:
+            return pos  # malformed; let the parser report it
+        marker_pos = pos + 1
+        while marker_pos < len(view) and view[marker_pos] == 0xFF:  # fill bytes
+            marker_pos += 1
+        if marker_pos >= len(view):
+            return None
+        marker = view[marker_pos]
+        if marker in (0xDA, 0xD9):  # SOS / EOI
+            return marker_pos + 1
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            pos = marker_pos + 1
+            continue
+        if marker_pos + 3 > len(view):
+            return None
+        (length,) = struct.unpack(">H", view[marker_pos + 1:marker_pos + 3])
+        if length < 2:
+            return marker_pos + 3  # malformed; let the parser report it
+        end = marker_pos + 1 + length
+        if marker == 0xE1 and bytes(view[marker_pos + 3:marker_pos + 9]) == b"Exif\x00\x00":
+            return end if end <= len(view) else None
+        pos = end
+    return pos
+
+
+def _png_prefix_length(view: memoryview) -> Optional[int]:
+    """End of the eXIf chunk, or of the first IDAT chunk header if there is none"""
+    pos = 8
+    for _ in range(_MAX_SEGMENT_SCAN):
+        if pos + 8 > len(view):
+            return None
+        length, chunk_type = struct.unpack(">I4s", view[pos:pos + 8])
+        if chunk_type in (b"IDAT", b"IEND"):
+            return pos + 8
+        if chunk_type == b"eXIf":
+            end = pos + 8 + length
+            return end if end <= len(view) else None
+        pos += length + 12  # header + data + CRC
+    return pos
+
+
+def _find_jpeg_exif(stream: BinaryIO) -> Optional[bytes]:
+    """TIFF block of the APP1 Exif segment, stopping at the first scan"""
+    stream.seek(2)
+    for _ in range(_MAX_SEGMENT_SCAN):
+        byte = stream.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            raise ValueError("JPEG marker expected")
+        marker = stream.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = stream.read(1)
+        if not marker or marker in (b"\xda", b"\xd9"):  # SOS / EOI: pixels start
+            return None
+        if b"\xd0" <= marker <= b"\xd7" or marker == b"\x01":
+            continue  # standalone markers carry no length
+        (length,) = struct.unpack(">H", stream.read(2))
+        if length < 2:
+            raise ValueError(f"JPEG segment length {length}")
+        if marker == b"\xe1":
+            payload = stream.read(length - 2)
+            if payload[:6] == b"Exif\x00\x00":
+                return payload[6:]
+        else:
+            stream.seek(length - 2, io.SEEK_CUR)
+    return None
+
+
+def _find_png_exif(stream: BinaryIO) -> Optional[bytes]:
+    """Contents of the eXIf chunk, stopping at the first IDAT"""
+    stream.seek(8)
+    for _ in range(_MAX_SEGMENT_SCAN):
+        header = stream.read(8)
+        if len(header) < 8:
+            return None
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type in (b"IDAT", b"IEND"):
+            return None
+        if chunk_type == b"eXIf":
+            return stream.read(length)
+        stream.seek(length + 4, io.SEEK_CUR)  # data + CRC
+    return None
+
+
+def read_box_header(stream: BinaryIO) -> Optional[Tuple[str, int, int]]:
+    """
+    (type, payload start, payload size) of the ISOBMFF box at the cursor,
+    None at the end of the stream. A box smaller than its own header raises
+    ValueError, so callers stepping from box to box always move forward
+    """
+    start = stream.tell()
+    header = stream.read(8)
+    if len(header) < 8:
+        return None
+    size, box_type = struct.unpack(">I4s", header)
+    header_size = 8
+    if size == 1:
+        large = stream.read(8)
+        if len(large) < 8:
+            return None
+        (size,) = struct.unpack(">Q", large)
+        header_size = 16
+    elif size == 0:
+        size = stream.seek(0, io.SEEK_END) - start
+        stream.seek(start + header_size)
+    if size < header_size:
+        raise ValueError(f"{box_type!r} box of {size} bytes is smaller than its header")
+    return box_type.decode("latin-1"), start + header_size, size - header_size
+
+
+def _find_heif_exif(stream: BinaryIO) -> Optional[bytes]:
+    """TIFF block of the Exif item, located through the meta box's iinf/iloc"""
+    stream.seek(0)
+    meta = None
+    for _ in range(_MAX_SEGMENT_SCAN):
+        box = read_box_header(stream)
+        if box is None:
+            return None
+        box_type, payload_start, payload_size = box
+        if box_type == "meta":
+            meta = (payload_start + 4, payload_size - 4)  # FullBox version/flags
+            break
+        stream.seek(payload_start + payload_size)
+    if meta is None:
+        return None
+
+    exif_item_id = None
+    locations: Dict[int, Tuple[int, int]] = {}
+    stream.seek(meta[0])
+    meta_end = meta[0] + meta[1]
+    for _ in range(_MAX_SEGMENT_SCAN):
+        position = stream.tell()
+        if position >= meta_end:
+            break
+        box = read_box_header(stream)
+        if box is None:
+            break
+        box_type, payload_start, payload_size = box
+        if box_type == "iinf":
+            exif_item_id = _heif_exif_item_id(stream.read(payload_size))
+        elif box_type == "iloc":
+            locations = _heif_item_locations(stream.read(payload_size))
+        if payload_start + payload_size <= position:
+            raise ValueError("HEIF box does not advance")
+        stream.seek(payload_start + payload_size)
+
+    if exif_item_id is None or exif_item_id not in locations:
+        return None
+    offset, length = locations[exif_item_id]
+    stream.seek(offset)
+    data = stream.read(length)
+    # Exif items start with the offset of the TIFF header past these 4 bytes
+    (tiff_offset,) = struct.unpack(">I", data[:4])
+    return data[4 + tiff_offset:]
+
+
+def _heif_exif_item_id(iinf: bytes) -> Optional[int]:
+    version = iinf[0]
+    pos = 4
+    if version == 0:
+        (count,) = struct.unpack_from(">H", iinf, pos)
+        pos += 2
+    else:
+        (count,) = struct.unpack_from(">I", iinf, pos)
+        pos += 4
+    for _ in range(count):
+        size, box_type = struct.unpack_from(">I4s", iinf, pos)
+        if box_type == b"infe":
+            infe_version = iinf[pos + 8]
+            body = pos + 12
+            if infe_version >= 2:
+                if infe_version == 2:
+                    (item_id,) = struct.unpack_from(">H", iinf, body)
+                    body += 2
+                else:
+                    (item_id,) = struct.unpack_from(">I", iinf, body)
+                    body += 4
+                item_type = iinf[body + 2:body + 6]
+                if item_type == b"Exif":
+                    return item_id
+        pos += size
+    return None
+
+
+def _heif_item_locations(iloc: bytes) -> Dict[int, Tuple[int, int]]:
+    """item_ID -> (file offset, length) for single-extent, file-based items"""
+    version = iloc[0]
+    offset_size = iloc[4] >> 4
+    length_size = iloc[4] & 0x0F
+    base_offset_size = iloc[5] >> 4
+    index_size = iloc[5] & 0x0F if version in (1, 2) else 0
+    pos = 6
+
+    def read_uint(size: int) -> int:
+        nonlocal pos
+        value = int.from_bytes(iloc[pos:pos + size], "big") if size else 0
+        pos += size
+        return value
+
+    count = read_uint(2 if version < 2 else 4)
+    locations = {}
+    for _ in range(count):
+        item_id = read_uint(2 if version < 2 else 4)
+        construction_method = read_uint(2) & 0x0F if version in (1, 2) else 0
+        read_uint(2)  # data_reference_index
+        base_offset = read_uint(base_offset_size)
+        extent_count = read_uint(2)
+        extents = []
+        for _ in range(extent_count):
+            read_uint(index_size)
+            extents.append((read_uint(offset_size), read_uint(length_size)))
+        if construction_method == 0 and len(extents) == 1:
+            locations[item_id] = (base_offset + extents[0][0], extents[0][1])
+    return locations
+
+
+def _parse_tiff(tiff: Optional[bytes], header: ExifHeader) -> ExifHeader:
+    """Fill header from a TIFF-structured EXIF block"""
+    if not tiff or len(tiff) < 8:
+        return header
+    endian = "<" if tiff[:2] == b"II" else ">"
+    (ifd0_offset,) = struct.unpack_from(endian + "I", tiff, 4)
+
+    ifd0 = _read_ifd(tiff, endian, ifd0_offset)
+    header.make = _ascii(ifd0.get(_TAG_MAKE))
+    header.model = _ascii(ifd0.get(_TAG_MODEL))
+    header.software = _ascii(ifd0.get(_TAG_SOFTWARE))
+    header.orientation = _first(ifd0.get(_TAG_ORIENTATION))
+    header.date_time = _exif_datetime(ifd0.get(_TAG_DATETIME))
+
+    exif_offset = _first(ifd0.get(_TAG_EXIF_IFD))
+    if exif_offset:
+        exif_ifd = _read_ifd(tiff, endian, exif_offset)
+        header.date_time_original = _exif_datetime(exif_ifd.get(_TAG_DATETIME_ORIGINAL))
+
+    gps_offset = _first(ifd0.get(_TAG_GPS_IFD))
+    if gps_offset:
+        gps = _read_ifd(tiff, endian, gps_offset)
+        latitude = _dms(gps.get(_GPS_LATITUDE))
+        longitude = _dms(gps.get(_GPS_LONGITUDE))
+        if latitude is not None and longitude is not None:
+            if _ascii(gps.get(_GPS_LATITUDE_REF)) == "S":
+                latitude = -latitude
+            if _ascii(gps.get(_GPS_LONGITUDE_REF)) == "W":
+                longitude = -longitude
+            header.latitude = latitude
+            header.longitude = longitude
+        altitude = gps.get(_GPS_ALTITUDE)
+        if altitude:
+            header.altitude = -altitude[0] if _first(gps.get(_GPS_ALTITUDE_REF)) == 1 else altitude[0]
+    return header
+
+
+def _read_ifd(tiff: bytes, endian: str, offset: int) -> Dict[int, Any]:
+    """Decode one IFD's entries into tag -> tuple of values (or raw bytes)"""
+    entries: Dict[int, Any] = {}
+    if offset + 2 > len(tiff):
+        return entries
+    (count,) = struct.unpack_from(endian + "H", tiff, offset)
+    for index in range(count):
+        entry = offset + 2 + index * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, field_type, value_count = struct.unpack_from(endian + "HHI", tiff, entry)
+        if field_type not in _TIFF_TYPES:
+            continue
+        code, size = _TIFF_TYPES[field_type]
+        total = size * value_count
+        data_offset = entry + 8
+        if total > 4:
+            (data_offset,) = struct.unpack_from(endian + "I", tiff, entry + 8)
+        if data_offset + total > len(tiff):
+            continue
+        if code == "s":
+            entries[tag] = tiff[data_offset:data_offset + total]
+        elif field_type in (5, 10):
+            values = struct.unpack_from(endian + code * value_count, tiff, data_offset)
+            entries[tag] = tuple(
+                values[i] / values[i + 1] if values[i + 1] else 0.0
+                for i in range(0, len(values), 2)
+            )
+        else:
+            entries[tag] = struct.unpack_from(endian + code * value_count, tiff, data_offset)
+    return entries
+
+
+def _first(values: Optional[tuple]) -> Optional[int]:
+    return values[0] if values else None
+
+
+def _ascii(value: Optional[bytes]) -> Optional[str]:
+    if not isinstance(value, bytes):
+        return None
+    text = value.split(b"\x00", 1)[0].decode("utf-8", errors="ignore").strip()
+    return text or None
+
+
+def _exif_datetime(value: Optional[bytes]) -> Optional[datetime]:
+    text = _ascii(value)
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text, "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _dms(values: Optional[tuple]) -> Optional[float]:
+    if not values or len(values) < 3:
+        return None
+    degrees, minutes, seconds = values[:3]
+    return degrees + minutes / 60.0 + seconds / 3600.0
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Vectorized geofencing over task locations
+Distances are computed over NumPy arrays (haversine on the mean sphere,
+Vincenty on the WGS-84 ellipsoid) and a grid index over unit-sphere
+coordinates finds the task geofences containing a point without comparing
+it against every task
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371008.8  # mean radius, for haversine and the index grid
+
+# WGS-84 ellipsoid
+_WGS84_A = 6378137.0
+_WGS84_F = 1 / 298.257223563
+_WGS84_B = (1 - _WGS84_F) * _WGS84_A
+
+# Sphere and ellipsoid distances differ by well under 1%; the index pads
+# cell sizes by this factor so the exact check never misses a candidate
+_SPHERE_MARGIN = 1.01
+
+# Grid coordinates must fit 19 bits each so every radius class's cells can
+# share one int64 key space
+_MIN_CELL = 2.0 / (1 << 19)
+
+# All 27 cells around (and including) a cell
+_NEIGHBOURS = np.array(
+    [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)], dtype=np.int64
+)
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in meters on the mean Earth sphere; inputs broadcast"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty_m(lat1, lon1, lat2, lon2, max_iterations: int = 200, tolerance: float = 1e-12) -> np.ndarray:
+    """
+    Ellipsoidal distance in meters on WGS-84 (Vincenty's inverse formula);
+    inputs broadcast. Agrees with geopy's geodesic to well under a
+    millimetre; the rare nearly antipodal pairs where the iteration does not
+    converge fall back to haversine
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *(np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    )
+    f = _WGS84_F
+    L = lon2 - lon1
+    U1 = np.arctan((1 - f) * np.tan(lat1))
+    U2 = np.arctan((1 - f) * np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = np.abs(lam_next - lam) < tolerance
+            lam = lam_next
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (_WGS84_A ** 2 - _WGS84_B ** 2) / _WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        distance = _WGS84_B * A * (sigma - delta_sigma)
+
+    distance = np.where(sin_sigma == 0, 0.0, distance)
+    if not converged.all():
+        fallback = haversine_m(np.degrees(lat1), np.degrees(lon1), np.degrees(lat2), np.degrees(lon2))
+        distance = np.where(converged, distance, fallback)
+    return distance
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Ellipsoidal distance in meters between two points"""
+    return float(vincenty_m(lat1, lon1, lat2, lon2))
+
+
+def _unit_vectors(lat, lon) -> np.ndarray:
+    """(N, 3) unit-sphere coordinates of lat/lon degrees"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+@dataclass
+class GeofenceMatch:
+    """A task geofence containing the queried point"""
+    task_id: str
+    distance_m: float
+    radius_m: float
+
+
+class GeofenceIndex:
+    """Spatial index over circular task geofences
+
+    Tasks are grouped by radius (powers of two) and each group is bucketed
+    on a grid over unit-sphere coordinates whose cells are at least as wide
+    as its largest radius, so a point only needs checking against the tasks
+    in its 27 neighbouring cells of each grid. All grids share one sorted
+    int64 key array, so a batch of points is a single searchsorted.
+    """
+
+    def __init__(self, tasks: Iterable[Tuple[str, float, float, float]] = ()):
+        self._tasks: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+        self._built = False
+        self._task_ids = np.empty(0, dtype=object)
+        self._lat = self._lon = self._radius = np.empty(0)
+        for task_id, lat, lon, radius_m in tasks:
+            self.add(task_id, lat, lon, radius_m)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def add(self, task_id: str, lat: float, lon: float, radius_m: float) -> None:
+        """Add or replace a task geofence"""
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius_m < 0:
+            raise ValueError(f"Invalid geofence for task {task_id}")
+        with self._lock:
+            self._tasks[task_id] = (float(lat), float(lon), float(radius_m))
+            self._built = False
+
+    def remove(self, task_id: str) -> None:
+        with self._lock:
+            if self._tasks.pop(task_id, None) is not None:
+                self._built = False
+
+    def _build(self) -> None:
+        """Rebuild the arrays and grid keys after tasks changed"""
+        ids = list(self._tasks)
+        values = np.array([self._tasks[task_id] for task_id in ids], dtype=np.float64).reshape(-1, 3)
+        self._task_ids = np.array(ids, dtype=object)
+        self._lat, self._lon, self._radius = values[:, 0], values[:, 1], values[:, 2]
+
+        # One grid per power-of-two radius class keeps a few large geofences
+        # from coarsening the cells used for all the small ones
+        radius_class = np.ceil(np.log2(np.maximum(self._radius, 1.0))).astype(np.int64)
+        classes, grid_of_task = np.unique(radius_class, return_inverse=True)
+        max_radius = np.array([self._radius[grid_of_task == g].max() for g in range(len(classes))])
+        chord = 2 * np.sin(np.minimum(max_radius * _SPHERE_MARGIN / (2 * EARTH_RADIUS_M), np.pi / 2))
+        self._cell = np.clip(chord, _MIN_CELL, 0.5)
+        self._n = (2.0 / self._cell).astype(np.int64) + 3
+        # Each grid owns the key range [offset, offset + n**3)
+        self._offset = np.concatenate([[0], np.cumsum(self._n ** 3)[:-1]]).astype(np.int64)
+
+        cells = self._cells(_unit_vectors(self._lat, self._lon)[:, None, :], grid_of_task[:, None])[:, 0]
+        keys = self._keys(cells, grid_of_task)
+        order = np.argsort(keys, kind="stable")
+        self._keys_sorted = keys[order]
+        self._members = order
+        self._built = True
+
+    def _cells(self, xyz: np.ndarray, grids: np.ndarray) -> np.ndarray:
+        """Integer cell of each point in each grid; shifted by one so neighbours stay >= 0"""
+        return np.floor((xyz + 1.0) / self._cell[grids][..., None]).astype(np.int64) + 1
+
+    def _keys(self, cells: np.ndarray, grids: np.ndarray) -> np.ndarray:
+        n = self._n[grids]
+        return self._offset[grids] + (cells[..., 0] * n + cells[..., 1]) * n + cells[..., 2]
+
+    def _candidates(self, xyz: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(point, task) index pairs sharing a neighbourhood of cells in any grid"""
+        grids = np.arange(len(self._cell))
+        cells = self._cells(xyz[:, None, :], grids[None, :])  # (points, grids, 3)
+        neighbour_keys = self._keys(
+            cells[:, :, None, :] + _NEIGHBOURS, grids[None, :, None]
+        ).ravel()
+        starts = np.searchsorted(self._keys_sorted, neighbour_keys, side="left")
+        counts = np.searchsorted(self._keys_sorted, neighbour_keys, side="right") - starts
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        # Expand the [start, start + count) ranges without a Python loop
+        points = np.repeat(np.arange(len(neighbour_keys)) // (len(grids) * len(_NEIGHBOURS)), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return points, self._members[np.repeat(starts, counts) + offsets]
+
+    def query_batch(self, lats, lons) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Geofences containing each point. Returns parallel arrays of point
+        index, task id, distance and geofence radius in meters, ordered by
+        point then distance. Ids and radii come from the same snapshot of
+        the index as the search, so concurrent changes cannot mislabel them
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        empty = np.empty(0, dtype=np.int64)
+        nothing = (empty, np.empty(0, dtype=object), np.empty(0), np.empty(0))
+        with self._lock:
+            if not self._built:
+                self._build()
+            if not self._tasks:
+                return nothing
+            points, tasks = self._candidates(_unit_vectors(lats, lons))
+            # _build replaces these arrays rather than changing them, so they stay consistent
+            task_ids, lat, lon, radius = self._task_ids, self._lat, self._lon, self._radius
+
+        # Cheap spherical pre-filter, then exact distances for the survivors.
+        # NaN coordinates fail the comparison and drop out here
+        near = haversine_m(lats[points], lons[points], lat[tasks], lon[tasks]) <= radius[tasks] * _SPHERE_MARGIN
+        points, tasks = points[near], tasks[near]
+        if len(points) == 0:
+            return nothing
+        distances = vincenty_m(lats[points], lons[points], lat[tasks], lon[tasks])
+        inside = distances <= radius[tasks]
+        points, tasks, distances = points[inside], tasks[inside], distances[inside]
+
+        order = np.lexsort((distances, points))
+        points, tasks = points[order], tasks[order]
+        return points, task_ids[tasks], distances[order], radius[tasks]
+
+    def query(self, lat: float, lon: float) -> List[GeofenceMatch]:
+        """Geofences containing the point, nearest first"""
+        _, task_ids, distances, radii = self.query_batch([lat], [lon])
+        return [
+            GeofenceMatch(task_id=task_id, distance_m=float(d), radius_m=float(r))
+            for task_id, d, r in zip(task_ids, distances, radii)
+        ]
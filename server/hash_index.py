@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Persistent near-duplicate index over 64-bit perceptual hashes
+SQLite holds the submissions; queries run against an in-memory multi-index
+hashing (MIH) structure built from it, so lookups never scan every hash
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from itertools import combinations
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SIGN_BIT = 1 << 63
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+@dataclass
+class HashMatch:
+    """A prior submission near the queried hash"""
+    submission_id: Optional[str]
+    user_id: Optional[str]
+    distance: int
+    phash: int
+    created_at: float
+
+
+def _to_signed(value: int) -> int:
+    """uint64 -> int64 for SQLite storage"""
+    return value - (1 << 64) if value & _SIGN_BIT else value
+
+
+def _to_unsigned(value: int) -> int:
+    """int64 from SQLite -> uint64"""
+    return value + (1 << 64) if value < 0 else value
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in each uint64"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values).astype(np.int64)
+    as_bytes = values.view(np.uint8).reshape(-1, 8)
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=1, dtype=np.int64)
+
+
+class PerceptualHashIndex:
+    """Near-duplicate lookup of 64-bit hashes within a Hamming radius
+
+    The hash is split into `chunks` equal substrings. If two hashes differ in
+    at most r bits, at least one substring differs in at most r // chunks
+    bits, so a query only probes those substring neighbourhoods in sorted
+    per-chunk tables and verifies the few candidates it finds.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS image_hashes (
+            id INTEGER PRIMARY KEY,
+            phash INTEGER NOT NULL,
+            dhash INTEGER,
+            whash INTEGER,
+            user_id TEXT,
+            submission_id TEXT,
+            created_at REAL NOT NULL
+        )
+    """
+
+    # New rows are kept in a small unsorted tail and merged into the sorted
+    # chunk tables once it grows past this size
+    MERGE_THRESHOLD = 4096
+
+    def __init__(self, db_path: str, max_distance: int = 8, chunks: int = 4):
+        if 64 % chunks:
+            raise ValueError("chunks must divide 64")
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.chunks = chunks
+        self.chunk_bits = 64 // chunks
+        self._lock = threading.Lock()
+        self._masks: Dict[int, np.ndarray] = {}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(self.SCHEMA)
+        self._conn.commit()
+
+        self._ids = np.empty(0, dtype=np.int64)
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._chunk_sorted: List[np.ndarray] = []
+        self._chunk_order: List[np.ndarray] = []
+        self._tail_ids: List[int] = []
+        self._tail_hashes: List[int] = []
+        self._max_id = 0
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._tail_ids)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add(self,
+            phash: int,
+            dhash: Optional[int] = None,
+            whash: Optional[int] = None,
+            user_id: Optional[str] = None,
+            submission_id: Optional[str] = None) -> int:
+        """Record a submission's hashes, returning its row id"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO image_hashes (phash, dhash, whash, user_id, submission_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    _to_signed(phash),
+                    _to_signed(dhash) if dhash is not None else None,
+                    _to_signed(whash) if whash is not None else None,
+                    user_id,
+                    submission_id,
+                    time.time(),
+                )
+            )
+            self._conn.commit()
+            # Pick up rows other processes wrote before ours, then ours
+            self._sync()
+            return cursor.lastrowid
+
+    def add_many(self,
+                 hashes: np.ndarray,
+                 user_ids: Optional[List[Optional[str]]] = None,
+                 submission_ids: Optional[List[Optional[str]]] = None) -> int:
+        """
+        Record a batch in one transaction, e.g. a backfill. hashes is an
+        (N, 3) uint64 array of phash, dhash, whash as perceptual_hash.hash_images
+        returns it. Returns the number of rows written
+        """
+        # Same bits as int64, which is how SQLite stores them
+        signed = np.ascontiguousarray(hashes, dtype=np.uint64).reshape(-1, 3).view(np.int64).tolist()
+        count = len(signed)
+        user_ids = user_ids or [None] * count
+        submission_ids = submission_ids or [None] * count
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO image_hashes (phash, dhash, whash, user_id, submission_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (phash, dhash, whash, user_id, submission_id, now)
+                    for (phash, dhash, whash), user_id, submission_id in zip(signed, user_ids, submission_ids)
+                )
+            )
+            self._conn.commit()
+            self._sync()
+        return count
+
+    def query(self,
+              phash: int,
+              max_distance: Optional[int] = None,
+              limit: int = 5) -> List[HashMatch]:
+        """Nearest prior submissions within max_distance, closest first"""
+        radius = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            self._sync()
+            row_ids, distances = self._search(phash, radius)
+            if len(row_ids) == 0:
+                return []
+            order = np.argsort(distances, kind="stable")[:limit]
+            row_ids = [int(row_ids[i]) for i in order]
+            distances = [int(distances[i]) for i in order]
+            placeholders = ",".join("?" * len(row_ids))
+            rows = self._conn.execute(
+                f"SELECT id, phash, user_id, submission_id, created_at "
+                f"FROM image_hashes WHERE id IN ({placeholders})",
+                row_ids
+            ).fetchall()
+
+        by_id = {row[0]: row for row in rows}
+        return [
+            HashMatch(
+                submission_id=by_id[row_id][3],
+                user_id=by_id[row_id][2],
+                distance=distance,
+                phash=_to_unsigned(by_id[row_id][1]),
+                created_at=by_id[row_id][4]
+            )
+            for row_id, distance in zip(row_ids, distances)
+            if row_id in by_id
+        ]
+
+    def _search(self, phash: int, radius: int):
+        """Row ids and distances of every indexed hash within radius"""
+        query = np.uint64(phash)
+        candidates = []
+
+        if len(self._ids):
+            masks = self._neighbourhood(radius // self.chunks)
+            chunk_mask = (1 << self.chunk_bits) - 1
+            for chunk in range(self.chunks):
+                value = (phash >> (chunk * self.chunk_bits)) & chunk_mask
+                table = self._chunk_sorted[chunk]
+                probes = np.bitwise_xor(masks, value).astype(table.dtype)
+                # For integers, the right edge of v is the left edge of v + 1
+                bounds = np.searchsorted(table, np.concatenate([probes, probes + 1]))
+                lefts = bounds[:len(probes)]
+                lengths = bounds[len(probes):] - lefts
+                # probes + 1 wraps at the top value; that range runs to the end
+                top = probes == np.iinfo(table.dtype).max
+                lengths[top] = len(table) - lefts[top]
+                total = int(lengths.sum())
+                if total:
+                    # Expand every [left, right) range into positions at once
+                    starts = np.repeat(lefts - np.cumsum(lengths) + lengths, lengths)
+                    candidates.append(self._chunk_order[chunk][starts + np.arange(total)])
+
+        row_ids = np.empty(0, dtype=np.int64)
+        distances = np.empty(0, dtype=np.int64)
+        if candidates:
+            positions = np.concatenate(candidates)
+            candidate_distances = popcount64(np.bitwise_xor(self._hashes[positions], query))
+            keep = candidate_distances <= radius
+            # A hash can be found through several chunks; dedupe the survivors
+            positions, first = np.unique(positions[keep], return_index=True)
+            row_ids = self._ids[positions]
+            distances = candidate_distances[keep][first]
+
+        if self._tail_ids:
+            tail_distances = popcount64(
+                np.bitwise_xor(np.array(self._tail_hashes, dtype=np.uint64), query)
+            )
+            keep = tail_distances <= radius
+            row_ids = np.concatenate([row_ids, np.array(self._tail_ids, dtype=np.int64)[keep]])
+            distances = np.concatenate([distances, tail_distances[keep]])
+
+        return row_ids, distances
+
+    def _neighbourhood(self, bits: int) -> np.ndarray:
+        """XOR masks of every chunk value within `bits` flipped bits"""
+        if bits not in self._masks:
+            masks = [0]
+            for weight in range(1, bits + 1):
+                for positions in combinations(range(self.chunk_bits), weight):
+                    mask = 0
+                    for position in positions:
+                        mask |= 1 << position
+                    masks.append(mask)
+            self._masks[bits] = np.array(masks, dtype=np.uint64)
+        return self._masks[bits]
+
+    def _sync(self) -> None:
+        """Append rows written since the last sync, by this or another process"""
+        rows = self._conn.execute(
+            "SELECT id, phash FROM image_hashes WHERE id > ? ORDER BY id",
+            (self._max_id,)
+        ).fetchall()
+        for row_id, phash in rows:
+            self._tail_ids.append(row_id)
+            self._tail_hashes.append(_to_unsigned(phash))
+        if rows:
+            self._max_id = rows[-1][0]
+        if len(self._tail_ids) >= self.MERGE_THRESHOLD:
+            self._merge_tail()
+
+    def _rebuild(self) -> None:
+        """Load every stored hash and build the sorted chunk tables"""
+        rows = self._conn.execute("SELECT id, phash FROM image_hashes ORDER BY id").fetchall()
+        self._ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._hashes = np.array([_to_unsigned(row[1]) for row in rows], dtype=np.uint64)
+        self._max_id = int(self._ids[-1]) if len(self._ids) else 0
+        self._tail_ids = []
+        self._tail_hashes = []
+        self._build_chunk_tables()
+        logger.info(f"Loaded {len(self._ids)} hashes into duplicate index {self.db_path}")
+
+    def _merge_tail(self) -> None:
+        self._ids = np.concatenate([self._ids, np.array(self._tail_ids, dtype=np.int64)])
+        self._hashes = np.concatenate([self._hashes, np.array(self._tail_hashes, dtype=np.uint64)])
+        self._tail_ids = []
+        self._tail_hashes = []
+        self._build_chunk_tables()
+
+    def _build_chunk_tables(self) -> None:
+        chunk_mask = np.uint64((1 << self.chunk_bits) - 1)
+        # Narrow tables keep the binary searches in cache
+        dtype = np.uint16 if self.chunk_bits <= 16 else (np.uint32 if self.chunk_bits <= 32 else np.uint64)
+        self._chunk_sorted = []
+        self._chunk_order = []
+        for chunk in range(self.chunks):
+            values = ((self._hashes >> np.uint64(chunk * self.chunk_bits)) & chunk_mask).astype(dtype)
+            order = np.argsort(values, kind="stable")
+            self._chunk_sorted.append(values[order])
+            self._chunk_order.append(order)
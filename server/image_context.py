@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Decoded image context for a single verification request
+Holds the upload bytes and every decoded view of them, each built lazily
+on first use so the checks in PhotoVerificationService share one decode
+"""
+
+import io
+import math
+import hashlib
+import logging
+import warnings
+from typing import Dict, Any, Optional, Union, Tuple
+
+from PIL import Image
+import piexif
+import numpy as np
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+# EXIF Orientation tag -> transform applied to an (H, W, C) array so the
+# decoded pixels match what cv2.imread(IMREAD_COLOR) would have produced
+_ORIENTATION_TRANSFORMS = {
+    2: lambda a: a[:, ::-1],
+    3: lambda a: a[::-1, ::-1],
+    4: lambda a: a[::-1],
+    5: lambda a: a.swapaxes(0, 1),
+    6: lambda a: a.swapaxes(0, 1)[:, ::-1],
+    7: lambda a: a.swapaxes(0, 1)[::-1, ::-1],
+    8: lambda a: a.swapaxes(0, 1)[::-1],
+}
+
+
+def _downscale(image: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Resize to size=(width, height) by area halving plus a final linear step"""
+    width, height = size
+    while image.shape[1] >= 2 * width and image.shape[0] >= 2 * height:
+        # Trim odd edges so the factor is exactly 2
+        even = image[:image.shape[0] // 2 * 2, :image.shape[1] // 2 * 2]
+        image = cv2.resize(even, (even.shape[1] // 2, even.shape[0] // 2), interpolation=cv2.INTER_AREA)
+    if (image.shape[1], image.shape[0]) == (width, height):
+        return image
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+class AnalysisView:
+    """The image at one analysis resolution, with lazily derived color spaces"""
+
+    def __init__(self, bgr: np.ndarray, scale: float):
+        self.bgr = bgr
+        self.scale = scale  # linear factor relative to the full-resolution image
+        self._gray = None
+        self._hsv = None
+
+    @classmethod
+    def of(cls, bgr: np.ndarray, max_edge: Optional[int] = None) -> "AnalysisView":
+        """A standalone view of a decoded array (e.g. a video frame), long edge at most max_edge"""
+        height, width = bgr.shape[:2]
+        if max_edge is None or max_edge >= max(height, width):
+            return cls(bgr, 1.0)
+        scale = max_edge / max(height, width)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return cls(_downscale(bgr, size), scale)
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def hsv(self) -> np.ndarray:
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+
+class _FullResolutionView(AnalysisView):
+    """Scale 1.0 view that shares the context's own gray/HSV arrays"""
+
+    def __init__(self, ctx: "ImageContext"):
+        super().__init__(ctx.bgr, 1.0)
+        self._ctx = ctx
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._ctx.gray
+
+    @property
+    def hsv(self) -> np.ndarray:
+        return self._ctx.hsv
+
+
+class ImageContext:
+    """
+    Per-request cache of raw bytes, PIL image, NumPy arrays and EXIF
+
+    Images with more than max_full_frame_pixels pixels are decoded reduced
+    by a power of two (see scale): pil, bgr, hsv and the views are then
+    smaller than the original, while gray stays full resolution (one byte
+    per pixel) for the checks that need every pixel.
+    """
+
+    def __init__(self,
+                 data: Optional[Union[bytes, bytearray, memoryview]] = None,
+                 path: Optional[str] = None,
+                 max_full_frame_pixels: Optional[int] = None):
+        if data is None and path is None:
+            raise ValueError("ImageContext needs either image bytes or a path")
+        self.path = path
+        self.max_full_frame_pixels = max_full_frame_pixels
+        self._raw = data
+        self._sha256 = None
+        self._pil = None
+        self._header_size = None
+        self._scale = 1.0
+        self._bgr = None
+        self._gray = None
+        self._hsv = None
+        self._exif = None
+        self._exif_loaded = False
+        self._views: Dict[Optional[int], AnalysisView] = {}
+
+    @classmethod
+    def from_path(cls, image_path: str, max_full_frame_pixels: Optional[int] = None) -> "ImageContext":
+        """Create a context that reads the file on first access"""
+        return cls(path=image_path, max_full_frame_pixels=max_full_frame_pixels)
+
+    @classmethod
+    def from_bytes(cls,
+                   data: Union[bytes, bytearray, memoryview],
+                   max_full_frame_pixels: Optional[int] = None) -> "ImageContext":
+        """Create a context over a buffer that is already in memory (not copied)"""
+        return cls(data=data, max_full_frame_pixels=max_full_frame_pixels)
+
+    def __enter__(self) -> "ImageContext":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    @property
+    def raw(self) -> Union[bytes, bytearray, memoryview]:
+        """Encoded upload bytes"""
+        if self._raw is None:
+            with open(self.path, "rb") as f:
+                self._raw = f.read()
+        return self._raw
+
+    @property
+    def sha256(self) -> str:
+        """Hex SHA-256 of the upload bytes"""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.raw).hexdigest()
+        return self._sha256
+
+    def _open(self) -> Image.Image:
+        with warnings.catch_warnings():
+            # The service enforces its own pixel limit from size before decoding
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            return Image.open(io.BytesIO(self.raw))
+
+    @property
+    def pil(self) -> Image.Image:
+        """
+        PIL image opened over the raw bytes (pixels decoded on first load).
+        Over max_full_frame_pixels, JPEGs are reduced by DCT scaling inside
+        the decoder (Image.draft) and other formats right after decoding
+        """
+        if self._pil is None:
+            image = self._open()
+            self._header_size = image.size
+            factor = self._reduction_factor(image.size)
+            if factor > 1:
+                width, height = image.size
+                image.draft(None, (math.ceil(width / factor), math.ceil(height / factor)))
+                remaining = factor * image.size[0] // width
+                if remaining > 1:
+                    image = image.reduce(remaining)
+                self._scale = image.size[0] / width
+            self._pil = image
+        return self._pil
+
+    def _reduction_factor(self, size: Tuple[int, int]) -> int:
+        """Smallest power of two that brings size within max_full_frame_pixels"""
+        limit = self.max_full_frame_pixels
+        factor = 1
+        while limit and size[0] * size[1] > limit * factor * factor:
+            factor *= 2
+        return factor
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Full-resolution (width, height) after orientation, read from the header alone"""
+        self.pil
+        width, height = self._header_size
+        return (height, width) if self.orientation in (5, 6, 7, 8) else (width, height)
+
+    @property
+    def scale(self) -> float:
+        """Linear size of pil/bgr relative to the full-resolution image"""
+        self.pil
+        return self._scale
+
+    @property
+    def bgr(self) -> Optional[np.ndarray]:
+        """Orientation-corrected BGR array, or None if the image cannot be decoded"""
+        if self._bgr is None:
+            try:
+                image = self.pil
+                if image.mode != "RGB":
+                    image = image.convert("RGB")
+                rgb = np.asarray(image)
+                transform = _ORIENTATION_TRANSFORMS.get(self.orientation)
+                if transform is not None:
+                    rgb = transform(rgb)
+                self._bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+            except Exception as e:
+                logger.warning(f"Could not decode image pixels: {e}")
+                return None
+        return self._bgr
+
+    @property
+    def gray(self) -> Optional[np.ndarray]:
+        """Full-resolution grayscale image"""
+        if self._gray is None:
+            if self.scale < 1.0:
+                self._gray = self._full_resolution_gray()
+            elif self.bgr is not None:
+                self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def _full_resolution_gray(self) -> Optional[np.ndarray]:
+        """Luminance decoded on its own, for images whose color decode was reduced"""
+        try:
+            image = self._open()
+            # JPEG: decode the Y channel only, skipping color conversion
+            image.draft("L", image.size)
+            if image.mode != "L":
+                image = image.convert("L")
+            gray = np.asarray(image)
+            transform = _ORIENTATION_TRANSFORMS.get(self.orientation)
+            return np.ascontiguousarray(transform(gray)) if transform is not None else gray
+        except Exception as e:
+            logger.warning(f"Could not decode image luminance: {e}")
+            return None
+
+    @property
+    def hsv(self) -> Optional[np.ndarray]:
+        """HSV view of the BGR array"""
+        if self._hsv is None and self.bgr is not None:
+            self._hsv = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+    @property
+    def exif(self) -> Optional[Dict[str, Any]]:
+        """Parsed piexif dict, or None if the image carries no readable EXIF"""
+        if not self._exif_loaded:
+            self._exif_loaded = True
+            try:
+                self._exif = piexif.load(self.pil.info.get("exif", b""))
+            except Exception as e:
+                logger.debug(f"No readable EXIF block: {e}")
+                self._exif = None
+        return self._exif
+
+    @property
+    def orientation(self) -> int:
+        """EXIF Orientation tag (1 when absent)"""
+        exif = self.exif or {}
+        return exif.get("0th", {}).get(piexif.ImageIFD.Orientation, 1)
+
+    def view(self, max_edge: Optional[int] = None) -> Optional[AnalysisView]:
+        """
+        The image downscaled so its long edge is at most max_edge
+
+        Levels are built once per request, each from the smallest level
+        already built that is still large enough: exact 2x INTER_AREA steps
+        (OpenCV's fast path) while at least 2x too large, then one INTER_LINEAR
+        step of under 2x. None (or an edge at least as large as the image)
+        gives the full-resolution view, or the decoded size for reduced images.
+        """
+        if self.bgr is None:
+            return None
+        full_edge = max(self.size)
+        if max_edge is None or max_edge >= max(self.bgr.shape[:2]):
+            max_edge = None
+        if max_edge in self._views:
+            return self._views[max_edge]
+
+        if max_edge is None:
+            # Reduced images get their own gray, as ctx.gray is full resolution
+            view = _FullResolutionView(self) if self.scale == 1.0 else AnalysisView(self.bgr, self.scale)
+        else:
+            larger = [edge for edge in self._views if edge is not None and edge > max_edge]
+            source = self._views[min(larger)].bgr if larger else self.bgr
+            scale = max_edge / full_edge
+            width, height = self.size
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            view = AnalysisView(_downscale(source, size), scale)
+        self._views[max_edge] = view
+        return view
+
+    def close(self) -> None:
+        """Release the decoded views so peak memory ends with the request"""
+        if self._pil is not None:
+            self._pil.close()
+        self._pil = None
+        self._bgr = None
+        self._gray = None
+        self._hsv = None
+        self._views = {}
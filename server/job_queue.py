@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Durable queue of asynchronous verification jobs
+Jobs are rows in a SQLite (WAL) table next to the upload they verify, so a
+job accepted by POST /jobs survives restarts. Consumers claim the highest
+priority job with a lease: a job whose consumer died is handed out again
+once its lease runs out. Callbacks to the submitter are tracked on the
+same row and retried with backoff until delivered or given up on
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from response_encoding import encode
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Callback states
+CALLBACK_PENDING = "pending"
+CALLBACK_DELIVERED = "delivered"
+CALLBACK_FAILED = "failed"
+
+# Longest wait between attempts of a retried job or callback
+MAX_BACKOFF_SECONDS = 300
+
+
+class QueueFull(Exception):
+    """The queue already holds max_queued unfinished jobs"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    """One row of the jobs table"""
+    id: str
+    kind: str  # "photo" or "video"
+    task_type: str
+    priority: int
+    status: str
+    params: Dict[str, Any]
+    upload_path: Optional[str]
+    callback_url: Optional[str]
+    callback_status: Optional[str]
+    callback_attempts: int
+    attempts: int
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The job as GET /jobs/{id} and callbacks report it"""
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "kind": self.kind,
+            "task_type": self.task_type,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "created_at": _isoformat(self.created_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+        }
+        if self.result is not None:
+            job["result"] = self.result
+        if self.error is not None:
+            job["error"] = self.error
+        if self.callback_url is not None:
+            job["callback"] = {
+                "url": self.callback_url,
+                "status": self.callback_status,
+                "attempts": self.callback_attempts
+            }
+        return job
+
+
+class JobQueue:
+    """SQLite-backed job queue, safe to share between API processes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            task_type TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            params TEXT NOT NULL,
+            upload_path TEXT,
+            callback_url TEXT,
+            callback_status TEXT,
+            callback_attempts INTEGER NOT NULL DEFAULT 0,
+            callback_next_at REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            available_at REAL NOT NULL,
+            started_at REAL,
+            lease_expires_at REAL,
+            finished_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_by_priority ON jobs (status, priority DESC, created_at);
+        CREATE INDEX IF NOT EXISTS jobs_by_callback ON jobs (callback_status, callback_next_at);
+    """
+
+    COLUMNS = (
+        "id, kind, task_type, priority, status, params, upload_path, callback_url, "
+        "callback_status, callback_attempts, attempts, result, error, created_at, "
+        "started_at, finished_at"
+    )
+
+    def __init__(self,
+                 db_path: str,
+                 max_queued: int = 10000,
+                 lease_seconds: float = 300.0,
+                 max_attempts: int = 3,
+                 max_callback_attempts: int = 8,
+                 retry_after: int = 30):
+        self.db_path = db_path
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.max_callback_attempts = max(1, max_callback_attempts)
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit, so claims can take the write lock up front
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(self.SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "JobQueue":
+        return cls(
+            config.get("job_queue_path", "data/jobs.sqlite"),
+            max_queued=int(config.get("job_max_queued", 10000)),
+            lease_seconds=float(config.get("job_lease_seconds", 300)),
+            max_attempts=int(config.get("job_max_attempts", 3)),
+            max_callback_attempts=int(config.get("job_callback_attempts", 8)),
+            retry_after=int(config.get("job_retry_after_seconds", 30))
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def submit(self,
+               kind: str,
+               task_type: str,
+               params: Dict[str, Any],
+               upload_path: Optional[str],
+               priority: int = 0,
+               callback_url: Optional[str] = None,
+               job_id: Optional[str] = None,
+               result: Optional[Dict[str, Any]] = None,
+               now: Optional[float] = None) -> str:
+        """
+        Queue a job and return its ID. A job submitted with a result is
+        recorded as already done (its callback is still sent). Raises
+        QueueFull when max_queued jobs are waiting or running
+        """
+        now = time.time() if now is None else now
+        job_id = job_id or uuid.uuid4().hex
+        status = QUEUED if result is None else DONE
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if status == QUEUED and self._unfinished() >= self.max_queued:
+                    raise QueueFull(self.retry_after)
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, task_type, priority, status, params, upload_path, "
+                    "callback_url, callback_status, callback_next_at, result, created_at, available_at, "
+                    "finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, task_type, priority, status, json.dumps(params), upload_path,
+                     callback_url, CALLBACK_PENDING if callback_url else None, now if callback_url else None,
+                     _dumps(result) if result is not None else None, now, now,
+                     now if result is not None else None)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim(self, now: Optional[float] = None) -> Optional[Job]:
+        """
+        Lease the next job to a consumer: the highest priority queued job
+        that is due, oldest first, or failing that a running job whose lease
+        ran out (its consumer died). None when there is nothing to do
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A job that took its consumer down max_attempts times is not retried again
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL, "
+                    "callback_next_at = ? WHERE status = ? AND lease_expires_at <= ? AND attempts >= ?",
+                    (FAILED, f"Abandoned after {self.max_attempts} attempts", now, now,
+                     RUNNING, now, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? AND available_at <= ? "
+                    "ORDER BY priority DESC, created_at LIMIT 1",
+                    (QUEUED, now)
+                ).fetchone()
+                if row is None:
+                    row = self._conn.execute(
+                        "SELECT id FROM jobs WHERE status = ? AND lease_expires_at <= ? "
+                        "ORDER BY priority DESC, created_at LIMIT 1",
+                        (RUNNING, now)
+                    ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, "
+                        "lease_expires_at = ? WHERE id = ?",
+                        (RUNNING, now, now + self.lease_seconds, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._load(row[0]) if row is not None else None
+
+    def complete(self, job_id: str, result: Dict[str, Any], now: Optional[float] = None) -> None:
+        """Store a finished job's result"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, "
+                "lease_expires_at = NULL, callback_next_at = ? WHERE id = ?",
+                (DONE, _dumps(result), now, now, job_id)
+            )
+
+    def fail(self, job_id: str, error: str, now: Optional[float] = None) -> bool:
+        """
+        Record a failed attempt: the job is queued again with backoff until
+        it has had max_attempts, then marked FAILED. Returns whether it was
+        requeued
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            attempts = row[0]
+            if attempts < self.max_attempts:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_expires_at = NULL "
+                    "WHERE id = ?",
+                    (QUEUED, error, now + _backoff(attempts), job_id)
+                )
+                return True
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL, "
+                "callback_next_at = ? WHERE id = ?",
+                (FAILED, error, now, now, job_id)
+            )
+            return False
+
+    def release(self, job_id: str, delay: float = 0.0, now: Optional[float] = None) -> None:
+        """Put a claimed job back without counting the attempt (e.g. the workers were busy)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(0, attempts - 1), available_at = ?, "
+                "lease_expires_at = NULL WHERE id = ? AND status = ?",
+                (QUEUED, now + delay, job_id, RUNNING)
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._load(job_id)
+
+    def depth(self) -> int:
+        """Jobs waiting or running"""
+        with self._lock:
+            return self._unfinished()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each state"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+    def claim_callbacks(self, limit: int = 16, now: Optional[float] = None) -> List[Job]:
+        """
+        Finished jobs whose callback is due, leased for lease_seconds so
+        other processes do not send the same callback meanwhile
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [row[0] for row in self._conn.execute(
+                    "SELECT id FROM jobs WHERE callback_status = ? AND callback_next_at <= ? "
+                    "AND status IN (?, ?) ORDER BY callback_next_at LIMIT ?",
+                    (CALLBACK_PENDING, now, DONE, FAILED, limit)
+                )]
+                self._conn.executemany(
+                    "UPDATE jobs SET callback_next_at = ? WHERE id = ?",
+                    [(now + self.lease_seconds, job_id) for job_id in ids]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return [job for job in map(self._load, ids) if job is not None]
+
+    def record_callback(self, job_id: str, delivered: bool, now: Optional[float] = None) -> None:
+        """Outcome of one callback attempt; failures are retried with backoff up to max_callback_attempts"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute("SELECT callback_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            attempts = row[0] + 1
+            if delivered:
+                status, next_at = CALLBACK_DELIVERED, None
+            elif attempts >= self.max_callback_attempts:
+                status, next_at = CALLBACK_FAILED, None
+            else:
+                status, next_at = CALLBACK_PENDING, now + _backoff(attempts)
+            self._conn.execute(
+                "UPDATE jobs SET callback_status = ?, callback_attempts = ?, callback_next_at = ? WHERE id = ?",
+                (status, attempts, next_at, job_id)
+            )
+
+    def purge(self, older_than_s: float, now: Optional[float] = None) -> int:
+        """
+        Delete finished jobs older than older_than_s whose callback is not
+        still pending, along with any upload they left behind; returns how many
+        """
+        now = time.time() if now is None else now
+        where = ("status IN (?, ?) AND finished_at < ? "
+                 "AND (callback_status IS NULL OR callback_status != ?)")
+        args = (DONE, FAILED, now - older_than_s, CALLBACK_PENDING)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                paths = [row[0] for row in self._conn.execute(
+                    f"SELECT upload_path FROM jobs WHERE {where} AND upload_path IS NOT NULL", args
+                )]
+                count = self._conn.execute(f"DELETE FROM jobs WHERE {where}", args).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        for path in paths:
+            _unlink(path)
+        return count
+
+    def _unfinished(self) -> int:
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchone()
+        return count
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        row = self._conn.execute(f"SELECT {self.COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        (job_id, kind, task_type, priority, status, params, upload_path, callback_url, callback_status,
+         callback_attempts, attempts, result, error, created_at, started_at, finished_at) = row
+        return Job(
+            id=job_id,
+            kind=kind,
+            task_type=task_type,
+            priority=priority,
+            status=status,
+            params=json.loads(params),
+            upload_path=upload_path,
+            callback_url=callback_url,
+            callback_status=callback_status,
+            callback_attempts=callback_attempts,
+            attempts=attempts,
+            result=json.loads(result) if result is not None else None,
+            error=error,
+            created_at=created_at,
+            started_at=started_at,
+            finished_at=finished_at
+        )
+
+
+def job_priority(task_type: str, config: Dict = None) -> int:
+    """Priority of a task type's jobs (job_priorities, default 0); higher runs first"""
+    priorities = (config or {}).get("job_priorities") or {}
+    return int(priorities.get(task_type, 0))
+
+
+def _dumps(result: Dict[str, Any]) -> str:
+    """A result as JSON text, datetimes and EXIF bytes included"""
+    return encode(result).decode("utf-8")
+
+
+def _backoff(attempts: int) -> float:
+    return float(min(MAX_BACKOFF_SECONDS, 2 ** attempts))
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
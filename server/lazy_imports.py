@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Deferred imports for heavy optional modules
+A lazy module is a placeholder that imports the real module on first
+attribute access, so modules only needed on some code paths do not cost
+start-up time. preload() imports them all ahead of traffic.
+"""
+
+import time
+import types
+import logging
+import importlib
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_lazy_modules: Dict[str, "LazyModule"] = {}
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports the real module on first use"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_loaded"] = False
+
+    def _load(self) -> types.ModuleType:
+        with _lock:
+            module = importlib.import_module(self.__name__)
+            if not self.__dict__["_lazy_loaded"]:
+                # Copy the module namespace so later lookups skip __getattr__
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_loaded"] = True
+        return module
+
+    def __getattr__(self, attr: str):
+        # Only called for names missing from the placeholder's own namespace
+        return getattr(self._load(), attr)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_loaded"] else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Placeholder for the named module, imported on first attribute access"""
+    with _lock:
+        module = _lazy_modules.get(name)
+        if module is None:
+            module = _lazy_modules[name] = LazyModule(name)
+    return module
+
+
+def preload(names: Optional[List[str]] = None) -> Dict[str, float]:
+    """
+    Import the given lazy modules (all registered ones by default) and
+    return the seconds each import took
+    """
+    timings = {}
+    for name in names or list(_lazy_modules):
+        start = time.perf_counter()
+        try:
+            lazy_import(name)._load()
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def loaded_modules() -> List[str]:
+    """Registered lazy modules that have been imported"""
+    return sorted(name for name, module in _lazy_modules.items() if module.__dict__["_lazy_loaded"])
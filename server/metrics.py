@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+In-process metrics in the Prometheus text exposition format
+Counters, gauges and histograms with labels, kept in the API process.
+Pool workers report per-stage timings back with each result, so nothing
+needs sharing between processes.
+"""
+
+import math
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from sub-millisecond stages up to the verification timeout
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = tuple(float(1 << shift) for shift in range(14, 27))  # 16 KiB .. 64 MiB
+PIXEL_BUCKETS = (0.3e6, 1e6, 2e6, 4e6, 8e6, 12e6, 16e6, 24e6, 48e6, 100e6)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Current value, read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name} {_format_value(self.callback())}"
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts with a final +Inf slot, sum)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """Named set of metrics rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+class VerificationMetrics:
+    """The verification service's metric families"""
+
+    def __init__(self, engine=None):
+        self.registry = MetricsRegistry()
+        r = self.registry
+        self.requests = r.counter(
+            "civitas_verifications_total", "Photo verifications by endpoint and outcome", ("endpoint", "outcome")
+        )
+        self.latency = r.histogram(
+            "civitas_verification_seconds", "End-to-end verification latency, including queueing", ("endpoint",)
+        )
+        self.stage_latency = r.histogram(
+            "civitas_verification_stage_seconds", "Time spent in each verification stage", ("stage",)
+        )
+        self.upload_bytes = r.histogram(
+            "civitas_upload_bytes", "Size of uploaded photos", buckets=BYTES_BUCKETS
+        )
+        self.decoded_pixels = r.histogram(
+            "civitas_decoded_pixels", "Pixel count of decoded photos", buckets=PIXEL_BUCKETS
+        )
+        self.cache_requests = r.counter(
+            "civitas_result_cache_requests_total", "Result cache lookups by result", ("result",)
+        )
+        if engine is not None:
+            r.gauge("civitas_workers", "Verification worker pool size", lambda: engine.pool_size)
+            r.gauge("civitas_in_flight", "Verifications admitted and not finished", lambda: engine.in_flight)
+            r.gauge("civitas_queue_depth", "Verifications waiting for a free worker", lambda: engine.queue_depth)
+
+    def observe(self, endpoint: str, outcome: str, seconds: float,
+                upload_bytes: Optional[int] = None,
+                timings: Optional[Dict[str, float]] = None,
+                counters: Optional[Dict[str, float]] = None) -> None:
+        """Record one finished verification"""
+        self.requests.inc(endpoint=endpoint, outcome=outcome)
+        self.latency.observe(seconds, endpoint=endpoint)
+        if upload_bytes is not None:
+            self.upload_bytes.observe(upload_bytes)
+        for stage, stage_seconds in (timings or {}).items():
+            self.stage_latency.observe(stage_seconds, stage=stage)
+        counters = counters or {}
+        if "decoded_pixels" in counters:
+            self.decoded_pixels.observe(counters["decoded_pixels"])
+        for result in ("hit", "miss"):
+            if counters.get(f"result_cache_{result}"):
+                self.cache_requests.inc(counters[f"result_cache_{result}"], result=result)
+
+    def render(self) -> str:
+        return self.registry.render()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Single-pass perceptual hashing (pHash, dHash, wHash)
+Converts an image to grayscale and resamples it once, to the wHash working
+size, then derives all three 64-bit hashes from that small copy. wHash
+matches imagehash's bit for bit, except that blocks tying with the median
+(flat sky, say) are always 0 where imagehash's floating-point wavelets
+break the tie either way; pHash and dHash, resampled from the working copy
+rather than the full frame, stay within a few bits of imagehash. Only the
+coefficients the hashes keep are computed: the 8x8 low-frequency DCT block
+for pHash, and for wHash the Haar approximation band, which after removing
+the top-level LL (a constant offset) orders exactly like 8x8 block sums.
+Hashes are packed uint64 with the first bit most significant, so they print
+in the same hex form as imagehash.
+"""
+
+import io
+import math
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+# pHash takes the DCT of a 32x32 image (hash size x highfreq factor 4)
+PHASH_IMAGE_SIZE = 32
+# Column order of hash_images output
+HASH_COLUMNS = ("phash", "dhash", "whash")
+
+ImageSource = Union[Image.Image, bytes, bytearray, memoryview, str]
+
+
+@dataclass(frozen=True)
+class ImageHashes:
+    """The three perceptual hashes of one image, as packed uint64 values"""
+    phash: int
+    dhash: int
+    whash: int
+
+    def hex(self) -> Dict[str, str]:
+        return {name: f"{getattr(self, name):016x}" for name in HASH_COLUMNS}
+
+
+@lru_cache(maxsize=4)
+def _dct_rows(size: int, keep: int) -> np.ndarray:
+    """First keep rows of the (unnormalised, scipy type II) DCT matrix"""
+    k = np.arange(keep)[:, None]
+    n = np.arange(size)[None, :]
+    return 2.0 * np.cos(np.pi * k * (2 * n + 1) / (2 * size))
+
+
+def _pack(bits: np.ndarray) -> int:
+    """8x8 booleans -> uint64, row-major with the first bit most significant"""
+    return int(np.packbits(bits.ravel()).view(">u8")[0])
+
+
+def _phash(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((PHASH_IMAGE_SIZE, PHASH_IMAGE_SIZE), Image.LANCZOS), dtype=np.float64)
+    rows = _dct_rows(PHASH_IMAGE_SIZE, HASH_SIZE)
+    low = rows @ pixels @ rows.T
+    return _pack(low > np.median(low))
+
+
+def _dhash(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS))
+    return _pack(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _whash(working: Image.Image) -> int:
+    """wHash of the grayscale image already resized to its square working size"""
+    scale = working.width
+    pixels = np.asarray(working)
+    block = scale // HASH_SIZE
+    sums = pixels.reshape(HASH_SIZE, block, HASH_SIZE, block).sum(axis=(1, 3), dtype=np.int64)
+    return _pack(sums > np.median(sums))
+
+
+def whash_scale_for(size: Tuple[int, int]) -> int:
+    """imagehash's default wHash working size: the largest power of two within the short side"""
+    return max(2 ** int(math.log2(min(size))), HASH_SIZE)
+
+
+def compute_hashes(image: Image.Image, whash_scale: Optional[int] = None) -> ImageHashes:
+    """
+    pHash, dHash and wHash of image. whash_scale overrides the wavelet
+    working size, e.g. to hash a reduced decode as its full-size original
+    """
+    gray = image if image.mode == "L" else image.convert("L")
+    scale = max(whash_scale or whash_scale_for(image.size), HASH_SIZE)
+    if scale & (scale - 1):
+        raise ValueError(f"whash_scale must be a power of two, got {scale}")
+    working = gray.resize((scale, scale), Image.LANCZOS)
+    # The only full-frame pass; pHash and dHash shrink the working copy unless
+    # it is an upscale (whash_scale over the image's size) or too small to shrink
+    base = working if PHASH_IMAGE_SIZE <= scale and scale * scale <= gray.width * gray.height else gray
+    return ImageHashes(phash=_phash(base), dhash=_dhash(base), whash=_whash(working))
+
+
+def _hash_source(source: ImageSource) -> ImageHashes:
+    if isinstance(source, Image.Image):
+        return compute_hashes(source)
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as image:
+        return compute_hashes(image)
+
+
+def hash_images(sources: Iterable[ImageSource], workers: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash a batch of PIL images, encoded bytes or file paths into an (N, 3)
+    uint64 array (columns HASH_COLUMNS) and an N-long mask of the rows
+    that hashed; failed rows are zero. Pillow releases the GIL while
+    decoding and resizing, so workers > 1 hashes in parallel threads
+    """
+    sources = list(sources)
+    hashes = np.zeros((len(sources), len(HASH_COLUMNS)), dtype=np.uint64)
+    ok = np.zeros(len(sources), dtype=bool)
+
+    def run(index: int) -> None:
+        try:
+            result = _hash_source(sources[index])
+        except Exception as e:
+            logger.warning(f"Could not hash image {index}: {e}")
+            return
+        hashes[index] = (result.phash, result.dhash, result.whash)
+        ok[index] = True
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, range(len(sources))))
+    else:
+        for index in range(len(sources)):
+            run(index)
+    return hashes, ok
@@ -8,11 +8,16 @@ import FormData from 'form-data';
 import fs from 'fs';
 import path from 'path';
 
+// What processVerificationResults and the submission UI read
+const DEFAULT_RESULT_FIELDS = ['is_valid', 'score', 'issues', 'recommendations'];
+
 export class PhotoVerificationService {
     constructor(config = {}) {
         this.baseUrl = config.baseUrl || 'http://localhost:8000';
         this.timeout = config.timeout || 30000;
         this.maxRetries = config.maxRetries || 3;
+        // Result fields the Python service sends back ("*" for all of them)
+        this.resultFields = encodeURIComponent((config.resultFields || DEFAULT_RESULT_FIELDS).join(','));
     }
 
     /**
@@ -35,7 +40,7 @@ export class PhotoVerificationService {
             formData.append('user_id', verificationData.userId);
             formData.append('requires_video', verificationData.requiresVideo || false);
 
-            const response = await this._makeRequest('/verify-photo', formData, {
+            const response = await this._makeRequest(`/verify-photo?fields=${this.resultFields}`, formData, {
                 headers: {
                     ...formData.getHeaders(),
                 }
@@ -78,7 +83,7 @@ export class PhotoVerificationService {
             formData.append('deadline_end', verificationData.deadlineEnd);
             formData.append('user_id', verificationData.userId);
 
-            const response = await this._makeRequest('/verify-multiple-photos', formData, {
+            const response = await this._makeRequest(`/verify-multiple-photos?fields=${this.resultFields}`, formData, {
                 headers: {
                     ...formData.getHeaders(),
                 }
@@ -130,6 +135,85 @@ export class PhotoVerificationService {
         }
     }
 
+    /**
+     * Queue a photo or video for verification without waiting for the result.
+     * Resolves with the job ID as soon as the upload is stored; the result is
+     * read with getVerificationJob or POSTed to callbackUrl when it is ready
+     */
+    async submitVerificationJob(filePath, verificationData) {
+        try {
+            const formData = new FormData();
+            
+            formData.append('file', fs.createReadStream(filePath));
+            formData.append('task_type', verificationData.taskType);
+            formData.append('location_lat', verificationData.location.lat);
+            formData.append('location_lng', verificationData.location.lng);
+            formData.append('location_radius', verificationData.locationRadius || 100);
+            formData.append('deadline_start', verificationData.deadlineStart);
+            formData.append('deadline_end', verificationData.deadlineEnd);
+            formData.append('user_id', verificationData.userId);
+            formData.append('requires_video', verificationData.requiresVideo || false);
+            if (verificationData.callbackUrl) {
+                formData.append('callback_url', verificationData.callbackUrl);
+            }
+
+            const response = await this._makeRequest(`/jobs?fields=${this.resultFields}`, formData, {
+                headers: {
+                    ...formData.getHeaders(),
+                }
+            });
+
+            return {
+                success: true,
+                data: response.data,
+                filename: path.basename(filePath)
+            };
+
+        } catch (error) {
+            console.error('Verification job submission failed:', error);
+            return {
+                success: false,
+                error: error.message,
+                filename: path.basename(filePath)
+            };
+        }
+    }
+
+    /**
+     * Current state of a verification job: queued, running, done (with result) or failed (with error)
+     */
+    async getVerificationJob(jobId) {
+        try {
+            const response = await this._makeRequest(`/jobs/${encodeURIComponent(jobId)}?fields=${this.resultFields}`);
+            return {
+                success: true,
+                data: response.data
+            };
+        } catch (error) {
+            return {
+                success: false,
+                error: error.message
+            };
+        }
+    }
+
+    /**
+     * Poll a verification job until it is done or failed, or timeoutMs passes
+     */
+    async waitForVerificationJob(jobId, pollIntervalMs = 2000, timeoutMs = 300000) {
+        const deadline = Date.now() + timeoutMs;
+        while (true) {
+            const job = await this.getVerificationJob(jobId);
+            if (!job.success || job.data.status === 'done' || job.data.status === 'failed') {
+                return job;
+            }
+            if (Date.now() + pollIntervalMs > deadline) {
+                return { success: false, data: job.data, error: `Verification job ${jobId} still ${job.data.status}` };
+            }
+            await new Promise(resolve => setTimeout(resolve, pollIntervalMs));
+        }
+    }
+
     /**
      * Check service health
      */
@@ -12,6 +12,8 @@ type ServiceConfig = {
   baseUrl?: string;
   timeout?: number;
   maxRetries?: number;
+  // Result fields the Python service sends back ("*" for all of them)
+  resultFields?: string[];
 };
 
 type VerificationData = {
@@ -24,15 +26,20 @@ type VerificationData = {
   requiresVideo?: boolean;
 };
 
+// What processVerificationResults and the submission UI read
+const DEFAULT_RESULT_FIELDS = ['is_valid', 'score', 'issues', 'recommendations'];
+
 export class PhotoVerificationService {
   private baseUrl: string;
   private timeout: number;
   private maxRetries: number;
+  private resultFields: string;
 
   constructor(config: ServiceConfig = {}) {
     this.baseUrl = config.baseUrl || 'http://localhost:8000';
     this.timeout = config.timeout ?? 30000;
     this.maxRetries = config.maxRetries ?? 3;
+    this.resultFields = encodeURIComponent((config.resultFields ?? DEFAULT_RESULT_FIELDS).join(','));
   }
 
   /**
@@ -53,7 +60,7 @@ export class PhotoVerificationService {
       formData.append('user_id', verificationData.userId);
       formData.append('requires_video', String(verificationData.requiresVideo ?? false));
 
-      const response = await this._makeRequest('/verify-photo', formData, {
+      const response = await this._makeRequest(`/verify-photo?fields=${this.resultFields}`, formData, {
         headers: {
           ...(formData as any).getHeaders?.(),
         },
@@ -93,7 +100,7 @@ export class PhotoVerificationService {
       formData.append('deadline_end', verificationData.deadlineEnd);
       formData.append('user_id', verificationData.userId);
 
-      const response = await this._makeRequest('/verify-multiple-photos', formData, {
+      const response = await this._makeRequest(`/verify-multiple-photos?fields=${this.resultFields}`, formData, {
         headers: {
           ...(formData as any).getHeaders?.(),
         },
@@ -143,6 +150,83 @@ export class PhotoVerificationService {
     }
   }
 
+  /**
+   * Queue a photo or video for verification without waiting for the result.
+   * Resolves with the job ID as soon as the upload is stored; the result is
+   * read with getVerificationJob or POSTed to callbackUrl when it is ready
+   */
+  async submitVerificationJob(filePath: string, verificationData: VerificationData & { callbackUrl?: string }): Promise<{ success: boolean; data?: any; error?: string; filename?: string }>{
+    try {
+      const formData = new FormData();
+      formData.append('file', fs.createReadStream(filePath));
+      formData.append('task_type', verificationData.taskType);
+      formData.append('location_lat', String(verificationData.location.lat));
+      formData.append('location_lng', String(verificationData.location.lng));
+      formData.append('location_radius', String(verificationData.locationRadius ?? 100));
+      formData.append('deadline_start', verificationData.deadlineStart);
+      formData.append('deadline_end', verificationData.deadlineEnd);
+      formData.append('user_id', verificationData.userId);
+      formData.append('requires_video', String(verificationData.requiresVideo ?? false));
+      if (verificationData.callbackUrl) {
+        formData.append('callback_url', verificationData.callbackUrl);
+      }
+
+      const response = await this._makeRequest(`/jobs?fields=${this.resultFields}`, formData, {
+        headers: {
+          ...(formData as any).getHeaders?.(),
+        },
+      });
+
+      return {
+        success: true,
+        data: response.data,
+        filename: path.basename(filePath),
+      };
+    } catch (error: any) {
+      console.error('Verification job submission failed:', error);
+      return {
+        success: false,
+        error: error.message,
+        filename: path.basename(filePath),
+      };
+    }
+  }
+
+  /**
+   * Current state of a verification job: queued, running, done (with result) or failed (with error)
+   */
+  async getVerificationJob(jobId: string): Promise<{ success: boolean; data?: any; error?: string }>{
+    try {
+      const response = await this._makeRequest(`/jobs/${encodeURIComponent(jobId)}?fields=${this.resultFields}`);
+      return {
+        success: true,
+        data: response.data,
+      };
+    } catch (error: any) {
+      return {
+        success: false,
+        error: error.message,
+      };
+    }
+  }
+
+  /**
+   * Poll a verification job until it is done or failed, or timeoutMs passes
+   */
+  async waitForVerificationJob(jobId: string, pollIntervalMs = 2000, timeoutMs = 300000): Promise<{ success: boolean; data?: any; error?: string }>{
+    const deadline = Date.now() + timeoutMs;
+    while (true) {
+      const job = await this.getVerificationJob(jobId);
+      if (!job.success || job.data.status === 'done' || job.data.status === 'failed') {
+        return job;
+      }
+      if (Date.now() + pollIntervalMs > deadline) {
+        return { success: false, data: job.data, error: `Verification job ${jobId} still ${job.data.status}` };
+      }
+      await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+    }
+  }
+
   /**
    * Check service health
    */
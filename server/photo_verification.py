@@ -5,45 +5,97 @@ Handles EXIF metadata, AI authenticity checks, and context verification
 """
 
 import os
+import io
 import json
 import hashlib
 import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any, Union
 from dataclasses import dataclass
 import logging
 from pathlib import Path
 
 # Image processing and EXIF
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import piexif
 from PIL.ExifTags import TAGS, GPSTAGS
-import cv2
 import numpy as np
 
+# Heavy modules load on first use; PhotoVerificationService.warm_up preloads them
+from lazy_imports import lazy_import, preload
+cv2 = lazy_import("cv2")
+
 # AI and ML libraries
-import requests
-from sklearn.metrics.pairwise import cosine_similarity
-import imagehash
-from imagehash import phash, dhash, whash
+from perceptual_hash import compute_hashes, whash_scale_for
 
-# GPS and location
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
+from image_context import ImageContext, AnalysisView
+from hash_index import PerceptualHashIndex
+from trust_store import TrustStore, choose_tier, FAST, FULL
+from result_cache import ResultCache, SharedResultCache
+from exif_header import read_exif_header
+from geofence import distance_m
+from stage_timing import StageTimings, NULL_TIMINGS
+from shared_uploads import SharedSegment, attach
+from video_frames import FrameSampler, SampledFrame, VideoInfo, temporal_consistency
+from video_metadata import VideoMetadata, read_video_metadata
+from tiling import DEFAULT_TILE_PIXELS, GridMeans, blur_residual_mean, ela_bands
+from context_verifiers import ContextVerifier, get_context_verifier, registered_task_types
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Images above this are refused unread; above the full-frame limit color
+# analysis runs on a reduced decode (grayscale checks stay full resolution)
+DEFAULT_MAX_IMAGE_PIXELS = 120_000_000
+DEFAULT_MAX_FULL_FRAME_PIXELS = 24_000_000
+
 class VerificationResult:
-    """Result of photo verification"""
-    is_valid: bool
-    score: float  # 0-100
-    issues: List[str]
-    metadata: Dict[str, Any]
-    ai_checks: Dict[str, Any]
-    recommendations: List[str]
+    """
+    Result of photo verification
+
+    A slotted record with no per-instance __dict__, pickled as a plain
+    tuple of its fields, since every result crosses from a worker process
+    """
+    __slots__ = ("is_valid", "score", "issues", "metadata", "ai_checks", "recommendations",
+                 "timings", "counters", "tier")
+
+    def __init__(self,
+                 is_valid: bool,
+                 score: float,  # 0-100
+                 issues: List[str],
+                 metadata: Dict[str, Any],
+                 ai_checks: Dict[str, Any],
+                 recommendations: List[str],
+                 timings: Optional[Dict[str, float]] = None,  # seconds per stage, when requested
+                 counters: Optional[Dict[str, float]] = None,  # cache hits, decoded pixels, when timings are requested
+                 tier: str = FULL):  # FAST skips the pixel-level checks for trusted users
+        self.is_valid = is_valid
+        self.score = score
+        self.issues = issues
+        self.metadata = metadata
+        self.ai_checks = ai_checks
+        self.recommendations = recommendations
+        self.timings = timings
+        self.counters = counters
+        self.tier = tier
+
+    def __getstate__(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: Tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, VerificationResult):
+            return NotImplemented
+        return self.__getstate__() == other.__getstate__()
+
+    def __repr__(self) -> str:
+        return f"VerificationResult(is_valid={self.is_valid!r}, score={self.score!r}, tier={self.tier!r}, issues={self.issues!r})"
 
 @dataclass
 class TaskRequirements:
@@ -61,93 +113,514 @@ class PhotoVerificationService:
     
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
-        self.api_keys = {
-            'azure': os.getenv('AZURE_CONTENT_MODERATOR_KEY'),
-            'hive_ai': os.getenv('HIVE_AI_KEY'),
-            'google_vision': os.getenv('GOOGLE_VISION_API_KEY')
-        }
+        self._hash_index = None
+        self._trust_store = None
+        
+        # Image-only results keyed by upload SHA-256 (0 bytes disables); with
+        # result_cache_path they are shared by every service using that file
+        cache_bytes = self.config.get("result_cache_max_bytes", 64 * 1024 * 1024)
+        cache_path = self.config.get("result_cache_path")
+        cache_ttl = self.config.get("result_cache_ttl", 3600)
+        if not cache_bytes:
+            self.result_cache = None
+        elif cache_path:
+            self.result_cache = SharedResultCache(cache_path, max_bytes=cache_bytes, ttl_seconds=cache_ttl)
+        else:
+            self.result_cache = ResultCache(max_bytes=cache_bytes, ttl_seconds=cache_ttl)
+        
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Import the lazily loaded modules and run the image checks once on a
+        small synthetic photo, so the first real request does not pay for
+        module imports or first-call initialisation
+        """
+        start = datetime.now()
+        timings = preload()
+        
+        # Encode a tiny image and push it through the image-only checks
+        buffer = io.BytesIO()
+        Image.fromarray(np.full((64, 64, 3), 96, dtype=np.uint8)).save(buffer, format="JPEG")
+        with ImageContext.from_bytes(buffer.getvalue()) as ctx:
+            self._run_ai_authenticity_checks(ctx)
+            for task_type in registered_task_types():
+                verifier = get_context_verifier(task_type)
+                if verifier.ranges:
+                    verifier.classify(ctx.view())
         
+        logger.info(f"Verification service warmed up in {(datetime.now() - start).total_seconds():.2f}s")
+        return timings
+    
     def verify_photo(self, 
                     image_path: str, 
                     task_requirements: TaskRequirements,
                     user_id: str,
-                    submission_time: datetime) -> VerificationResult:
+                    submission_time: datetime,
+                    collect_timings: bool = False,
+                    tier: Optional[str] = None) -> VerificationResult:
+        """
+        Main verification method for uploaded photos. tier, when the caller
+        has already chosen it, replaces the trust lookup
+        """
+        return self._verify(
+            ImageContext.from_path(image_path, self._max_full_frame_pixels()),
+            task_requirements, user_id, submission_time, collect_timings, tier
+        )
+    
+    def verify_photo_bytes(self,
+                           data: Union[bytes, bytearray, memoryview],
+                           task_requirements: TaskRequirements,
+                           user_id: str,
+                           submission_time: datetime,
+                           collect_timings: bool = False,
+                           tier: Optional[str] = None) -> VerificationResult:
         """
-        Main verification method for uploaded photos
+        Verify a photo held in memory, decoding straight from the buffer
         """
+        return self._verify(
+            ImageContext.from_bytes(data, self._max_full_frame_pixels()),
+            task_requirements, user_id, submission_time, collect_timings, tier
+        )
+    
+    def verify_photo_shared(self,
+                            segment: SharedSegment,
+                            task_requirements: TaskRequirements,
+                            user_id: str,
+                            submission_time: datetime,
+                            collect_timings: bool = False,
+                            tier: Optional[str] = None) -> VerificationResult:
+        """
+        Verify an upload another process placed in shared memory, reading
+        it in place
+        """
+        with attach(segment) as data:
+            result = self.verify_photo_bytes(data, task_requirements, user_id, submission_time, collect_timings, tier)
+            del data  # lets attach unmap the segment on exit
+        return result
+    
+    def verify_video(self,
+                     video_path: str,
+                     task_requirements: TaskRequirements,
+                     user_id: str,
+                     submission_time: datetime,
+                     collect_timings: bool = False) -> VerificationResult:
+        """
+        Verify a video submission: time and place from the container's
+        metadata, the photo checks on frames sampled every
+        config["video_sample_interval"] seconds, and hash continuity between
+        samples to catch clips spliced together
+        """
+        timings = StageTimings() if collect_timings else NULL_TIMINGS
         try:
-            # Load image
-            image = Image.open(image_path)
-            
-            # Extract EXIF metadata
-            metadata = self._extract_exif_metadata(image)
+            result = self._verify_video(video_path, task_requirements, user_id, submission_time, timings)
+        except Exception as e:
+            logger.error(f"Error during video verification: {e}")
+            result = VerificationResult(
+                is_valid=False,
+                score=0,
+                issues=[f"Verification error: {str(e)}"],
+                metadata={},
+                ai_checks={},
+                recommendations=["Contact support if this error persists"]
+            )
+        
+        if collect_timings:
+            result.timings = timings.stages
+            result.counters = timings.counters
+        return result
+    
+    def _max_full_frame_pixels(self) -> Optional[int]:
+        """Images over this many pixels are color-decoded at a reduced size"""
+        return self.config.get("max_full_frame_pixels", DEFAULT_MAX_FULL_FRAME_PIXELS)
+    
+    def _verify(self,
+                ctx: ImageContext,
+                task_requirements: TaskRequirements,
+                user_id: str,
+                submission_time: datetime,
+                collect_timings: bool = False,
+                tier: Optional[str] = None) -> VerificationResult:
+        """Verify one image context, turning any failure into a failed result"""
+        timings = StageTimings() if collect_timings else NULL_TIMINGS
+        try:
+            with ctx:
+                result = self._verify_image_context(
+                    ctx, task_requirements, user_id, submission_time, timings, tier
+                )
             
-            # Verify timestamp
+        except Exception as e:
+            logger.error(f"Error during photo verification: {e}")
+            result = VerificationResult(
+                is_valid=False,
+                score=0,
+                issues=[f"Verification error: {str(e)}"],
+                metadata={},
+                ai_checks={},
+                recommendations=["Contact support if this error persists"]
+            )
+        
+        if collect_timings:
+            result.timings = timings.stages
+            result.counters = timings.counters
+        return result
+    
+    def _verify_image_context(self,
+                              ctx: ImageContext,
+                              task_requirements: TaskRequirements,
+                              user_id: str,
+                              submission_time: datetime,
+                              timings: StageTimings = NULL_TIMINGS,
+                              tier: Optional[str] = None) -> VerificationResult:
+        """Run every check against one shared, lazily decoded image context"""
+        # How much scrutiny this user's history calls for
+        if tier is None:
+            with timings.stage("trust"):
+                tier = self.choose_tier(user_id)
+        
+        # Image-only results for these exact bytes, if seen recently
+        with timings.stage("cache_lookup"):
+            cached = self._get_cached_results(ctx)
+        if self.result_cache is not None:
+            timings.count("result_cache_hit" if cached else "result_cache_miss")
+        
+        # Refuse oversized images from the header, before any pixels are decoded
+        size_issue = self._check_image_size(ctx)
+        if size_issue:
+            return VerificationResult(
+                is_valid=False,
+                score=0,
+                issues=[size_issue],
+                metadata={},
+                ai_checks={},
+                recommendations=self._generate_recommendations([size_issue], task_requirements)
+            )
+        
+        # Extract EXIF metadata
+        metadata = cached.get("metadata")
+        if metadata is None:
+            with timings.stage("metadata"):
+                metadata = self._extract_exif_metadata(ctx)
+        
+        # Verify timestamp and GPS location
+        with timings.stage("timestamp_location"):
             timestamp_valid, timestamp_issues = self._verify_timestamp(
                 metadata, task_requirements, submission_time
             )
-            
-            # Verify GPS location
             location_valid, location_issues = self._verify_location(
                 metadata, task_requirements
             )
-            
-            # Add watermark
-            watermarked_image = self._add_watermark(image, user_id, submission_time)
-            watermarked_image.save(f"{image_path}_watermarked.jpg")
-            
-            # AI authenticity checks
-            ai_results = self._run_ai_authenticity_checks(image_path)
-            
-            # Context verification
-            context_valid, context_issues = self._verify_context(
-                image_path, task_requirements
-            )
-            
-            # Calculate overall score
-            score = self._calculate_verification_score(
-                timestamp_valid, location_valid, context_valid, ai_results
-            )
-            
-            # Determine if valid
-            is_valid = (score >= 70 and timestamp_valid and location_valid)
-            
-            # Collect all issues
-            all_issues = timestamp_issues + location_issues + context_issues
-            if ai_results.get('manipulation_detected'):
-                all_issues.append("Image appears to be manipulated or AI-generated")
-            
-            # Generate recommendations
-            recommendations = self._generate_recommendations(
-                all_issues, task_requirements
-            )
-            
+        
+        # AI authenticity checks (full results are reused by either tier)
+        ai_results = cached.get("ai_results")
+        partial = ai_results is None and tier == FAST
+        if partial:
+            ai_results = self._run_ai_authenticity_checks(ctx, timings, full=False)
+        elif ai_results is None:
+            with timings.stage("decode"):
+                image = ctx.bgr  # decoded lazily; touch it here so the cost is not billed to the first check
+            if image is not None:
+                timings.count("decoded_pixels", image.shape[0] * image.shape[1])
+            ai_results = self._run_ai_authenticity_checks(ctx, timings)
+        
+        # Context verification
+        context_results = cached.get("context", {})
+        if task_requirements.task_type in context_results:
+            context_valid, context_issues = context_results[task_requirements.task_type]
+        elif tier == FAST:
+            context_valid, context_issues = False, []  # not checked, so it earns no points
+        else:
+            with timings.stage("context"):
+                context_valid, context_issues = self._verify_context(
+                    ctx, task_requirements
+                )
+            context_results[task_requirements.task_type] = (context_valid, context_issues)
+        
+        cache_parts = {"metadata": metadata, "context": context_results}
+        if not partial:
+            cache_parts["ai_results"] = ai_results
+        self._cache_results(ctx, cache_parts)
+        
+        # Duplicate detection against earlier submissions (never cached)
+        with timings.stage("duplicates"):
+            self._check_duplicates(ctx, ai_results, user_id)
+        
+        # Calculate overall score
+        score = self._calculate_verification_score(
+            timestamp_valid, location_valid, context_valid, ai_results
+        )
+        
+        # Determine if valid
+        is_valid = (score >= 70 and timestamp_valid and location_valid
+                    and not ai_results.get('duplicate_detected'))
+        
+        # Collect all issues
+        all_issues = timestamp_issues + location_issues + context_issues
+        if ai_results.get('manipulation_detected'):
+            all_issues.append("Image appears to be manipulated or AI-generated")
+        if ai_results.get('duplicate_detected'):
+            all_issues.append("Photo matches a previously submitted image")
+        if task_requirements.requires_video:
+            all_issues.append("This task requires a video submission, not a photo")
+            is_valid = False
+        
+        # Generate recommendations
+        recommendations = self._generate_recommendations(
+            all_issues, task_requirements
+        )
+        
+        result = VerificationResult(
+            is_valid=is_valid,
+            score=score,
+            issues=all_issues,
+            metadata=metadata,
+            ai_checks=ai_results,
+            recommendations=recommendations,
+            tier=tier
+        )
+        
+        with timings.stage("trust"):
+            self._record_trust(user_id, result)
+        return result
+    
+    def _check_image_size(self, ctx: ImageContext) -> Optional[str]:
+        """Issue for images over config["max_image_pixels"], None otherwise"""
+        limit = self.config.get("max_image_pixels", DEFAULT_MAX_IMAGE_PIXELS)
+        try:
+            width, height = ctx.size
+        except Image.DecompressionBombError:
+            return "Image resolution is too large to verify"
+        except Exception:
+            return None  # unreadable images fail in the checks that decode them
+        if limit and width * height > limit:
+            return (f"Image resolution is too large to verify "
+                    f"({width}x{height}, limit {limit / 1e6:.0f} megapixels)")
+        return None
+    
+    def _verify_video(self,
+                      video_path: str,
+                      task_requirements: TaskRequirements,
+                      user_id: str,
+                      submission_time: datetime,
+                      timings: StageTimings = NULL_TIMINGS) -> VerificationResult:
+        """Run every check against one video, reading it as a stream of sampled frames"""
+        with timings.stage("metadata"):
+            container = read_video_metadata(video_path)
+        if container is None:
+            issue = "Video format is not supported (MP4 or MOV required)"
             return VerificationResult(
-                is_valid=is_valid,
-                score=score,
-                issues=all_issues,
-                metadata=metadata,
-                ai_checks=ai_results,
-                recommendations=recommendations
+                is_valid=False,
+                score=0,
+                issues=[issue],
+                metadata={},
+                ai_checks={},
+                recommendations=self._generate_recommendations([issue], task_requirements)
             )
-            
-        except Exception as e:
-            logger.error(f"Error during photo verification: {e}")
+        
+        with FrameSampler(
+            video_path,
+            interval_s=self.config.get("video_sample_interval", 0.5),
+            max_frames=self.config.get("video_max_frames", 120),
+            seek_after_s=self.config.get("video_seek_after", 0.5)
+        ) as sampler:
+            metadata = {**container.to_dict(), **sampler.info.to_dict()}
+            with timings.stage("frames"):
+                frames = self._check_video_frames(sampler, task_requirements)
+            timings.count("sampled_frames", len(frames))
+            timings.count("grabbed_frames", sampler.grabbed)
+            timings.count("seeks", sampler.seeks)
+        
+        if not frames:
+            issue = "Could not decode any frames from the video"
             return VerificationResult(
                 is_valid=False,
                 score=0,
-                issues=[f"Verification error: {str(e)}"],
-                metadata={},
+                issues=[issue],
+                metadata=metadata,
                 ai_checks={},
-                recommendations=["Contact support if this error persists"]
+                recommendations=self._generate_recommendations([issue], task_requirements)
             )
+        
+        with timings.stage("timestamp_location"):
+            timestamp_valid, timestamp_issues = self._verify_timestamp(
+                metadata, task_requirements, submission_time
+            )
+            location_valid, location_issues = self._verify_location(
+                metadata, task_requirements
+            )
+        
+        with timings.stage("temporal"):
+            ai_results = self._summarize_video_frames(frames, container, sampler.info)
+        
+        # Context holds if enough of the clip shows it
+        passing = [frame for frame in frames if frame["context_valid"]]
+        context_valid = len(passing) >= self.config.get("video_context_min_share", 0.5) * len(frames)
+        context_issues = [] if context_valid else next(
+            (frame["context_issues"] for frame in frames if not frame["context_valid"]), []
+        )
+        
+        with timings.stage("sha256"):
+            digest = self._file_sha256(video_path)
+        with timings.stage("duplicates"):
+            self._check_video_duplicates(digest, frames, ai_results, user_id)
+        
+        score = self._calculate_verification_score(
+            timestamp_valid, location_valid, context_valid, ai_results
+        )
+        is_valid = (score >= 70 and timestamp_valid and location_valid
+                    and not ai_results.get("duplicate_detected")
+                    and not ai_results.get("splice_detected"))
+        
+        all_issues = timestamp_issues + location_issues + list(context_issues)
+        if ai_results.get("splice_detected"):
+            all_issues.append("Video appears to be spliced together from separate clips")
+        elif ai_results.get("manipulation_detected"):
+            all_issues.append("Video appears to be manipulated or AI-generated")
+        if ai_results.get("duplicate_detected"):
+            all_issues.append("Video matches a previously submitted image")
+        
+        result = VerificationResult(
+            is_valid=is_valid,
+            score=score,
+            issues=all_issues,
+            metadata=metadata,
+            ai_checks=ai_results,
+            recommendations=self._generate_recommendations(all_issues, task_requirements)
+        )
+        with timings.stage("trust"):
+            self._record_trust(user_id, result)
+        return result
     
-    def _extract_exif_metadata(self, image: Image.Image) -> Dict[str, Any]:
+    def _check_video_frames(self,
+                            sampler: FrameSampler,
+                            task_requirements: TaskRequirements) -> List[Dict[str, Any]]:
+        """
+        Per-frame check results in stream order. Frames are decoded here and
+        checked on config["video_frame_workers"] threads (OpenCV and Pillow
+        release the GIL), with at most two frames per thread held at once
+        """
+        verifier = get_context_verifier(task_requirements.task_type)
+        workers = max(1, self.config.get("video_frame_workers", min(4, os.cpu_count() or 1)))
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for frame in sampler:
+                pending.append(pool.submit(self._check_video_frame, frame, verifier))
+                if len(pending) >= 2 * workers:
+                    results.append(pending.popleft().result())
+            while pending:
+                results.append(pending.popleft().result())
+        return results
+    
+    def _check_video_frame(self, frame: SampledFrame, verifier: Optional[ContextVerifier]) -> Dict[str, Any]:
+        """ELA, noise, hashes and context of one sampled frame"""
+        gray = cv2.cvtColor(frame.bgr, cv2.COLOR_BGR2GRAY)
+        result = {
+            "index": frame.index,
+            "timestamp_s": frame.timestamp_s,
+            "hashes": compute_hashes(Image.fromarray(gray)),
+            "ela_score": self._run_ela(gray)["ela_score"],
+            "noise_score": self._calculate_noise_score(gray),
+            "context_valid": True,
+            "context_issues": [],
+        }
+        if verifier is not None:
+            features = None
+            if verifier.ranges:
+                resolutions = self.config.get("analysis_resolutions", {})
+                view = AnalysisView.of(frame.bgr, resolutions.get(verifier.task_type, verifier.resolution))
+                features = verifier.classify(view, tile_pixels=self.config.get("tile_pixels", DEFAULT_TILE_PIXELS))
+            result["context_valid"], result["context_issues"] = verifier.evaluate(features)
+        return result
+    
+    def _summarize_video_frames(self,
+                                frames: List[Dict[str, Any]],
+                                container: VideoMetadata,
+                                info: VideoInfo) -> Dict[str, Any]:
+        """
+        Authenticity results for a clip from its frames: the worst ELA, the
+        median noise, container metadata in place of EXIF, and splices
+        where consecutive samples' pHashes jump further than
+        config["video_cut_distance"] bits or timestamps run backwards
+        """
+        temporal = temporal_consistency(
+            [frame["hashes"].phash for frame in frames],
+            [frame["timestamp_s"] for frame in frames],
+            cut_distance=self.config.get("video_cut_distance", 24)
+        )
+        splice_detected = len(temporal["cuts"]) > self.config.get("video_max_cuts", 0)
+        ela_score = max(frame["ela_score"] for frame in frames)
+        noise_score = float(np.median([frame["noise_score"] for frame in frames]))
+        
+        # Edits re-mux the file: the creation time is dropped or the header disagrees with the stream
+        metadata_consistency = container.created_at is not None and (
+            container.duration_s is None or info.duration_s is None
+            or abs(container.duration_s - info.duration_s) <= max(1.0, 0.05 * info.duration_s)
+        )
+        
+        manipulation_score = 0
+        if ela_score > 0.8:
+            manipulation_score += 30
+        if noise_score < 0.1:
+            manipulation_score += 20
+        if not metadata_consistency:
+            manipulation_score += 25
+        if splice_detected:
+            manipulation_score += 40
+        
+        return {
+            "manipulation_detected": manipulation_score > 50,
+            "ai_generated": False,
+            "duplicate_detected": False,
+            "face_detected": False,
+            "confidence_scores": {},
+            "image_hashes": frames[0]["hashes"].hex(),
+            "ela_score": ela_score,
+            "noise_score": noise_score,
+            "metadata_consistency": metadata_consistency,
+            "manipulation_score": manipulation_score,
+            "splice_detected": splice_detected,
+            "scene_cuts": temporal["cuts"],
+            "temporal_consistency": temporal["consistency"],
+            "sampled_frames": [
+                {
+                    "timestamp_s": round(frame["timestamp_s"], 3),
+                    "phash": f"{frame['hashes'].phash:016x}",
+                    "ela_score": frame["ela_score"],
+                    "noise_score": frame["noise_score"],
+                    "context_valid": frame["context_valid"],
+                }
+                for frame in frames
+            ],
+        }
+    
+    def extract_metadata(self, image_path: str) -> Dict[str, Any]:
+        """
+        JSON-safe EXIF summary for an image file, read from the header only
+        """
+        header = read_exif_header(image_path)
+        return header.to_dict() if header else {}
+    
+    def extract_metadata_bytes(self, data: Union[bytes, bytearray, memoryview]) -> Dict[str, Any]:
+        """JSON-safe EXIF summary for an image held in memory"""
+        header = read_exif_header(data)
+        return header.to_dict() if header else {}
+    
+    def _get_cached_results(self, ctx: ImageContext) -> Dict[str, Any]:
+        """Cached image-only results for the context's bytes ({} on a miss)"""
+        if self.result_cache is None:
+            return {}
+        return self.result_cache.get(ctx.sha256) or {}
+    
+    def _cache_results(self, ctx: ImageContext, parts: Dict[str, Any]) -> None:
+        """Store image-only results for the context's bytes"""
+        if self.result_cache is not None:
+            self.result_cache.update(ctx.sha256, parts)
+    
+    def _extract_exif_metadata(self, ctx: ImageContext) -> Dict[str, Any]:
         """Extract EXIF metadata from image"""
         metadata = {}
         
         try:
-            exif_dict = piexif.load(image.info.get("exif", b""))
+            exif_dict = ctx.exif
             
             if exif_dict:
                 # Extract basic metadata
@@ -223,9 +696,11 @@ class PhotoVerificationService:
     def _dms_to_decimal(self, dms_tuple) -> float:
         """Convert degrees, minutes, seconds to decimal degrees"""
         try:
-            degrees = float(dms_tuple[0])
-            minutes = float(dms_tuple[1])
-            seconds = float(dms_tuple[2])
+            # piexif gives rationals as (numerator, denominator) pairs
+            degrees, minutes, seconds = (
+                value[0] / value[1] if isinstance(value, tuple) else float(value)
+                for value in dms_tuple[:3]
+            )
             
             return degrees + (minutes / 60.0) + (seconds / 3600.0)
         except:
@@ -279,10 +754,9 @@ class PhotoVerificationService:
             return False, issues
         
         # Calculate distance from assigned location
-        photo_coords = (photo_lat, photo_lng)
-        task_coords = task_requirements.location_coordinates
+        task_lat, task_lng = task_requirements.location_coordinates
         
-        distance = geodesic(photo_coords, task_coords).meters
+        distance = distance_m(photo_lat, photo_lng, task_lat, task_lng)
         
         if distance > task_requirements.location_radius_meters:
             issues.append(f"Photo location is {distance:.1f}m from assigned location (max: {task_requirements.location_radius_meters}m)")
@@ -290,49 +764,14 @@ class PhotoVerificationService:
         
         return True, issues
     
-    def _add_watermark(self, 
-                      image: Image.Image, 
-                      user_id: str, 
-                      timestamp: datetime) -> Image.Image:
-        """Add watermark with user ID and timestamp"""
-        try:
-            # Create a copy to avoid modifying original
-            watermarked = image.copy()
-            draw = ImageDraw.Draw(watermarked)
-            
-            # Try to load a font, fall back to default if not available
-            try:
-                font = ImageFont.truetype("arial.ttf", 20)
-            except:
-                font = ImageFont.load_default()
-            
-            # Create watermark text
-            watermark_text = f"User: {user_id} | {timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
-            
-            # Calculate text size
-            bbox = draw.textbbox((0, 0), watermark_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # Position watermark in bottom-right corner
-            x = image.width - text_width - 10
-            y = image.height - text_height - 10
-            
-            # Add semi-transparent background
-            background_bbox = (x-5, y-5, x+text_width+5, y+text_height+5)
-            draw.rectangle(background_bbox, fill=(0, 0, 0, 128))
-            
-            # Add text
-            draw.text((x, y), watermark_text, fill=(255, 255, 255), font=font)
-            
-            return watermarked
-            
-        except Exception as e:
-            logger.warning(f"Could not add watermark: {e}")
-            return image
-    
-    def _run_ai_authenticity_checks(self, image_path: str) -> Dict[str, Any]:
-        """Run AI-based authenticity checks"""
+    def _run_ai_authenticity_checks(self,
+                                    ctx: ImageContext,
+                                    timings: StageTimings = NULL_TIMINGS,
+                                    full: bool = True) -> Dict[str, Any]:
+        """
+        Run AI-based authenticity checks. Without full only the perceptual
+        hashes and EXIF consistency are computed (the fast tier)
+        """
         results = {
             "manipulation_detected": False,
             "ai_generated": False,
@@ -342,44 +781,49 @@ class PhotoVerificationService:
         }
         
         try:
-            # Load image for analysis
-            image = cv2.imread(image_path)
+            # Load image for analysis (hashing alone needs only the PIL image)
+            image = ctx.bgr if full else ctx.pil
             if image is None:
                 return results
             
-            # Convert to RGB for face recognition
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
             # Face detection
             # face_locations = face_recognition.face_locations(rgb_image)
             # results["face_detected"] = len(face_locations) > 0
             # results["face_count"] = len(face_locations)
             
             # Perceptual hashing for duplicate detection
-            pil_image = Image.open(image_path)
-            phash_value = str(phash(pil_image))
-            dhash_value = str(dhash(pil_image))
-            whash_value = str(whash(pil_image))
+            with timings.stage("hashing"):
+                # Wavelet scale of the full-resolution image, also for reduced decodes
+                hashes = compute_hashes(ctx.pil, whash_scale=whash_scale_for(ctx.size))
+            
+            # Hex on the wire: JSON clients cannot hold a uint64
+            results["image_hashes"] = hashes.hex()
             
-            results["image_hashes"] = {
-                "phash": phash_value,
-                "dhash": dhash_value,
-                "whash": whash_value
-            }
+            if not full:
+                with timings.stage("metadata_consistency"):
+                    metadata_consistency = self._check_metadata_consistency(ctx)
+                results["metadata_consistency"] = metadata_consistency
+                results["manipulation_score"] = 0 if metadata_consistency else 25
+                return results
             
             # Check for common manipulation artifacts
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            with timings.stage("grayscale"):
+                gray = ctx.gray
             
             # Error Level Analysis (ELA) - detects JPEG compression artifacts
-            ela_score = self._calculate_ela_score(gray)
-            results["ela_score"] = ela_score
+            with timings.stage("ela"):
+                ela_results = self._run_ela(gray)
+            results.update(ela_results)
+            ela_score = ela_results["ela_score"]
             
             # Noise analysis
-            noise_score = self._calculate_noise_score(gray)
+            with timings.stage("noise"):
+                noise_score = self._calculate_noise_score(gray)
             results["noise_score"] = noise_score
             
             # Metadata consistency check
-            metadata_consistency = self._check_metadata_consistency(image_path)
+            with timings.stage("metadata_consistency"):
+                metadata_consistency = self._check_metadata_consistency(ctx)
             results["metadata_consistency"] = metadata_consistency
             
             # Determine if manipulation is likely
@@ -394,56 +838,263 @@ class PhotoVerificationService:
             results["manipulation_score"] = manipulation_score
             results["manipulation_detected"] = manipulation_score > 50
             
-            # Try external AI services if API keys are available
-            if self.api_keys.get('azure'):
-                azure_results = self._azure_content_moderation(image_path)
-                results.update(azure_results)
-            
-            if self.api_keys.get('hive_ai'):
-                hive_results = self._hive_ai_detection(image_path)
-                results.update(hive_results)
-                
         except Exception as e:
             logger.error(f"Error in AI authenticity checks: {e}")
         
         return results
     
+    def apply_detections(self,
+                         result: VerificationResult,
+                         detections: Dict[str, Dict[str, Any]],
+                         task_requirements: TaskRequirements) -> VerificationResult:
+        """
+        Fold external detector answers (see detectors.DetectorHub) into a
+        result. A provider that is confident the photo is AI-generated, or
+        that flags its content, fails it the way a duplicate does
+        """
+        result.ai_checks["external_detectors"] = detections
+        threshold = self.config.get("detector_ai_threshold", 0.9)
+        ai_generated = any(d.get("ai_generated_score", 0.0) >= threshold for d in detections.values())
+        flagged = any(d.get("flagged") for d in detections.values())
+        
+        if ai_generated:
+            result.ai_checks["ai_generated"] = True
+            if "Image appears to be manipulated or AI-generated" not in result.issues:
+                result.issues.append("Image appears to be manipulated or AI-generated")
+        if flagged:
+            result.issues.append("Image was flagged by content moderation")
+        if ai_generated or flagged:
+            result.is_valid = False
+            result.score = max(result.score - 40, 0)
+            result.recommendations = self._generate_recommendations(result.issues, task_requirements)
+        return result
+    
+    def _get_hash_index(self) -> Optional[PerceptualHashIndex]:
+        """Open the duplicate index on first use (None when not configured)"""
+        index_path = self.config.get("hash_index_path")
+        if not index_path:
+            return None
+        if self._hash_index is None:
+            self._hash_index = PerceptualHashIndex(
+                index_path,
+                max_distance=self.config.get("duplicate_max_distance", 8)
+            )
+        return self._hash_index
+    
+    def _get_trust_store(self) -> Optional[TrustStore]:
+        """Open the trust store on first use (None when not configured)"""
+        store_path = self.config.get("trust_store_path")
+        if not store_path:
+            return None
+        if self._trust_store is None:
+            self._trust_store = TrustStore(
+                store_path,
+                half_life_days=self.config.get("trust_half_life_days", 30)
+            )
+        return self._trust_store
+    
+    def choose_tier(self, user_id: str) -> str:
+        """Verification tier from the user's trust record (FULL without a store)"""
+        try:
+            trust_store = self._get_trust_store()
+            if trust_store is None:
+                return FULL
+            return choose_tier(trust_store.get(user_id), self.config)
+        except Exception as e:
+            logger.warning(f"Trust lookup failed, running full verification: {e}")
+            return FULL
+    
+    def _record_trust(self, user_id: str, result: VerificationResult) -> None:
+        """Fold one result into the user's trust record"""
+        try:
+            trust_store = self._get_trust_store()
+            if trust_store is None:
+                return
+            trust_store.record(
+                user_id,
+                passed=result.is_valid,
+                duplicate=bool(result.ai_checks.get("duplicate_detected")),
+                manipulated=bool(result.ai_checks.get("manipulation_detected"))
+            )
+        except Exception as e:
+            logger.warning(f"Could not update trust record: {e}")
+    
+    def _check_duplicates(self, ctx: ImageContext, ai_results: Dict[str, Any], user_id: str) -> None:
+        """Look up near-duplicate earlier submissions, then record this one"""
+        hashes = ai_results.get("image_hashes")
+        if not hashes:
+            return
+        
+        try:
+            hash_index = self._get_hash_index()
+            if hash_index is None:
+                return
+            
+            phash_value = int(hashes["phash"], 16)
+            matches = hash_index.query(phash_value)
+            
+            # The same user re-sending the same bytes is a retry, not a recycled photo
+            is_retry = any(
+                match.submission_id == ctx.sha256 and match.user_id == user_id
+                for match in matches
+            )
+            matches = [
+                match for match in matches
+                if not (match.submission_id == ctx.sha256 and match.user_id == user_id)
+            ]
+            ai_results["duplicate_detected"] = len(matches) > 0
+            ai_results["duplicate_matches"] = [
+                {
+                    "user_id": match.user_id,
+                    "submission_id": match.submission_id,
+                    "distance": match.distance,
+                    "submitted_at": datetime.fromtimestamp(match.created_at).isoformat()
+                }
+                for match in matches
+            ]
+            
+            if is_retry:
+                return
+            hash_index.add(
+                phash_value,
+                dhash=int(hashes["dhash"], 16),
+                whash=int(hashes["whash"], 16),
+                user_id=user_id,
+                submission_id=ctx.sha256
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in duplicate detection: {e}")
+    
+    def _check_video_duplicates(self,
+                                digest: str,
+                                frames: List[Dict[str, Any]],
+                                ai_results: Dict[str, Any],
+                                user_id: str) -> None:
+        """
+        Look up every sampled frame among earlier submissions, then record up
+        to config["video_indexed_frames"] distinct frames of this clip, so
+        reused footage is caught whether it comes back as a photo or a video
+        """
+        try:
+            hash_index = self._get_hash_index()
+            if hash_index is None:
+                return
+        
+            nearest: Dict[Tuple[Optional[str], Optional[str]], Any] = {}
+            for frame in frames:
+                for match in hash_index.query(frame["hashes"].phash):
+                    key = (match.submission_id, match.user_id)
+                    if key not in nearest or match.distance < nearest[key].distance:
+                        nearest[key] = match
+            is_retry = (digest, user_id) in nearest
+            matches = [match for key, match in nearest.items() if key != (digest, user_id)]
+            ai_results["duplicate_detected"] = len(matches) > 0
+            ai_results["duplicate_matches"] = [
+                {
+                    "user_id": match.user_id,
+                    "submission_id": match.submission_id,
+                    "distance": match.distance,
+                    "submitted_at": datetime.fromtimestamp(match.created_at).isoformat()
+                }
+                for match in sorted(matches, key=lambda match: match.distance)
+            ]
+        
+            if is_retry:
+                return
+            # A new entry only where the clip has moved on from the last one recorded
+            indexed = []
+            for frame in frames:
+                hashes = frame["hashes"]
+                if not indexed or bin(hashes.phash ^ indexed[-1].phash).count("1") > hash_index.max_distance:
+                    indexed.append(hashes)
+            indexed = indexed[:self.config.get("video_indexed_frames", 8)]
+            hash_index.add_many(
+                np.array([(h.phash, h.dhash, h.whash) for h in indexed], dtype=np.uint64),
+                user_ids=[user_id] * len(indexed),
+                submission_ids=[digest] * len(indexed)
+            )
+        
+        except Exception as e:
+            logger.error(f"Error in video duplicate detection: {e}")
+    
+    def _file_sha256(self, path: str, chunk_size: int = 1024 * 1024) -> str:
+        """SHA-256 of a file read in chunks, for uploads too large to hold"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
     def _calculate_ela_score(self, gray_image) -> float:
         """Calculate Error Level Analysis score"""
+        return self._run_ela(gray_image)["ela_score"]
+    
+    def _run_ela(self, gray_image) -> Dict[str, Any]:
+        """
+        Error Level Analysis over in-memory JPEG buffers
+        
+        Recompresses at every quality in config["ela_qualities"] (the first one
+        gives ela_score). With config["ela_heatmap"] the primary difference
+        image is also averaged over an ela_tile_grid of tiles. Frames larger
+        than config["tile_pixels"] are recompressed in bands of whole JPEG
+        block rows, which gives the same differences with band-sized buffers.
+        """
+        results = {"ela_score": 0.0}
+        qualities = self.config.get("ela_qualities", [90])
+        tile_pixels = self.config.get("tile_pixels", DEFAULT_TILE_PIXELS) or gray_image.size
+        
         try:
-            # Apply JPEG compression and compare
-            temp_path = "temp_ela.jpg"
-            cv2.imwrite(temp_path, gray_image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            scores = {}
+            heatmap = None
+            for quality in qualities:
+                grid = None
+                if self.config.get("ela_heatmap") and heatmap is None:
+                    rows, cols = self.config.get("ela_tile_grid", (8, 8))
+                    grid = GridMeans(gray_image.shape[0], gray_image.shape[1], rows, cols)
+                try:
+                    total = 0.0
+                    for top, diff in ela_bands(gray_image, quality, tile_pixels):
+                        total += cv2.sumElems(diff)[0]
+                        if grid is not None:
+                            grid.add(top, diff)
+                except ValueError as e:
+                    logger.debug(f"ELA skipped quality {quality}: {e}")
+                    continue
+                scores[quality] = min(total / gray_image.size / 255.0, 1.0)
+                if grid is not None:
+                    heatmap = grid.means() / 255.0
             
-            compressed = cv2.imread(temp_path, cv2.IMREAD_GRAYSCALE)
-            os.remove(temp_path)
+            if not scores:
+                return results
             
-            if compressed is not None:
-                diff = cv2.absdiff(gray_image, compressed)
-                score = np.mean(diff) / 255.0
-                return min(score, 1.0)
+            results["ela_score"] = scores.get(qualities[0], 0.0)
+            if len(qualities) > 1:
+                results["ela_scores"] = {str(q): score for q, score in scores.items()}
             
-            return 0.0
+            if heatmap is not None:
+                results["ela_heatmap"] = np.round(heatmap, 4).tolist()
             
-        except:
-            return 0.0
+        except Exception as e:
+            logger.warning(f"ELA failed: {e}")
+        
+        return results
     
     def _calculate_noise_score(self, gray_image) -> float:
         """Calculate noise level in image"""
         try:
-            # Apply Gaussian blur and compare with original
-            blurred = cv2.GaussianBlur(gray_image, (5, 5), 0)
-            diff = cv2.absdiff(gray_image, blurred)
-            noise_score = np.mean(diff) / 255.0
+            # Apply Gaussian blur and compare with original, band by band on large frames
+            tile_pixels = self.config.get("tile_pixels", DEFAULT_TILE_PIXELS) or gray_image.size
+            noise_score = blur_residual_mean(gray_image, tile_pixels) / 255.0
             return min(noise_score, 1.0)
         except:
             return 0.0
     
-    def _check_metadata_consistency(self, image_path: str) -> bool:
+    def _check_metadata_consistency(self, ctx: ImageContext) -> bool:
         """Check if metadata is consistent and not tampered with"""
         try:
             # This is a simplified check - in production you'd want more sophisticated analysis
-            exif_dict = piexif.load(image_path)
+            exif_dict = ctx.exif
             
             if not exif_dict:
                 return False
@@ -459,170 +1110,47 @@ class PhotoVerificationService:
         except:
             return False
     
-    def _azure_content_moderation(self, image_path: str) -> Dict[str, Any]:
-        """Use Azure Content Moderator for additional checks"""
-        try:
-            if not self.api_keys.get('azure'):
-                return {}
-            
-            # This would integrate with Azure Content Moderator API
-            # For now, return placeholder
-            return {
-                "azure_moderation": "not_implemented",
-                "azure_score": 0.0
-            }
-            
-        except Exception as e:
-            logger.warning(f"Azure moderation failed: {e}")
-            return {}
-    
-    def _hive_ai_detection(self, image_path: str) -> Dict[str, Any]:
-        """Use Hive AI for AI-generated image detection"""
-        try:
-            if not self.api_keys.get('hive_ai'):
-                return {}
-            
-            # This would integrate with Hive AI API
-            # For now, return placeholder
-            return {
-                "hive_ai_detection": "not_implemented",
-                "hive_score": 0.0
-            }
-            
-        except Exception as e:
-            logger.warning(f"Hive AI detection failed: {e}")
-            return {}
-    
     def _verify_context(self, 
-                       image_path: str, 
+                       ctx: ImageContext, 
                        task_requirements: TaskRequirements) -> Tuple[bool, List[str]]:
         """Verify image context matches task requirements"""
         issues = []
         
         try:
             # Load image for object detection
-            image = cv2.imread(image_path)
-            if image is None:
+            if ctx.bgr is None:
                 issues.append("Could not load image for context verification")
                 return False, issues
             
             # Basic object detection (in production, use more sophisticated models)
-            if task_requirements.task_type == "tree_planting":
-                context_valid, context_issues = self._verify_tree_planting_context(image)
-                issues.extend(context_issues)
-                return context_valid, issues
-            
-            elif task_requirements.task_type == "pollution_report":
-                context_valid, context_issues = self._verify_pollution_context(image)
-                issues.extend(context_issues)
-                return context_valid, issues
-            
-            elif task_requirements.task_type == "corruption_report":
-                context_valid, context_issues = self._verify_corruption_context(image)
-                issues.extend(context_issues)
-                return context_valid, issues
-            
-            else:
+            verifier = get_context_verifier(task_requirements.task_type)
+            if verifier is None:
                 # Generic context verification
                 return True, []
+            
+            features = None
+            if verifier.ranges:
+                features = verifier.classify(
+                    self._analysis_view(ctx, verifier),
+                    tile_pixels=self.config.get("tile_pixels", DEFAULT_TILE_PIXELS)
+                )
+            context_valid, context_issues = verifier.evaluate(features)
+            issues.extend(context_issues)
+            return context_valid, issues
                 
         except Exception as e:
             logger.error(f"Error in context verification: {e}")
             issues.append(f"Context verification error: {str(e)}")
             return False, issues
     
-    def _verify_tree_planting_context(self, image) -> Tuple[bool, List[str]]:
-        """Verify tree planting context - enhanced for tree detection"""
-        issues = []
-        
-        # Convert to HSV for better color detection
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        
-        # Detect green colors (trees, plants) - more specific tree detection
-        # Tree green is typically in this range
-        lower_green = np.array([35, 50, 50])
-        upper_green = np.array([85, 255, 255])
-        green_mask = cv2.inRange(hsv, lower_green, upper_green)
-        
-        # Detect darker green (tree trunks, branches)
-        lower_dark_green = np.array([25, 30, 30])
-        upper_dark_green = np.array([35, 255, 255])
-        dark_green_mask = cv2.inRange(hsv, lower_dark_green, upper_dark_green)
-        
-        # Combine green masks
-        combined_green_mask = cv2.bitwise_or(green_mask, dark_green_mask)
-        
-        green_pixels = cv2.countNonZero(combined_green_mask)
-        total_pixels = image.shape[0] * image.shape[1]
-        green_percentage = (green_pixels / total_pixels) * 100
-        
-        # More lenient threshold for tree detection
-        if green_percentage < 3:
-            issues.append("No trees or vegetation detected in the image")
-        elif green_percentage < 8:
-            issues.append("Very little vegetation detected - ensure trees are clearly visible")
-        
-        # Detect brown colors (soil, tools, tree trunks)
-        lower_brown = np.array([10, 50, 50])
-        upper_brown = np.array([20, 255, 255])
-        brown_mask = cv2.inRange(hsv, lower_brown, upper_brown)
-        
-        brown_pixels = cv2.countNonZero(brown_mask)
-        brown_percentage = (brown_pixels / total_pixels) * 100
-        
-        # Detect sky (blue) to ensure outdoor photo
-        lower_blue = np.array([100, 50, 50])
-        upper_blue = np.array([130, 255, 255])
-        blue_mask = cv2.inRange(hsv, lower_blue, upper_blue)
-        blue_pixels = cv2.countNonZero(blue_mask)
-        blue_percentage = (blue_pixels / total_pixels) * 100
-        
-        if blue_percentage > 20:
-            issues.append("Image appears to be taken outdoors (good for tree planting)")
-        
-        # Use contour detection to find tree-like shapes
-        contours, _ = cv2.findContours(combined_green_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        tree_like_objects = 0
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 100:  # Minimum area for tree-like object
-                # Check aspect ratio (trees are typically taller than wide)
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = h / w if w > 0 else 0
-                if aspect_ratio > 1.2:  # Taller than wide
-                    tree_like_objects += 1
-        
-        if tree_like_objects == 0:
-            issues.append("No tree-like objects detected in the image")
-        elif tree_like_objects < 2:
-            issues.append("Very few tree-like objects detected - ensure trees are clearly visible")
-        
-        return len(issues) == 0, issues
-    
-    def _verify_pollution_context(self, image) -> Tuple[bool, List[str]]:
-        """Verify pollution report context"""
-        issues = []
-        
-        # Convert to grayscale for analysis
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Detect dark areas (potential pollution)
-        _, dark_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-        dark_pixels = cv2.countNonZero(dark_mask)
-        total_pixels = image.shape[0] * image.shape[1]
-        dark_percentage = (dark_pixels / total_pixels) * 100
-        
-        if dark_percentage < 10:
-            issues.append("Image doesn't show sufficient pollution indicators")
-        
-        return len(issues) == 0, issues
-    
-    def _verify_corruption_context(self, image) -> Tuple[bool, List[str]]:
-        """Verify corruption report context"""
-        # For corruption reports, context is harder to verify automatically
-        # This would typically require human review
-        return True, []
+    def _analysis_view(self, ctx: ImageContext, verifier: ContextVerifier) -> AnalysisView:
+        """
+        The image at the resolution the verifier declares it needs (long edge
+        in pixels, None for full resolution). Override per task type with
+        config["analysis_resolutions"]
+        """
+        resolutions = self.config.get("analysis_resolutions", {})
+        return ctx.view(resolutions.get(verifier.task_type, verifier.resolution))
     
     def _calculate_verification_score(self, 
                                    timestamp_valid: bool, 
@@ -647,6 +1175,10 @@ class PhotoVerificationService:
         elif manipulation_score < 50:
             score += 10
         
+        # Recycled photos cannot pass on score alone
+        if ai_results.get("duplicate_detected"):
+            score -= 40
+        
         # Face detection bonus (shows human involvement)
         # if ai_results.get("face_detected"):
         #     score += 10
@@ -655,7 +1187,7 @@ class PhotoVerificationService:
         if ai_results.get("metadata_consistency"):
             score += 10
         
-        return min(score, 100)
+        return max(min(score, 100), 0)
     
     def _generate_recommendations(self, 
                                 issues: List[str], 
@@ -678,6 +1210,24 @@ class PhotoVerificationService:
         if "manipulated or AI-generated" in str(issues):
             recommendations.append("Use original, unedited photos from your camera")
         
+        if "flagged by content moderation" in str(issues):
+            recommendations.append("Submit photos that show only the task site and its surroundings")
+        
+        if "previously submitted" in str(issues):
+            recommendations.append("Take new photos for each task instead of reusing earlier ones")
+        
+        if "spliced together" in str(issues):
+            recommendations.append("Record the task in one continuous clip without editing it")
+        
+        if "requires a video" in str(issues):
+            recommendations.append("Record a short video of the completed task and submit that instead")
+        
+        if "Video format" in str(issues) or "frames from the video" in str(issues):
+            recommendations.append("Upload the video as recorded by the phone camera (MP4 or MOV)")
+        
+        if "too large to verify" in str(issues):
+            recommendations.append("Upload the photo as taken by the camera, not a stitched or upscaled export")
+        
         if "context" in str(issues):
             recommendations.append(f"Ensure photos clearly show {task_requirements.task_type} completion")
         
@@ -4,24 +4,165 @@ FastAPI server for photo verification endpoints
 Integrates with the PhotoVerificationService
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse, Response
 import uvicorn
+import httpx
 import os
-import tempfile
 import shutil
-from datetime import datetime
-from typing import Optional, Dict, Any
-import json
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple, Callable, Sequence
+import uuid
+import logging
+from contextlib import asynccontextmanager
+from pydantic import BaseModel
+import numpy as np
 
 from photo_verification import PhotoVerificationService, TaskRequirements, VerificationResult
+from verification_engine import VerificationEngine, EngineOverloaded, VerificationTimeout
+from geofence import GeofenceIndex
+from metrics import VerificationMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from upload_ingest import UploadIngestor, UploadRejected, IngestedForm, IngestedFile, VIDEO_FORMATS
+from watermark import WatermarkQueue, WatermarkStore, READY as WATERMARK_READY, PENDING as WATERMARK_PENDING
+from detectors import DetectorHub
+from trust_store import FAST
+from response_encoding import DEFAULT_FIELDS, encode, parse_fields, project, wants_msgpack, msgpack_available, JSON, MSGPACK
+from job_queue import JobQueue, Job, QueueFull, job_priority, QUEUED as JOB_QUEUED, DONE as JOB_DONE
+
+logger = logging.getLogger(__name__)
+
+# Service configuration
+config = {
+    "max_file_size": 10 * 1024 * 1024,  # 10MB
+    "allowed_formats": ["jpg", "jpeg", "png"],
+    "verification_timeout": 30,  # seconds
+    "hash_index_path": os.getenv("HASH_INDEX_PATH", "data/hash_index.sqlite"),
+    "duplicate_max_distance": 8,  # Hamming bits between 64-bit phashes
+    "trust_store_path": os.getenv("TRUST_STORE_PATH", "data/trust.sqlite"),  # per-user decayed outcome counts
+    "trust_half_life_days": 30,
+    "trust_fast_path_min_passes": 10,  # decayed passes before a user can skip pixel-level checks
+    "trust_fast_path_min_score": 0.8,
+    "trust_audit_rate": 0.05,  # share of trusted submissions still fully checked
+    "result_cache_max_bytes": 64 * 1024 * 1024,
+    "result_cache_path": os.getenv("RESULT_CACHE_PATH", "data/result_cache.sqlite"),  # shared by all workers; None for per process
+    "result_cache_ttl": 3600,  # seconds
+    "max_image_pixels": 120_000_000,  # refused from the header, never decoded
+    "max_full_frame_pixels": 24_000_000,  # color checks run on a reduced decode above this
+    "tile_pixels": 4 * 1024 * 1024,  # band size for full-resolution ELA, noise and masks
+    "execution_backend": os.getenv("VERIFICATION_BACKEND", "process"),  # "process" or "thread"
+    "worker_pool_size": int(os.getenv("VERIFICATION_WORKERS", os.cpu_count() or 2)),
+    "max_queue_depth": int(os.getenv("VERIFICATION_QUEUE_DEPTH", 32)),
+    "retry_after_seconds": 5,
+    "warm_up_workers": os.getenv("VERIFICATION_WARM_UP", "1") != "0",  # preload heavy modules per worker
+    "spill_threshold_bytes": 16 * 1024 * 1024,  # larger uploads go through a temp file
+    "shared_memory_handoff": os.getenv("VERIFICATION_SHARED_MEMORY", "1") != "0",  # uploads reach workers via shm
+    "batch_concurrency": int(os.getenv("VERIFICATION_BATCH_CONCURRENCY", 4)),  # photos per batch in flight
+    "metrics_enabled": os.getenv("VERIFICATION_METRICS", "1") != "0",  # per-stage timings for /metrics
+    "require_gps": os.getenv("VERIFICATION_REQUIRE_GPS", "1") != "0",  # refuse photos without GPS at upload
+    "max_batch_files": 50,
+    "watermark_dir": os.getenv("WATERMARK_DIR", "data/watermarks"),  # content-addressed by upload and text
+    "watermark_workers": int(os.getenv("WATERMARK_WORKERS", 1)),
+    "watermark_max_pending": 64,  # jobs beyond this are dropped, never waited on
+    "watermark_quality": 90,  # JPEG quality of stored watermarks
+    "watermark_max_pixels": 24_000_000,  # larger uploads are watermarked at a reduced size
+    # External AI detectors, enabled by AZURE_CONTENT_MODERATOR_KEY / HIVE_AI_KEY
+    "azure_endpoint": os.getenv("AZURE_CONTENT_MODERATOR_ENDPOINT"),
+    "hive_ai_url": os.getenv("HIVE_AI_URL"),  # defaults to Hive's sync task API
+    "detector_timeout": float(os.getenv("DETECTOR_TIMEOUT", 5.0)),  # seconds per provider, hedge included
+    "detector_hedge_after": 1.0,  # race a second request against one slower than this
+    "detector_max_concurrency": 8,  # requests in flight per provider
+    "detector_breaker_failures": 5,  # consecutive failures before a provider is skipped
+    "detector_breaker_reset": 30,  # seconds before a skipped provider is tried again
+    "detector_ai_threshold": 0.9,  # AI-generated score that fails a photo
+    # Video submissions (/verify-video), always streamed to a temp file
+    "max_video_file_size": int(os.getenv("VIDEO_MAX_FILE_SIZE", 500 * 1024 * 1024)),
+    "allowed_video_formats": ["mp4", "mov"],
+    "video_verification_timeout": 120,  # seconds
+    "video_sample_interval": 0.5,  # seconds between sampled frames
+    "video_max_frames": 120,  # samples per clip; longer clips are sampled more sparsely
+    "video_seek_after": 0.5,  # seconds; longer gaps between samples are seeked, not decoded through
+    "video_frame_workers": 2,  # threads checking sampled frames within one worker
+    "video_cut_distance": 24,  # pHash bits between consecutive samples that count as a cut
+    "video_max_cuts": 0,  # cuts allowed before a clip counts as spliced
+    "video_context_min_share": 0.5,  # share of sampled frames that must pass the context check
+    "video_indexed_frames": 8,  # distinct frames per clip added to the duplicate index
+    # Asynchronous jobs (/jobs), kept in a durable SQLite queue with their uploads
+    "job_queue_path": os.getenv("JOB_QUEUE_PATH", "data/jobs.sqlite"),
+    "job_upload_dir": os.getenv("JOB_UPLOAD_DIR", "data/job_uploads"),
+    "job_consumers": int(os.getenv("JOB_CONSUMERS", 2)),  # jobs verified at once per API process; 0 to only accept
+    "job_priorities": {"pollution_report": 10, "corruption_report": 10},  # by task type, higher first; default 0
+    "job_max_queued": int(os.getenv("JOB_MAX_QUEUED", 10000)),  # unfinished jobs before submissions get 503
+    "job_retry_after_seconds": 30,
+    "job_lease_seconds": 300,  # a running job not finished by then is handed to another consumer
+    "job_max_attempts": 3,
+    "job_poll_interval": 1.0,  # seconds; consumers also wake on every submission
+    "job_retention_hours": 72,  # finished jobs are deleted after this
+    "job_callback_timeout": 10,  # seconds per callback request
+    "job_callback_attempts": 8,  # with exponential backoff between attempts
+}
+
+# Initialize verification service (in-process, for cheap endpoints) and the
+# worker pool that runs full verifications off the event loop
+verification_service = PhotoVerificationService(config)
+verification_engine = VerificationEngine(config)
+metrics = VerificationMetrics(verification_engine)
+
+# Watermarks are rendered in the background and fetched from /watermarks/{id}
+watermarks = WatermarkQueue(config)
+
+# External detectors run on the event loop while the workers do the CPU checks
+detectors = DetectorHub.from_config(config)
+
+# Geofences of the currently active tasks, kept up to date by the task service
+active_geofences = GeofenceIndex()
+
+# Asynchronous jobs: opened on first use, drained by consumer tasks on the event loop
+job_queue: Optional[JobQueue] = None
+_jobs_waiting = asyncio.Event()
+_callbacks_waiting = asyncio.Event()
+
+class GeofenceTask(BaseModel):
+    task_id: str
+    lat: float
+    lng: float
+    radius_m: float
+
+class GeofencePoint(BaseModel):
+    id: Optional[str] = None
+    lat: float
+    lng: float
+
+class GeofenceCheckRequest(BaseModel):
+    points: List[GeofencePoint]
+    # Check against these geofences instead of the active ones
+    tasks: Optional[List[GeofenceTask]] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the verification workers on startup and stop them on shutdown"""
+    verification_engine.start()
+    watermarks.start()
+    job_tasks = [asyncio.create_task(_consume_jobs()) for _ in range(max(0, int(config["job_consumers"])))]
+    if job_tasks:
+        job_tasks.append(asyncio.create_task(_deliver_callbacks()))
+    yield
+    # Jobs still running are handed back to the queue for the next start
+    for task in job_tasks:
+        task.cancel()
+    await asyncio.gather(*job_tasks, return_exceptions=True)
+    verification_engine.shutdown()
+    watermarks.shutdown()
+    await detectors.aclose()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Civitas Photo Verification API",
     description="API for verifying task submission photos",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -33,9 +174,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize verification service
-verification_service = PhotoVerificationService()
-
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -43,207 +181,912 @@ async def root():
 
 @app.post("/verify-photo")
 async def verify_photo(
-    file: UploadFile = File(...),
-    task_type: str = Form(...),
-    location_lat: float = Form(...),
-    location_lng: float = Form(...),
-    location_radius: float = Form(default=100),
-    deadline_start: str = Form(...),
-    deadline_end: str = Form(...),
-    user_id: str = Form(...),
-    requires_video: bool = Form(default=False)
+    request: Request,
+    x_debug_timings: Optional[str] = Header(default=None)
 ):
     """
     Verify uploaded photo for task submission
     
-    Args:
+    The multipart body is read as a stream and the file is checked as it
+    arrives: non-images, formats outside allowed_formats and files over
+    max_file_size are refused (400/415/413), and with require_gps a photo
+    whose EXIF header has no GPS position is answered with a failed result
+    before its pixel data is uploaded.
+    
+    Form fields:
         file: Image file to verify
         task_type: Type of task (tree_planting, pollution_report, etc.)
         location_lat: Task location latitude
         location_lng: Task location longitude
-        location_radius: Acceptable radius in meters
+        location_radius: Acceptable radius in meters (default 100)
         deadline_start: Task deadline start (ISO format)
         deadline_end: Task deadline end (ISO format)
         user_id: User ID for watermarking
-        requires_video: Whether task requires video
+        requires_video: Whether task requires video (default false); such tasks fail here and take /verify-video
+    
+    Query parameters:
+        fields: Comma-separated result fields to return (default
+            is_valid,score,issues); dotted paths select nested values, e.g.
+            metadata.GPS_Decimal, and "*" returns every field: metadata,
+            ai_checks, recommendations, verification_tier, watermark and
+            verification_timestamp
+    
+    Headers:
+        X-Debug-Timings: Send "1" to get per-stage timings back
+        Accept: application/msgpack for a msgpack body instead of JSON
     
     Returns:
-        Verification result with score and issues
+        Verification result with score and issues, plus the ID and URL of
+        the watermarked copy, which is rendered in the background
     """
     try:
-        # Validate file type
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
+        start = time.perf_counter()
+        fields = parse_fields(request.query_params.get("fields"))
+        media_type = _response_media_type(request)
+        try:
+            form = await _ingestor().ingest(request.headers, request.stream())
+        except UploadRejected as e:
+            _observe_rejection("verify_photo", e, start)
+            if e.reason == "missing_gps":
+                return _encoded_response(project(_rejected_result(e), fields), media_type)
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as temp_file:
-            shutil.copyfileobj(file.file, temp_file)
-            temp_path = temp_file.name
+        upload = _form_file(form, "file")
+        data, temp_path = upload.upload
         
         try:
-            # Parse deadline dates with better error handling
-            try:
-                deadline_start_dt = datetime.fromisoformat(deadline_start.replace('Z', '+00:00'))
-            except:
-                # Fallback to current time if parsing fails
-                deadline_start_dt = datetime.now() - timedelta(days=1)
-            
-            try:
-                deadline_end_dt = datetime.fromisoformat(deadline_end.replace('Z', '+00:00'))
-            except:
-                # Fallback to current time + 1 day if parsing fails
-                deadline_end_dt = datetime.now() + timedelta(days=1)
-            
             # Create task requirements
-            task_requirements = TaskRequirements(
-                task_type=task_type,
-                required_objects=[],  # Will be populated based on task type
-                location_coordinates=(location_lat, location_lng),
-                location_radius_meters=location_radius,
-                deadline_start=deadline_start_dt,
-                deadline_end=deadline_end_dt,
-                requires_video=requires_video
+            task_requirements = _task_requirements(
+                form.fields, requires_video=_form_value(form.fields, "requires_video", _form_bool, False)
             )
+            user_id = _form_value(form.fields, "user_id")
             
             # Run verification
-            result = verification_service.verify_photo(
-                image_path=temp_path,
-                task_requirements=task_requirements,
-                user_id=user_id,
-                submission_time=datetime.now()
+            debug_timings = _debug_requested(x_debug_timings)
+            start = time.perf_counter()
+            result, watermark = await _verify_and_watermark(
+                data, temp_path, task_requirements, user_id, datetime.now(),
+                endpoint="verify_photo", collect_timings=debug_timings
             )
+            elapsed = time.perf_counter() - start
             
-            # Convert result to dict for JSON response
-            response_data = {
-                "is_valid": result.is_valid,
-                "score": result.score,
-                "issues": result.issues,
-                "metadata": result.metadata,
-                "ai_checks": result.ai_checks,
-                "recommendations": result.recommendations,
-                "verification_timestamp": datetime.now().isoformat()
-            }
+            response_data = _result_body(result, fields, watermark=watermark)
+            if debug_timings:
+                response_data["timings"] = _timings_block(result, elapsed)
             
-            return JSONResponse(content=response_data)
+            return _encoded_response(response_data, media_type)
             
         finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+            # Clean up spilled upload
+            _remove_temp_files([temp_path])
                 
+    except HTTPException:
+        raise
+    except EngineOverloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Verification service is busy, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except VerificationTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
 
+@app.post("/verify-video")
+async def verify_video(
+    request: Request,
+    x_debug_timings: Optional[str] = Header(default=None)
+):
+    """
+    Verify an uploaded video for task submission
+    
+    The body is streamed straight to a temp file (up to max_video_file_size)
+    and the clip is read from there as a stream of sampled frames, so
+    neither the upload nor the decode is held in memory. Capture time and
+    location come from the MP4/MOV metadata; the photo checks run on the
+    sampled frames, and a clip whose frames jump between scenes fails as
+    spliced.
+    
+    Form fields:
+        file: Video file to verify (MP4 or MOV)
+        task_type, location_lat, location_lng, location_radius,
+        deadline_start, deadline_end, user_id: as for /verify-photo
+    
+    Query parameters and headers: as for /verify-photo
+    
+    Returns:
+        Verification result with score and issues, plus per-frame results
+        in ai_checks["sampled_frames"]
+    """
+    try:
+        start = time.perf_counter()
+        fields = parse_fields(request.query_params.get("fields"))
+        media_type = _response_media_type(request)
+        try:
+            form = await _video_ingestor().ingest(request.headers, request.stream())
+        except UploadRejected as e:
+            _observe_rejection("verify_video", e, start)
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        
+        upload = _form_file(form, "file")
+        try:
+            task_requirements = _task_requirements(form.fields, requires_video=True)
+            user_id = _form_value(form.fields, "user_id")
+            
+            debug_timings = _debug_requested(x_debug_timings)
+            start = time.perf_counter()
+            result = await _verify_upload(
+                None, upload.temp_path, task_requirements, user_id, datetime.now(),
+                endpoint="verify_video", collect_timings=debug_timings, video=True
+            )
+            elapsed = time.perf_counter() - start
+            
+            response_data = _result_body(result, fields)
+            if debug_timings:
+                response_data["timings"] = _timings_block(result, elapsed)
+            
+            return _encoded_response(response_data, media_type)
+            
+        finally:
+            _remove_temp_files([upload.temp_path])
+                
+    except HTTPException:
+        raise
+    except EngineOverloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Verification service is busy, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except VerificationTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
+
+def _result_body(result: VerificationResult, fields: Optional[Tuple[str, ...]] = None, **extra: Any) -> Dict[str, Any]:
+    """
+    Response body for one verification result, with extra keys such as the
+    watermark, projected to fields (every field when None)
+    """
+    return project({
+        "is_valid": result.is_valid,
+        "score": result.score,
+        "issues": result.issues,
+        "metadata": result.metadata,
+        "ai_checks": result.ai_checks,
+        "recommendations": result.recommendations,
+        "verification_tier": result.tier,
+        **extra,
+        "verification_timestamp": datetime.now().isoformat()
+    }, fields)
+
+def _response_media_type(request: Request) -> str:
+    """MSGPACK when the Accept header asks for it (406 if it is not installed), JSON otherwise"""
+    if not wants_msgpack(request.headers.get("accept")):
+        return JSON
+    if not msgpack_available():
+        raise HTTPException(status_code=406, detail="msgpack responses are not available on this server")
+    return MSGPACK
+
+def _encoded_response(content: Any, media_type: str = JSON, status_code: int = 200,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+    """content encoded with orjson (datetimes, EXIF bytes and NumPy values included) or msgpack"""
+    return Response(content=encode(content, media_type), status_code=status_code, media_type=media_type, headers=headers)
+
+def _video_ingestor() -> UploadIngestor:
+    """Streaming reader for one video, spilled to disk from the first chunk"""
+    return UploadIngestor(
+        max_file_size=config["max_video_file_size"],
+        allowed_formats=config["allowed_video_formats"],
+        spill_threshold_bytes=0
+    )
+
+def _ingestor(max_files: int = 1, fail_fast: bool = True, require_gps: bool = True) -> UploadIngestor:
+    """Streaming reader enforcing max_file_size, allowed_formats and, optionally, require_gps"""
+    return UploadIngestor(
+        max_file_size=config["max_file_size"],
+        allowed_formats=config["allowed_formats"],
+        spill_threshold_bytes=config["spill_threshold_bytes"],
+        max_files=max_files,
+        fail_fast=fail_fast,
+        on_exif=_require_gps if require_gps and config["require_gps"] else None
+    )
+
+def _require_gps(upload: IngestedFile) -> None:
+    """Refuse a photo as soon as its EXIF header shows it has no GPS position"""
+    if upload.exif is None or not upload.exif.has_gps:
+        raise UploadRejected(
+            422, "No GPS coordinates found in photo metadata", "missing_gps",
+            metadata=upload.exif.to_dict() if upload.exif is not None else {}
+        )
+
+def _rejected_result(rejection: UploadRejected) -> Dict[str, Any]:
+    """Failed verification result for a photo refused at ingest"""
+    issues = [rejection.detail]
+    return {
+        "is_valid": False,
+        "score": 0,
+        "issues": issues,
+        "metadata": rejection.metadata,
+        "ai_checks": {},
+        "recommendations": verification_service._generate_recommendations(issues, None),
+        "rejected_early": rejection.reason,
+        "verification_timestamp": datetime.now().isoformat()
+    }
+
+def _observe_rejection(endpoint: str, rejection: UploadRejected, start: float) -> None:
+    if config["metrics_enabled"]:
+        metrics.observe(endpoint, f"rejected_{rejection.reason}", time.perf_counter() - start)
+
+def _form_file(form: IngestedForm, name: str) -> IngestedFile:
+    """The single file uploaded as form field name"""
+    for upload in form.files:
+        if upload.field_name == name:
+            return upload
+    raise HTTPException(status_code=422, detail=f"Missing form field '{name}'")
+
+_REQUIRED = object()
+
+def _form_value(fields: Dict[str, str], name: str, convert: Callable[[str], Any] = str, default: Any = _REQUIRED) -> Any:
+    """A text form field converted with convert, 422 when missing or malformed"""
+    if name not in fields:
+        if default is _REQUIRED:
+            raise HTTPException(status_code=422, detail=f"Missing form field '{name}'")
+        return default
+    try:
+        return convert(fields[name])
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid value for form field '{name}'")
+
+def _form_bool(value: str) -> bool:
+    lowered = value.strip().lower()
+    if lowered in ("true", "1", "yes", "on"):
+        return True
+    if lowered in ("false", "0", "no", "off"):
+        return False
+    raise ValueError(value)
+
+def _task_requirements(fields: Dict[str, str], requires_video: bool = False) -> TaskRequirements:
+    """Task requirements from the verify endpoints' form fields"""
+    return TaskRequirements(
+        task_type=_form_value(fields, "task_type"),
+        required_objects=[],  # Will be populated based on task type
+        location_coordinates=(_form_value(fields, "location_lat", float), _form_value(fields, "location_lng", float)),
+        location_radius_meters=_form_value(fields, "location_radius", float, 100.0),
+        # Parse deadline dates, falling back to a window around now
+        deadline_start=_parse_deadline(_form_value(fields, "deadline_start"), datetime.now() - timedelta(days=1)),
+        deadline_end=_parse_deadline(_form_value(fields, "deadline_end"), datetime.now() + timedelta(days=1)),
+        requires_video=requires_video
+    )
+
+async def _verify_upload(data: Optional[bytes],
+                         temp_path: Optional[str],
+                         task_requirements: TaskRequirements,
+                         user_id: str,
+                         submission_time: datetime,
+                         endpoint: str,
+                         collect_timings: bool = False,
+                         video: bool = False,
+                         tier: Optional[str] = None) -> VerificationResult:
+    """
+    Verify an upload returned by _read_upload on the worker pool, recording
+    metrics when they are enabled. Videos are always read from temp_path;
+    photos use tier when the caller has already chosen it
+    """
+    record_metrics = config["metrics_enabled"]
+    collect_timings = collect_timings or record_metrics
+    start = time.perf_counter()
+    try:
+        if video:
+            result = await verification_engine.verify_video(
+                video_path=temp_path,
+                task_requirements=task_requirements,
+                user_id=user_id,
+                submission_time=submission_time,
+                collect_timings=collect_timings
+            )
+        elif temp_path is not None:
+            result = await verification_engine.verify_photo(
+                image_path=temp_path,
+                task_requirements=task_requirements,
+                user_id=user_id,
+                submission_time=submission_time,
+                collect_timings=collect_timings,
+                tier=tier
+            )
+        else:
+            result = await verification_engine.verify_photo_bytes(
+                data=data,
+                task_requirements=task_requirements,
+                user_id=user_id,
+                submission_time=submission_time,
+                collect_timings=collect_timings,
+                tier=tier
+            )
+    except (EngineOverloaded, VerificationTimeout) as e:
+        if record_metrics:
+            outcome = "overloaded" if isinstance(e, EngineOverloaded) else "timeout"
+            metrics.observe(endpoint, outcome, time.perf_counter() - start)
+        raise
+    
+    if record_metrics:
+        metrics.observe(
+            endpoint,
+            "valid" if result.is_valid else "invalid",
+            time.perf_counter() - start,
+            upload_bytes=len(data) if data is not None else os.path.getsize(temp_path),
+            timings=result.timings,
+            counters=result.counters
+        )
+    return result
+
+async def _verify_and_watermark(data: Optional[bytes],
+                                temp_path: Optional[str],
+                                task_requirements: TaskRequirements,
+                                user_id: str,
+                                submission_time: datetime,
+                                endpoint: str,
+                                collect_timings: bool = False) -> Tuple[VerificationResult, Optional[Dict[str, str]]]:
+    """
+    Verify an upload while its watermark job is queued and the external
+    detectors are queried alongside, so hashing for the watermark ID and
+    the detectors' network round-trips overlap with verification. The tier
+    is chosen first, and fast-tier (trusted) uploads are not sent to the
+    detectors at all. The watermark job is always handed the upload before
+    this returns, so the caller may delete temp_path afterwards
+    """
+    watermark_job = asyncio.ensure_future(_queue_watermark(data, temp_path, user_id, submission_time))
+    detector_job = None
+    try:
+        tier = await asyncio.to_thread(verification_service.choose_tier, user_id)
+        if detectors.enabled and tier != FAST:
+            detector_job = asyncio.ensure_future(_run_detectors(data, temp_path))
+        result = await _verify_upload(
+            data, temp_path, task_requirements, user_id, submission_time,
+            endpoint=endpoint, collect_timings=collect_timings, tier=tier
+        )
+        if detector_job is not None:
+            detections = await detector_job
+            if detections:
+                verification_service.apply_detections(result, detections, task_requirements)
+    finally:
+        if detector_job is not None:
+            detector_job.cancel()
+        watermark = await watermark_job
+    return result, watermark
+
+async def _run_detectors(data: Optional[bytes], temp_path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Every external detector's answer for an upload, {} if it could not be sent"""
+    try:
+        if data is None:
+            data = await asyncio.to_thread(_read_file, temp_path)
+        return await detectors.detect(data)
+    except Exception as e:
+        logger.warning(f"External detectors failed: {e}")
+        return {}
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _queue_watermark(data: Optional[bytes],
+                           temp_path: Optional[str],
+                           user_id: str,
+                           submission_time: datetime) -> Optional[Dict[str, str]]:
+    """Queue a background watermark; its ID and URL, or None if it was not queued"""
+    try:
+        watermark_id = await asyncio.to_thread(watermarks.submit, user_id, submission_time, data, temp_path)
+    except Exception as e:
+        logger.warning(f"Could not queue watermark: {e}")
+        return None
+    if watermark_id is None:
+        return None
+    return {"id": watermark_id, "url": f"/watermarks/{watermark_id}"}
+
+def _debug_requested(header_value: Optional[str]) -> bool:
+    """Whether an X-Debug-Timings header asks for timings in the response"""
+    return header_value is not None and header_value.strip().lower() not in ("", "0", "false", "no")
+
+def _timings_block(result: VerificationResult, elapsed: float) -> Dict[str, Any]:
+    """Response "timings" block: total and per-stage milliseconds plus counters"""
+    return {
+        "total_ms": elapsed * 1000,
+        "stages_ms": {stage: seconds * 1000 for stage, seconds in (result.timings or {}).items()},
+        "counters": result.counters or {}
+    }
+
+def _parse_deadline(value: str, fallback: datetime) -> datetime:
+    """Parse an ISO deadline, falling back when the client sends garbage"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return fallback
+
+def _summarize_batch(results: List[Dict[str, Any]], total_photos: int) -> Dict[str, Any]:
+    """Overall verification result for a batch - more lenient"""
+    valid_photos = [r for r in results if r.get('is_valid', False)]
+    overall_score = sum(r.get('score', 0) for r in results) / len(results) if results else 0
+    overall_valid = overall_score >= 50  # Lower threshold
+    return {
+        "overall_valid": overall_valid,
+        "overall_score": overall_score,
+        "total_photos": total_photos,
+        "valid_photos": len(valid_photos)
+    }
+
 @app.post("/verify-multiple-photos")
 async def verify_multiple_photos(
-    files: list[UploadFile] = File(...),
-    task_type: str = Form(...),
-    location_lat: float = Form(...),
-    location_lng: float = Form(...),
-    location_radius: float = Form(default=100),
-    deadline_start: str = Form(...),
-    deadline_end: str = Form(...),
-    user_id: str = Form(...)
+    request: Request,
+    x_debug_timings: Optional[str] = Header(default=None)
 ):
     """
     Verify multiple photos for task submission
+    
+    Takes the /verify-photo form fields with any number of "files" parts
+    (up to max_batch_files), plus an optional "stream" field. Each file is
+    checked as it arrives like on /verify-photo; a refused file gets an
+    error record (or a failed result, for missing GPS) and the rest of the
+    batch carries on.
+    
+    Photos are verified concurrently on the worker pool, at most
+    batch_concurrency at a time. With stream="ndjson" or stream="sse" each
+    photo's result is sent as soon as it is ready, followed by a summary
+    record carrying overall_score.
+    
+    Each photo's record carries its index and filename plus the result
+    fields chosen by the fields query parameter, as on /verify-photo. The
+    whole (non-streamed) response is msgpack with Accept: application/msgpack.
     """
+    start = time.perf_counter()
+    fields = parse_fields(request.query_params.get("fields"))
+    media_type = _response_media_type(request)
+    try:
+        # Read every upload before fanning out so streaming responses do not
+        # depend on the request body
+        form = await _ingestor(max_files=config["max_batch_files"], fail_fast=False).ingest(
+            request.headers, request.stream()
+        )
+    except UploadRejected as e:
+        _observe_rejection("verify_multiple_photos", e, start)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    files = [upload for upload in form.files if upload.field_name == "files"]
+    uploads: List[Optional[Tuple[Optional[bytes], Optional[str]]]] = [
+        None if upload.rejection is not None else upload.upload for upload in files
+    ]
     try:
-        results = []
+        stream = form.fields.get("stream")
+        if stream not in (None, "", "ndjson", "sse"):
+            raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'")
+        if not files:
+            raise HTTPException(status_code=422, detail="Missing form field 'files'")
         
-        for file in files:
-            if not file.content_type.startswith('image/'):
-                results.append({
-                    "filename": file.filename,
-                    "error": "File must be an image"
-                })
-                continue
-            
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as temp_file:
-                shutil.copyfileobj(file.file, temp_file)
-                temp_path = temp_file.name
-            
+        # Deadlines and requirements are the same for every photo
+        task_requirements = _task_requirements(form.fields)
+        user_id = _form_value(form.fields, "user_id")
+    except Exception as e:
+        _remove_temp_files(_upload_temp_paths(uploads))
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Batch verification failed: {str(e)}")
+    
+    for upload in files:
+        if upload.rejection is not None:
+            _observe_rejection("verify_multiple_photos", upload.rejection, start)
+    
+    filenames = [upload.filename for upload in files]
+    limit = asyncio.Semaphore(max(1, int(config["batch_concurrency"])))
+    submission_time = datetime.now()
+    debug_timings = _debug_requested(x_debug_timings)
+    
+    async def verify_one(index: int) -> Dict[str, Any]:
+        filename = filenames[index]
+        upload = uploads[index]
+        if upload is None:
+            rejection = files[index].rejection
+            if rejection.reason == "missing_gps":
+                return {"index": index, "filename": filename, **project(_rejected_result(rejection), fields)}
+            return {"index": index, "filename": filename, "error": rejection.detail}
+        
+        data, temp_path = upload
+        async with limit:
             try:
-                # Parse deadline dates with better error handling
-                try:
-                    deadline_start_dt = datetime.fromisoformat(deadline_start.replace('Z', '+00:00'))
-                except:
-                    deadline_start_dt = datetime.now() - timedelta(days=1)
-                
-                try:
-                    deadline_end_dt = datetime.fromisoformat(deadline_end.replace('Z', '+00:00'))
-                except:
-                    deadline_end_dt = datetime.now() + timedelta(days=1)
-                
-                # Create task requirements
-                task_requirements = TaskRequirements(
-                    task_type=task_type,
-                    required_objects=[],
-                    location_coordinates=(location_lat, location_lng),
-                    location_radius_meters=location_radius,
-                    deadline_start=deadline_start_dt,
-                    deadline_end=deadline_end_dt,
-                    requires_video=False
+                start = time.perf_counter()
+                result, watermark = await _verify_and_watermark(
+                    data, temp_path, task_requirements, user_id, submission_time,
+                    endpoint="verify_multiple_photos", collect_timings=debug_timings
                 )
-                
-                # Run verification
-                result = verification_service.verify_photo(
-                    image_path=temp_path,
-                    task_requirements=task_requirements,
-                    user_id=user_id,
-                    submission_time=datetime.now()
-                )
-                
-                results.append({
-                    "filename": file.filename,
-                    "is_valid": result.is_valid,
-                    "score": result.score,
-                    "issues": result.issues,
-                    "recommendations": result.recommendations
-                })
-                
+                elapsed = time.perf_counter() - start
+            except EngineOverloaded:
+                return {"index": index, "filename": filename,
+                        "error": "Verification service is busy, please retry"}
+            except VerificationTimeout as e:
+                return {"index": index, "filename": filename, "error": str(e)}
+            except Exception as e:
+                # One bad photo must not fail the batch or cut a stream short
+                logger.error(f"Batch photo {index} ({filename}) failed: {e}")
+                return {"index": index, "filename": filename, "error": f"Verification failed: {str(e)}"}
             finally:
-                # Clean up temporary file
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
+                # Drop the buffer as soon as this photo is done
+                uploads[index] = None
+                _remove_temp_files([temp_path])
         
-        # Calculate overall verification result - more lenient
-        valid_photos = [r for r in results if r.get('is_valid', False)]
-        overall_score = sum(r.get('score', 0) for r in results) / len(results) if results else 0
-        overall_valid = overall_score >= 50  # Lower threshold
+        try:
+            record = {"index": index, "filename": filename, **_result_body(result, fields, watermark=watermark)}
+            if debug_timings:
+                record["timings"] = _timings_block(result, elapsed)
+        except Exception as e:
+            logger.error(f"Batch photo {index} ({filename}) result could not be built: {e}")
+            return {"index": index, "filename": filename, "error": f"Verification failed: {str(e)}"}
+        return record
+    
+    tasks = [asyncio.ensure_future(verify_one(i)) for i in range(len(files))]
+    
+    if stream:
+        async def event_stream():
+            results = []
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    record = await next_result
+                    results.append(record)
+                    yield _format_stream_record(stream, "result", record)
+                yield _format_stream_record(stream, "summary", _summarize_batch(results, len(files)))
+            finally:
+                # Client went away: stop pending work and drop its files
+                for task in tasks:
+                    task.cancel()
+                _remove_temp_files(_upload_temp_paths(uploads))
         
-        return JSONResponse(content={
-            "overall_valid": overall_valid,
-            "overall_score": overall_score,
-            "total_photos": len(files),
-            "valid_photos": len(valid_photos),
+        media_type = "text/event-stream" if stream == "sse" else "application/x-ndjson"
+        return StreamingResponse(event_stream(), media_type=media_type)
+    
+    try:
+        results = await asyncio.gather(*tasks)
+        if results and all(r.get("error") == "Verification service is busy, please retry" for r in results):
+            raise EngineOverloaded(verification_engine.retry_after)
+        
+        return _encoded_response({
+            **_summarize_batch(results, len(files)),
             "results": results
-        })
+        }, media_type)
         
+    except EngineOverloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Verification service is busy, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Batch verification failed: {str(e)}")
+    finally:
+        _remove_temp_files(_upload_temp_paths(uploads))
+
+def _format_stream_record(stream: str, event: str, record: Dict[str, Any]) -> str:
+    """Encode one batch record as an NDJSON line or an SSE event"""
+    payload = encode({"type": event, **record}).decode("utf-8")
+    if stream == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+def _upload_temp_paths(uploads: List[Optional[Tuple[Optional[bytes], Optional[str]]]]) -> List[Optional[str]]:
+    """Temp paths of the uploads that spilled to disk"""
+    return [upload[1] for upload in uploads if upload is not None]
+
+def _remove_temp_files(temp_paths: List[Optional[str]]) -> None:
+    """Delete spooled uploads that are still on disk"""
+    for temp_path in temp_paths:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: Request):
+    """
+    Queue a photo or video for verification and return its job ID at once
+    
+    Takes the /verify-photo form fields, with either an image (limits as on
+    /verify-photo) or an MP4/MOV video (as on /verify-video) as "file", plus
+    an optional "callback_url". The upload is written to job_upload_dir and
+    the job to a durable queue, so accepted jobs survive restarts; consumers
+    verify them in order of task type priority (job_priorities). A photo
+    without GPS is recorded as a finished, failed job straight away.
+    
+    Poll GET /jobs/{job_id} for the result, or give callback_url: the job
+    record, result included, is POSTed there as JSON once the job finishes,
+    retried with backoff until it gets a 2xx answer. The fields query
+    parameter (as on /verify-photo) picks the result fields the callback
+    carries; the full result is kept for GET /jobs/{job_id}.
+    
+    Returns:
+        202 with job_id, status and status_url; 503 with Retry-After when
+        job_max_queued jobs are already waiting
+    """
+    start = time.perf_counter()
+    fields = parse_fields(request.query_params.get("fields"))
+    queue = _jobs()
+    if await asyncio.to_thread(queue.depth) >= queue.max_queued:
+        raise HTTPException(
+            status_code=503, detail="Job queue is full, please retry",
+            headers={"Retry-After": str(queue.retry_after)}
+        )
+    try:
+        form = await _job_ingestor().ingest(request.headers, request.stream())
+    except UploadRejected as e:
+        _observe_rejection("jobs", e, start)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    upload = _form_file(form, "file")
+    try:
+        video = upload.format in VIDEO_FORMATS
+        if not video and upload.size > config["max_file_size"]:
+            raise HTTPException(status_code=413, detail=f"File exceeds the {config['max_file_size']} byte limit")
+        requires_video = video or _form_value(form.fields, "requires_video", _form_bool, False)
+        task_requirements = _task_requirements(form.fields, requires_video=requires_video)
+        user_id = _form_value(form.fields, "user_id")
+        callback_url = form.fields.get("callback_url") or None
+        if callback_url is not None and not callback_url.startswith(("http://", "https://")):
+            raise HTTPException(status_code=422, detail="callback_url must be an http(s) URL")
+        
+        params = _job_params(task_requirements, user_id, datetime.now())
+        params["fields"] = list(fields) if fields is not None else None
+        result = None
+        if not video and config["require_gps"] and (upload.exif is None or not upload.exif.has_gps):
+            rejection = UploadRejected(
+                422, "No GPS coordinates found in photo metadata", "missing_gps",
+                metadata=upload.exif.to_dict() if upload.exif is not None else {}
+            )
+            _observe_rejection("jobs", rejection, start)
+            result = _rejected_result(rejection)
+        
+        job_id = await asyncio.to_thread(
+            _enqueue_job, queue, upload, "video" if video else "photo", params, callback_url, result
+        )
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=503, detail="Job queue is full, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    finally:
+        upload.discard()
+    
+    if result is None:
+        _jobs_waiting.set()
+    else:
+        _callbacks_waiting.set()
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": JOB_QUEUED if result is None else JOB_DONE, "status_url": f"/jobs/{job_id}"},
+        headers={"Location": f"/jobs/{job_id}"}
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """
+    State of a job from POST /jobs: queued, running, done (with the
+    verification result under "result") or failed (with "error"). The
+    fields query parameter and Accept header work as on /verify-photo
+    """
+    media_type = _response_media_type(request)
+    job = await asyncio.to_thread(_jobs().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _encoded_response(_job_body(job, parse_fields(request.query_params.get("fields"))), media_type)
+
+def _job_body(job: Job, fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """The job record with its result projected to fields"""
+    body = job.to_dict()
+    if "result" in body:
+        body["result"] = project(body["result"], fields)
+    return body
+
+def _jobs() -> JobQueue:
+    global job_queue
+    if job_queue is None:
+        job_queue = JobQueue.from_config(config)
+    return job_queue
+
+def _job_ingestor() -> UploadIngestor:
+    """Streaming reader for one photo or video, spilled to disk from the first chunk"""
+    return UploadIngestor(
+        max_file_size=max(config["max_file_size"], config["max_video_file_size"]),
+        allowed_formats=list(config["allowed_formats"]) + list(config["allowed_video_formats"]),
+        spill_threshold_bytes=0
+    )
+
+def _enqueue_job(queue: JobQueue,
+                 upload: IngestedFile,
+                 kind: str,
+                 params: Dict[str, Any],
+                 callback_url: Optional[str],
+                 result: Optional[Dict[str, Any]]) -> str:
+    """Move the upload into job_upload_dir and queue its job (or record it as done, given a result)"""
+    job_id = uuid.uuid4().hex
+    upload_path = None
+    if result is None:
+        os.makedirs(config["job_upload_dir"], exist_ok=True)
+        upload_path = os.path.join(config["job_upload_dir"], f"{job_id}.{upload.format}")
+        if upload.temp_path is not None:
+            shutil.move(upload.temp_path, upload_path)
+        else:
+            with open(upload_path, "wb") as f:
+                f.write(upload.data)
+    try:
+        return queue.submit(
+            kind, params["task_type"], params, upload_path,
+            priority=job_priority(params["task_type"], config),
+            callback_url=callback_url, job_id=job_id, result=result
+        )
+    except BaseException:
+        _remove_temp_files([upload_path])
+        raise
+
+def _job_params(task_requirements: TaskRequirements, user_id: str, submission_time: datetime) -> Dict[str, Any]:
+    """What a consumer needs to verify a job, as stored with it"""
+    return {
+        "task_type": task_requirements.task_type,
+        "location": list(task_requirements.location_coordinates),
+        "location_radius": task_requirements.location_radius_meters,
+        "deadline_start": task_requirements.deadline_start.isoformat(),
+        "deadline_end": task_requirements.deadline_end.isoformat(),
+        "requires_video": task_requirements.requires_video,
+        "user_id": user_id,
+        "submission_time": submission_time.isoformat()
+    }
+
+def _job_requirements(params: Dict[str, Any]) -> TaskRequirements:
+    return TaskRequirements(
+        task_type=params["task_type"],
+        required_objects=[],
+        location_coordinates=tuple(params["location"]),
+        location_radius_meters=params["location_radius"],
+        deadline_start=datetime.fromisoformat(params["deadline_start"]),
+        deadline_end=datetime.fromisoformat(params["deadline_end"]),
+        requires_video=params["requires_video"]
+    )
+
+async def _consume_jobs() -> None:
+    """Verify queued jobs one at a time until cancelled"""
+    queue = _jobs()
+    backoff = _Backoff()
+    while True:
+        try:
+            # Cleared before claiming, so a submission made meanwhile still wakes us
+            _jobs_waiting.clear()
+            job = await asyncio.to_thread(queue.claim)
+            if job is None:
+                try:
+                    await asyncio.wait_for(_jobs_waiting.wait(), timeout=config["job_poll_interval"])
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await _run_job(queue, job)
+            backoff.reset()
+        except Exception as e:
+            # A claimed job whose result could not be stored is reclaimed when its lease runs out
+            await backoff.wait(f"Job consumer error: {e}")
+
+async def _run_job(queue: JobQueue, job: Job) -> None:
+    """Verify one claimed job and store its result, or hand it back to the queue"""
+    params = job.params
+    try:
+        task_requirements = _job_requirements(params)
+        submission_time = datetime.fromisoformat(params["submission_time"])
+        endpoint = f"job_{job.kind}"
+        if job.kind == "video":
+            result = await _verify_upload(
+                None, job.upload_path, task_requirements, params["user_id"], submission_time,
+                endpoint=endpoint, video=True
+            )
+            body = _result_body(result)
+        else:
+            result, watermark = await _verify_and_watermark(
+                None, job.upload_path, task_requirements, params["user_id"], submission_time, endpoint=endpoint
+            )
+            body = _result_body(result, watermark=watermark)
+    except EngineOverloaded as e:
+        # The synchronous endpoints have the workers; try again without using up an attempt
+        await asyncio.to_thread(queue.release, job.id, e.retry_after)
+        return
+    except asyncio.CancelledError:
+        # Shutting down: hand the job back off the event loop, and finish the release even if cancelled again
+        await asyncio.shield(asyncio.to_thread(queue.release, job.id))
+        raise
+    except Exception as e:
+        logger.warning(f"Job {job.id} attempt {job.attempts} failed: {e}")
+        if not await asyncio.to_thread(queue.fail, job.id, f"Verification failed: {str(e)}"):
+            _remove_temp_files([job.upload_path])
+            _callbacks_waiting.set()
+        return
+    
+    await asyncio.to_thread(queue.complete, job.id, body)
+    _remove_temp_files([job.upload_path])
+    if job.callback_url is not None:
+        _callbacks_waiting.set()
+
+async def _deliver_callbacks() -> None:
+    """Send due job callbacks, and purge jobs past job_retention_hours, until cancelled"""
+    queue = _jobs()
+    next_purge = 0.0
+    backoff = _Backoff()
+    async with httpx.AsyncClient(timeout=config["job_callback_timeout"]) as client:
+        while True:
+            try:
+                _callbacks_waiting.clear()
+                jobs = await asyncio.to_thread(queue.claim_callbacks)
+                for job, delivered in zip(jobs, await asyncio.gather(*(_send_callback(client, job) for job in jobs))):
+                    await asyncio.to_thread(queue.record_callback, job.id, delivered)
+                
+                if time.monotonic() >= next_purge:
+                    next_purge = time.monotonic() + 3600
+                    purged = await asyncio.to_thread(queue.purge, config["job_retention_hours"] * 3600)
+                    if purged:
+                        logger.info(f"Purged {purged} finished jobs")
+                backoff.reset()
+            except Exception as e:
+                await backoff.wait(f"Callback delivery error: {e}")
+                continue
+            if not jobs:
+                try:
+                    await asyncio.wait_for(_callbacks_waiting.wait(), timeout=config["job_poll_interval"])
+                except asyncio.TimeoutError:
+                    pass
+
+class _Backoff:
+    """Growing pause for the background job loops after an unexpected error (database locked, say)"""
+    
+    def __init__(self, initial: Optional[float] = None, maximum: float = 60.0):
+        self.initial = config["job_poll_interval"] if initial is None else initial
+        self.maximum = maximum
+        self.delay = self.initial
+    
+    def reset(self) -> None:
+        self.delay = self.initial
+    
+    async def wait(self, message: str) -> None:
+        logger.error(f"{message}; retrying in {self.delay:.0f}s")
+        await asyncio.sleep(self.delay)
+        self.delay = min(self.maximum, self.delay * 2)
+
+async def _send_callback(client: httpx.AsyncClient, job: Job) -> bool:
+    """POST the finished job to its callback URL; whether it was accepted"""
+    try:
+        fields = job.params.get("fields", DEFAULT_FIELDS)
+        response = await client.post(
+            job.callback_url,
+            content=encode(_job_body(job, fields)),
+            headers={"Content-Type": JSON}
+        )
+    except httpx.HTTPError as e:
+        logger.warning(f"Callback for job {job.id} failed: {e}")
+        return False
+    if not response.is_success:
+        logger.warning(f"Callback for job {job.id} answered {response.status_code}")
+    return response.is_success
 
 @app.post("/extract-metadata")
-async def extract_metadata(file: UploadFile = File(...)):
+async def extract_metadata(request: Request):
     """
-    Extract EXIF metadata from uploaded image
+    Extract EXIF metadata from uploaded image (form field "file")
+    
+    Only the container header up to the EXIF block is read; pixel data is
+    never decoded, so this is cheap enough for a pre-upload check. Format
+    and size limits are enforced as on /verify-photo.
     """
     try:
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
+        try:
+            form = await _ingestor(require_gps=False).ingest(request.headers, request.stream())
+        except UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as temp_file:
-            shutil.copyfileobj(file.file, temp_file)
-            temp_path = temp_file.name
+        file = _form_file(form, "file")
+        data, temp_path = file.upload
         
         try:
-            from PIL import Image
-            image = Image.open(temp_path)
-            
             # Extract metadata using the service
-            metadata = verification_service._extract_exif_metadata(image)
+            if temp_path is not None:
+                metadata = verification_service.extract_metadata(temp_path)
+            else:
+                metadata = verification_service.extract_metadata_bytes(data)
             
             return JSONResponse(content={
                 "filename": file.filename,
@@ -252,19 +1095,99 @@ async def extract_metadata(file: UploadFile = File(...)):
             })
             
         finally:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+            _remove_temp_files([temp_path])
                 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Metadata extraction failed: {str(e)}")
 
+@app.put("/geofences")
+async def upsert_geofences(tasks: List[GeofenceTask]):
+    """Add or update active task geofences"""
+    try:
+        for task in tasks:
+            active_geofences.add(task.task_id, task.lat, task.lng, task.radius_m)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"active_tasks": len(active_geofences)}
+
+@app.delete("/geofences/{task_id}")
+async def remove_geofence(task_id: str):
+    """Remove a task geofence once the task is closed"""
+    active_geofences.remove(task_id)
+    return {"active_tasks": len(active_geofences)}
+
+@app.post("/geofences/check")
+async def check_geofences(request: GeofenceCheckRequest):
+    """
+    Which task geofences each point falls inside, nearest first. Used to
+    re-check submissions in bulk after task locations change
+    """
+    index = active_geofences
+    if request.tasks is not None:
+        try:
+            index = GeofenceIndex((t.task_id, t.lat, t.lng, t.radius_m) for t in request.tasks)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    lats = np.array([p.lat for p in request.points], dtype=np.float64)
+    lngs = np.array([p.lng for p in request.points], dtype=np.float64)
+    points, task_ids, distances, radii = await asyncio.to_thread(index.query_batch, lats, lngs)
+    
+    matches: List[List[Dict[str, Any]]] = [[] for _ in request.points]
+    for point, task_id, distance, radius in zip(points.tolist(), task_ids.tolist(), distances.tolist(), radii.tolist()):
+        matches[point].append({"task_id": task_id, "distance_m": distance, "radius_m": radius})
+    
+    return {
+        "results": [
+            {"id": p.id, "matches": point_matches}
+            for p, point_matches in zip(request.points, matches)
+        ]
+    }
+
+@app.get("/watermarks/{watermark_id}")
+async def get_watermark(watermark_id: str):
+    """
+    Watermarked copy of a verified upload, by the ID returned from the
+    verify endpoints. Answers 202 while the watermark is still rendering
+    """
+    if not WatermarkStore.valid_id(watermark_id):
+        raise HTTPException(status_code=404, detail="Watermark not found")
+    
+    status = watermarks.status(watermark_id)
+    if status == WATERMARK_READY:
+        return FileResponse(watermarks.store.path(watermark_id), media_type="image/jpeg")
+    if status == WATERMARK_PENDING:
+        return JSONResponse(
+            status_code=202,
+            content={"id": watermark_id, "status": status},
+            headers={"Retry-After": "1"}
+        )
+    if status is not None:
+        raise HTTPException(status_code=500, detail="Watermark could not be rendered")
+    raise HTTPException(status_code=404, detail="Watermark not found")
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: stage latency histograms, upload sizes, cache hits and pool state"""
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "service": "Photo Verification Service"
+        "service": "Photo Verification Service",
+        "workers": verification_engine.pool_size,
+        "in_flight": verification_engine.in_flight,
+        "queue_depth": verification_engine.queue_depth,
+        "shared_segments": verification_engine.shared_segments,
+        "active_geofences": len(active_geofences),
+        "pending_watermarks": watermarks.pending,
+        "jobs": await asyncio.to_thread(_jobs().counts),
+        "detectors": detectors.stats()
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Field projection and fast encoding of verification responses
+Callers name the fields they need (fields=is_valid,score,metadata.GPS_Decimal)
+and get only those; bodies are encoded with orjson, or msgpack when the
+client accepts it, falling back to the standard library json. Values JSON
+cannot hold natively (datetimes, EXIF bytes and rationals, NumPy scalars)
+are converted on the way out, so any result dict can be sent as it is
+"""
+
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional; msgpack responses are refused without it
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+# Result fields sent when the caller does not ask for others
+DEFAULT_FIELDS: Tuple[str, ...] = ("is_valid", "score", "issues")
+# fields=* asks for every field
+ALL_FIELDS = "*"
+
+
+def parse_fields(value: Optional[str],
+                 default: Optional[Tuple[str, ...]] = DEFAULT_FIELDS) -> Optional[Tuple[str, ...]]:
+    """Field paths from a comma-separated fields= value; None means every field"""
+    if value is None or not value.strip():
+        return default
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    return None if ALL_FIELDS in names else names
+
+
+def project(body: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """
+    The parts of body named by fields, in the order given. A dotted path
+    (metadata.GPS_Decimal) selects inside a nested dict; names body does
+    not have are skipped
+    """
+    if fields is None:
+        return body
+    projected: Dict[str, Any] = {}
+    whole = set()  # keys already taken in full
+    for path in fields:
+        key, _, rest = path.partition(".")
+        if key not in body or key in whole:
+            continue
+        value = body[key]
+        if not rest or not isinstance(value, dict):
+            projected[key] = value
+            whole.add(key)
+            continue
+        nested = project(value, (rest,))
+        if nested:
+            projected.setdefault(key, {}).update(nested)
+    return projected
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """Whether an Accept header asks for msgpack"""
+    if not accept:
+        return False
+    return any(part.split(";")[0].strip().lower() in _MSGPACK_TYPES for part in accept.split(","))
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def encode(content: Any, media_type: str = JSON) -> bytes:
+    """content as JSON (orjson when installed) or msgpack bytes"""
+    if media_type == MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+        return msgpack.packb(content, default=_plain, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(content, default=_plain, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_plain, separators=(",", ":")).encode("utf-8")
+
+
+def _plain(value: Any) -> Any:
+    """Stand-in for a value the encoder has no type for"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # EXIF strings are ASCII in practice; anything else is kept readable
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for image-only verification results
+Entries are keyed by the SHA-256 of the upload bytes and bounded by a TTL,
+a total size in bytes and LRU eviction. ResultCache lives in one process;
+SharedResultCache keeps the same entries in SQLite for a pool of workers
+"""
+
+import os
+import copy
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """LRU cache of per-image result dicts with TTL and a byte budget"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Copy of the cached entry, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def update(self, key: str, parts: Dict[str, Any]) -> None:
+        """Merge parts into the entry for key, creating it if needed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            value = dict(entry[2]) if entry is not None and entry[0] >= time.monotonic() else {}
+            value.update(copy.deepcopy(parts))
+            try:
+                size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            except Exception as e:
+                logger.warning(f"Result not cacheable: {e}")
+                return
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+
+class SharedResultCache:
+    """
+    ResultCache kept in SQLite, so every worker process sees the entries
+    the others stored. Same TTL, byte budget and LRU eviction, with recency
+    in wall-clock time; hits and misses are counted per process
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS result_cache (
+            key TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL,
+            used_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            value BLOB NOT NULL
+        )
+    """
+    INDEX = "CREATE INDEX IF NOT EXISTS result_cache_used_at ON result_cache (used_at)"
+
+    def __init__(self, db_path: str, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit, so updates can take the write lock up front
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(self.SCHEMA)
+        self._conn.execute(self.INDEX)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM result_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cached entry, or None when missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM result_cache WHERE key = ? AND expires_at < ?", (key, now))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE result_cache SET used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return pickle.loads(row[1])
+
+    def update(self, key: str, parts: Dict[str, Any]) -> None:
+        """Merge parts into the entry for key, creating it if needed"""
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE: two workers merging into one entry must not lose either's parts
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT expires_at, value FROM result_cache WHERE key = ?", (key,)
+                ).fetchone()
+                value = pickle.loads(row[1]) if row is not None and row[0] >= now else {}
+                value.update(parts)
+                try:
+                    blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception as e:
+                    logger.warning(f"Result not cacheable: {e}")
+                    self._conn.execute("ROLLBACK")
+                    return
+                if len(blob) > self.max_bytes:
+                    self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO result_cache (key, expires_at, used_at, size, value) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, now + self.ttl_seconds, now, len(blob), blob)
+                    )
+                    self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM result_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "size_bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the table fits max_bytes"""
+        excess = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM result_cache").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM result_cache ORDER BY used_at"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM result_cache WHERE key = ?", doomed)
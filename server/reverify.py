@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Bulk offline re-verification of archived submissions
+
+Re-runs PhotoVerificationService over a directory of photos or a manifest
+of submissions across all cores, e.g. after changing score thresholds or
+context verifier ranges. Results are appended to JSONL (or Parquet parts)
+as they finish. The output doubles as the checkpoint: rerunning with the
+same output skips every entry already written, so an interrupted run
+resumes where it stopped.
+
+Usage (from the server directory):
+    python -m reverify PHOTO_DIR --out results.jsonl --task-type tree_planting --lat 40.71 --lng -74.0
+    python -m reverify manifest.jsonl --out results/ --format parquet
+
+Manifest entries (JSONL objects or CSV rows) need a "path", relative to the
+manifest's directory or absolute. Optional fields, falling back to the
+command-line defaults: submission_id, user_id, task_type, lat, lng,
+radius_m, deadline_start, deadline_end, submission_time (ISO 8601).
+"""
+
+import os
+import csv
+import json
+import time
+import hashlib
+import logging
+import argparse
+import statistics
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterator, Set
+
+import numpy as np
+
+from photo_verification import PhotoVerificationService, TaskRequirements
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".heic", ".heif")
+
+# Each pool worker owns one service instance, created by the initializer
+_worker_service: Optional[PhotoVerificationService] = None
+
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    global _worker_service
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker_service = PhotoVerificationService(config)
+    _worker_service.warm_up()
+
+
+def _parse_time(value: Optional[str], default: datetime) -> datetime:
+    """ISO 8601 timestamp as naive local time, which is how EXIF times are read"""
+    if not value:
+        return default
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _json_safe(value: Any) -> Any:
+    """Convert NumPy scalars, datetimes, bytes and tuples for JSON output"""
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return value
+
+
+def _reverify_one(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Verify one manifest entry in a worker and return its output record"""
+    record = {"key": entry["key"], "path": entry["path"], "submission_id": entry.get("submission_id"),
+              "sha256": None}
+    try:
+        start = time.perf_counter()
+        with open(entry["path"], "rb") as f:
+            data = f.read()
+        read_seconds = time.perf_counter() - start
+        record["sha256"] = hashlib.sha256(data).hexdigest()
+
+        if entry.get("lat") is None or entry.get("lng") is None:
+            raise ValueError("No task location (lat/lng) for this entry")
+        submission_time = _parse_time(
+            entry.get("submission_time"), datetime.fromtimestamp(os.path.getmtime(entry["path"]))
+        )
+        task_requirements = TaskRequirements(
+            task_type=entry["task_type"],
+            required_objects=[],
+            location_coordinates=(float(entry["lat"]), float(entry["lng"])),
+            location_radius_meters=float(entry["radius_m"]),
+            deadline_start=_parse_time(entry.get("deadline_start"), datetime.min),
+            deadline_end=_parse_time(entry.get("deadline_end"), datetime.max),
+        )
+
+        result = _worker_service.verify_photo_bytes(
+            data, task_requirements, entry.get("user_id") or "", submission_time, collect_timings=True
+        )
+        record.update({
+            "is_valid": result.is_valid,
+            "score": result.score,
+            "issues": result.issues,
+            "recommendations": result.recommendations,
+            "ai_checks": _json_safe(result.ai_checks),
+            "timings": {"read": read_seconds, **(result.timings or {})},
+            "error": None,
+        })
+    except Exception as e:
+        record.update({"is_valid": False, "score": 0, "issues": [], "recommendations": [],
+                       "ai_checks": {}, "timings": {}, "error": str(e)})
+    return record
+
+
+def iter_entries(source: str, defaults: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Manifest entries, or one entry per image under a directory"""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    yield {**defaults, "path": path, "key": os.path.relpath(path, source)}
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline="") as f:
+        rows = csv.DictReader(f) if source.lower().endswith(".csv") else (
+            json.loads(line) for line in f if line.strip()
+        )
+        for row in rows:
+            entry = {**defaults, **{k: v for k, v in row.items() if v not in (None, "")}}
+            entry["key"] = str(entry.get("submission_id") or entry["path"])
+            entry["path"] = os.path.join(base, entry["path"])
+            yield entry
+
+
+class JsonlOutput:
+    """Appends records to a JSONL file, one line per entry"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def completed_keys(self) -> Set[str]:
+        """Keys already written; drops a partial last line left by a crash"""
+        if not os.path.exists(self.path):
+            return set()
+        keys = set()
+        with open(self.path, "rb+") as f:
+            good_bytes = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    keys.add(json.loads(line)["key"])
+                except (ValueError, KeyError):
+                    break
+                good_bytes += len(line)
+            f.truncate(good_bytes)
+        return keys
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ParquetOutput:
+    """Writes each flush as a new part file in a directory"""
+
+    def __init__(self, directory: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.directory = directory
+        # Fixed schema so parts whose optional columns are all null still match
+        self.schema = pyarrow.schema([
+            ("key", pyarrow.string()),
+            ("path", pyarrow.string()),
+            ("submission_id", pyarrow.string()),
+            ("sha256", pyarrow.string()),
+            ("is_valid", pyarrow.bool_()),
+            ("score", pyarrow.float64()),
+            ("issues", pyarrow.list_(pyarrow.string())),
+            ("recommendations", pyarrow.list_(pyarrow.string())),
+            ("ai_checks", pyarrow.string()),  # JSON
+            ("timings", pyarrow.string()),  # JSON, seconds per stage
+            ("error", pyarrow.string()),
+        ])
+        os.makedirs(directory, exist_ok=True)
+
+    def _parts(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith("part-") and name.endswith(".parquet"))
+
+    def completed_keys(self) -> Set[str]:
+        keys = set()
+        for name in self._parts():
+            keys.update(self.pq.read_table(os.path.join(self.directory, name), columns=["key"])["key"].to_pylist())
+        return keys
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        rows = [{**r, "ai_checks": json.dumps(r["ai_checks"]), "timings": json.dumps(r["timings"])}
+                for r in records]
+        parts = self._parts()
+        number = int(parts[-1][5:10]) + 1 if parts else 0
+        path = os.path.join(self.directory, f"part-{number:05d}.parquet")
+        # Write then rename so a crash never leaves a half-written part behind
+        self.pq.write_table(self.pa.Table.from_pylist(rows, schema=self.schema), path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+
+def summarize(records_done: int, errors: int, elapsed: float, stage_samples: Dict[str, List[float]]) -> str:
+    lines = [
+        f"{records_done} images in {elapsed:.1f}s ({records_done / elapsed if elapsed else 0:.1f} images/s), "
+        f"{errors} errors"
+    ]
+    if stage_samples:
+        total = sum(sum(samples) for samples in stage_samples.values())
+        lines.append(f"{'stage':>20} {'count':>7} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'share':>7}")
+        for stage, samples in sorted(stage_samples.items(), key=lambda item: -sum(item[1])):
+            ordered = sorted(samples)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append(
+                f"{stage:>20} {len(samples):>7} {statistics.mean(samples) * 1000:>9.2f} "
+                f"{statistics.median(samples) * 1000:>8.2f} {p95 * 1000:>8.2f} {sum(samples) / total:>7.1%}"
+            )
+    return "\n".join(lines)
+
+
+def run(args: argparse.Namespace) -> None:
+    defaults = {
+        "task_type": args.task_type,
+        "lat": args.lat,
+        "lng": args.lng,
+        "radius_m": args.radius,
+        "deadline_start": args.deadline_start,
+        "deadline_end": args.deadline_end,
+        "user_id": args.user_id,
+    }
+    output = ParquetOutput(args.out) if args.format == "parquet" else JsonlOutput(args.out)
+    if args.restart and os.path.exists(args.out):
+        if args.format == "parquet":
+            for name in output._parts():
+                os.remove(os.path.join(args.out, name))
+        else:
+            os.remove(args.out)
+    done = output.completed_keys()
+    if done:
+        logger.info(f"Resuming: {len(done)} entries already in {args.out}")
+
+    config = {
+        "result_cache_max_bytes": 0,
+        # Off unless asked for: re-scoring must not add the archive to a live index
+        "hash_index_path": args.hash_index,
+    }
+    workers = args.workers or os.cpu_count() or 1
+    pending_entries = (e for e in iter_entries(args.source, defaults) if e["key"] not in done)
+
+    stage_samples: Dict[str, List[float]] = {}
+    buffer: List[Dict[str, Any]] = []
+    processed = errors = 0
+    last_flush = start = time.perf_counter()
+
+    def flush():
+        nonlocal last_flush
+        if buffer:
+            output.write(buffer)
+            buffer.clear()
+        last_flush = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config,)) as executor:
+        in_flight = set()
+        exhausted = False
+        try:
+            while in_flight or not exhausted:
+                # Keep a bounded window of work so memory stays flat on huge archives
+                while not exhausted and len(in_flight) < workers * 4:
+                    entry = next(pending_entries, None)
+                    if entry is None:
+                        exhausted = True
+                    else:
+                        in_flight.add(executor.submit(_reverify_one, entry))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    buffer.append(record)
+                    processed += 1
+                    if record["error"]:
+                        errors += 1
+                    for stage, seconds in record["timings"].items():
+                        stage_samples.setdefault(stage, []).append(seconds)
+                if len(buffer) >= args.flush_every or time.perf_counter() - last_flush > args.flush_seconds:
+                    flush()
+                    logger.info(f"{processed} verified ({processed / (time.perf_counter() - start):.1f} images/s)")
+        except KeyboardInterrupt:
+            logger.warning("Interrupted; writing finished results so the run can resume")
+            executor.shutdown(wait=False, cancel_futures=True)
+        finally:
+            flush()
+
+    print(summarize(processed, errors, time.perf_counter() - start, stage_samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory of photos, or a .jsonl/.csv manifest")
+    parser.add_argument("--out", required=True, help="JSONL file, or directory of Parquet parts")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--task-type", default="tree_planting")
+    parser.add_argument("--lat", type=float, help="Task latitude for entries without one")
+    parser.add_argument("--lng", type=float, help="Task longitude for entries without one")
+    parser.add_argument("--radius", type=float, default=100, help="Task radius in meters")
+    parser.add_argument("--deadline-start", help="ISO 8601 (default: no lower bound)")
+    parser.add_argument("--deadline-end", help="ISO 8601 (default: no upper bound)")
+    parser.add_argument("--user-id", default="")
+    parser.add_argument("--hash-index", help="Duplicate index to check against (updated with every image)")
+    parser.add_argument("--flush-every", type=int, default=100, help="Records per write")
+    parser.add_argument("--flush-seconds", type=float, default=10, help="Max seconds between writes")
+    parser.add_argument("--restart", action="store_true", help="Discard existing output instead of resuming")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Shared-memory handoff of uploads to verification workers
+The API process copies an upload (or a decoded array) into a shared memory
+segment once and sends the worker a small picklable handle; the worker maps
+the segment and reads it in place instead of unpickling its own copy. The
+pool that creates segments owns them: each is unlinked when its task is
+done, segments held past max_age are reaped and reported as leaks, and the
+multiprocessing resource tracker removes any left behind by a crash
+"""
+
+import os
+import sys
+import time
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SharedSegment:
+    """Picklable handle to one segment; shape and dtype are set for arrays"""
+    name: str
+    size: int
+    shape: Optional[Tuple[int, ...]] = None
+    dtype: Optional[str] = None
+
+
+class SharedUploadPool:
+    """Segments created by this process, keyed by name"""
+
+    def __init__(self, max_age: float = 300.0, prefix: str = "civitas"):
+        self.max_age = max_age
+        self.prefix = f"{prefix}-{os.getpid()}"
+        self._counter = itertools.count()
+        self._segments: Dict[str, Tuple[shared_memory.SharedMemory, float]] = {}
+        self._lock = threading.Lock()
+        # Workers forked after this share the tracker, so their attachments
+        # do not get the segments unlinked when a worker exits
+        resource_tracker.ensure_running()
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    @property
+    def bytes_held(self) -> int:
+        with self._lock:
+            return sum(shm.size for shm, _ in self._segments.values())
+
+    def put(self, data: Union[bytes, bytearray, memoryview]) -> SharedSegment:
+        """Copy an upload into a new segment"""
+        with memoryview(data) as view, view.cast("B") as flat:
+            size = flat.nbytes
+            shm = self._create(size)
+            shm.buf[:size] = flat
+        return SharedSegment(shm.name, size)
+
+    def put_file(self, path: str) -> SharedSegment:
+        """Read a file straight into a new segment"""
+        size = os.path.getsize(path)
+        shm = self._create(size)
+        try:
+            with open(path, "rb") as f, shm.buf[:size] as target:
+                if f.readinto(target) != size:
+                    raise OSError(f"{path} changed size while being read")
+        except BaseException:
+            self.release(SharedSegment(shm.name, size))
+            raise
+        return SharedSegment(shm.name, size)
+
+    def put_array(self, array: np.ndarray) -> SharedSegment:
+        """Copy a decoded array into a new segment"""
+        array = np.ascontiguousarray(array)
+        shm = self._create(array.nbytes)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return SharedSegment(shm.name, array.nbytes, array.shape, array.dtype.str)
+
+    def _create(self, size: int) -> shared_memory.SharedMemory:
+        self.reap()
+        name = f"{self.prefix}-{next(self._counter)}"
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(1, size))
+        with self._lock:
+            self._segments[shm.name] = (shm, time.monotonic())
+        return shm
+
+    def release(self, segment: SharedSegment) -> None:
+        """Unlink a segment once its task is done (unknown names are ignored)"""
+        with self._lock:
+            entry = self._segments.pop(segment.name, None)
+        if entry is not None:
+            _destroy(entry[0])
+
+    def reap(self) -> int:
+        """Unlink segments held longer than max_age, reporting each as a leak"""
+        if not self.max_age:
+            return 0
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            stale = [name for name, (_, created) in self._segments.items() if created < cutoff]
+        for name in stale:
+            logger.warning(f"Shared upload {name} held for over {self.max_age:.0f}s, unlinking it as leaked")
+            self.release(SharedSegment(name, 0))
+        return len(stale)
+
+    def close(self) -> None:
+        """Unlink every remaining segment"""
+        with self._lock:
+            segments = [shm for shm, _ in self._segments.values()]
+            self._segments = {}
+        if segments:
+            logger.warning(f"Unlinking {len(segments)} shared uploads still held at shutdown")
+        for shm in segments:
+            _destroy(shm)
+
+
+def _destroy(shm: shared_memory.SharedMemory) -> None:
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+@contextmanager
+def attach(segment: SharedSegment) -> Iterator[Union[memoryview, np.ndarray]]:
+    """
+    Map a segment for the duration of the block, as a read-only memoryview
+    of the upload or an ndarray for arrays. Drop every reference to it
+    (and to arrays made from it) before the block ends so it is unmapped
+    straight away; otherwise the mapping lives on until the last one goes
+    """
+    shm = _attach(segment.name)
+    view = shm.buf[:segment.size].toreadonly()
+    try:
+        if segment.shape is not None:
+            # asarray holds a buffer export, so the mapping outlives arrays made from it
+            yield np.asarray(view).view(np.dtype(segment.dtype)).reshape(segment.shape)
+        else:
+            yield view
+    finally:
+        del view
+        try:
+            shm.close()
+        except BufferError:
+            logger.warning(f"Shared upload {segment.name} still referenced after use")
+            shm._mmap = None  # unmapped when the last reference goes
+            shm.close()
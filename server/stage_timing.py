@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Per-stage wall-clock timing for a verification
+StageTimings records how long each named stage took, plus a few counters
+(cache hits, decoded pixels); NULL_TIMINGS has the same interface and
+records nothing, so untimed requests only pay for an empty context manager
+per stage
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator
+
+
+class StageTimings:
+    """Seconds spent in each stage of one verification"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, amount: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+
+class _NullTimings:
+    """Stand-in for StageTimings when timing is off"""
+
+    _context = nullcontext()
+
+    @property
+    def stages(self) -> Dict[str, float]:
+        return {}
+
+    @property
+    def counters(self) -> Dict[str, float]:
+        return {}
+
+    def stage(self, name: str) -> nullcontext:
+        return self._context
+
+    def count(self, name: str, amount: float = 1) -> None:
+        pass
+
+
+NULL_TIMINGS = _NullTimings()
@@ -0,0 +1,21 @@
+"""Test setup: the server modules are imported as top-level modules, as the API does"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def bounded():
+    """Run a parser call with a deadline, so a regression fails instead of hanging the suite"""
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    def run(fn, *args, timeout: float = 5.0):
+        return pool.submit(fn, *args).result(timeout=timeout)
+
+    yield run
+    pool.shutdown(wait=False)
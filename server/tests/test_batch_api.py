@@ -0,0 +1,66 @@
+"""A photo that fails inside /verify-multiple-photos gets an error record, in every response mode"""
+
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from photo_verification import VerificationResult
+
+FORM = {"task_type": "tree_planting", "location_lat": "40.7128", "location_lng": "-74.0060",
+        "deadline_start": "2020-01-01T00:00:00", "deadline_end": "2030-01-01T00:00:00", "user_id": "u1"}
+
+
+def jpeg(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+GOOD, BAD = jpeg("green"), jpeg("red")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # The API opens its stores relative to the working directory on import
+    monkeypatch.chdir(tmp_path)
+    import photo_verification_api as api
+    from fastapi.testclient import TestClient
+    monkeypatch.setitem(api.config, "require_gps", False)
+
+    async def verify(data, temp_path, *args, **kwargs):
+        if data == BAD:
+            raise RuntimeError("decoder crashed")
+        return VerificationResult(True, 90.0, [], {}, {}, [], tier="full"), None
+
+    monkeypatch.setattr(api, "_verify_and_watermark", verify)
+    return TestClient(api.app)
+
+
+def post(client, stream=None):
+    files = [("files", (name, data, "image/jpeg")) for name, data in (("a.jpg", GOOD), ("b.jpg", BAD), ("c.jpg", GOOD))]
+    return client.post("/verify-multiple-photos", data={**FORM, **({"stream": stream} if stream else {})}, files=files)
+
+
+def test_failed_photo_does_not_fail_the_batch(client):
+    response = post(client)
+    assert response.status_code == 200
+    body = response.json()
+    results = sorted(body["results"], key=lambda r: r["index"])
+    assert [r.get("error") for r in results] == [None, "Verification failed: decoder crashed", None]
+    assert results[1]["filename"] == "b.jpg"
+    assert body["valid_photos"] == 2
+
+
+@pytest.mark.parametrize("stream", ["ndjson", "sse"])
+def test_failed_photo_does_not_cut_the_stream_short(client, stream):
+    response = post(client, stream)
+    assert response.status_code == 200
+    if stream == "sse":
+        records = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    else:
+        records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["type"] for r in records] == ["result"] * 3 + ["summary"]
+    errors = {r["index"]: r.get("error") for r in records[:3]}
+    assert errors == {0: None, 1: "Verification failed: decoder crashed", 2: None}
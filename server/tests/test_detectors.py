@@ -0,0 +1,121 @@
+"""Circuit breaker transitions and how DetectorClient drives them"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import detectors
+from detectors import CircuitBreaker, DetectorClient, DetectorError, DetectorProvider
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(detectors.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_half_opens_and_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_after=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 29
+    assert not breaker.allow()
+
+
+def test_released_trial_lets_the_next_call_try(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release_trial()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def client_for(handler) -> DetectorClient:
+    provider = DetectorProvider(
+        name="fake", url="http://detector.test/", build_request=lambda data, content_type: {"content": data},
+        parse=lambda body: body, timeout=2.0, hedge_after=None
+    )
+    client = DetectorClient(provider, breaker_failures=1, breaker_reset=30)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_cancelled_trial_does_not_wedge_the_circuit(clock):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(500)
+        if len(calls) == 2:
+            await asyncio.sleep(10)
+        return httpx.Response(200, json={"score": 0.1})
+
+    async def scenario():
+        client = client_for(handler)
+        with pytest.raises(DetectorError):
+            await client.detect(b"image", "image/jpeg")
+        assert client.breaker.state == "open"
+
+        clock.now += 30
+        trial = asyncio.ensure_future(client.detect(b"image", "image/jpeg"))
+        while len(calls) < 2:
+            await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert client.breaker.state == "half_open"
+
+        assert await client.detect(b"image", "image/jpeg") == {"score": 0.1}
+        assert client.breaker.state == "closed"
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_open_circuit_short_circuits(clock):
+    async def handler(request):
+        return httpx.Response(503)
+
+    async def scenario():
+        client = client_for(handler)
+        with pytest.raises(DetectorError):
+            await client.detect(b"image", "image/jpeg")
+        with pytest.raises(DetectorError, match="circuit is open"):
+            await client.detect(b"image", "image/jpeg")
+        assert client.stats["short_circuited"] == 1
+        await client.aclose()
+
+    asyncio.run(scenario())
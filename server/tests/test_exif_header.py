@@ -0,0 +1,97 @@
+"""Header-only EXIF parsing of well-formed and malformed JPEG, PNG and HEIC files"""
+
+import io
+import struct
+
+import piexif
+import pytest
+from PIL import Image
+
+from exif_header import exif_prefix_length, read_box_header, read_exif_header
+
+
+def box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def jpeg_with_gps() -> bytes:
+    exif = piexif.dump({
+        "0th": {piexif.ImageIFD.Make: b"Cam"},
+        "GPS": {
+            piexif.GPSIFD.GPSLatitudeRef: b"N",
+            piexif.GPSIFD.GPSLatitude: ((40, 1), (42, 1), (4608, 100)),
+            piexif.GPSIFD.GPSLongitudeRef: b"W",
+            piexif.GPSIFD.GPSLongitude: ((74, 1), (0, 1), (2160, 100)),
+        },
+    })
+    out = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(out, format="JPEG", exif=exif)
+    return out.getvalue()
+
+
+def heic(meta_children: bytes) -> bytes:
+    ftyp = box(b"ftyp", b"heic\x00\x00\x00\x00mif1heic")
+    return ftyp + box(b"meta", b"\x00\x00\x00\x00" + meta_children)
+
+
+def test_jpeg_gps_is_read():
+    data = jpeg_with_gps()
+    header = read_exif_header(data)
+    assert header.format == "jpeg"
+    assert header.has_gps
+    assert exif_prefix_length(data) is not None
+
+
+def test_jpeg_zero_length_segment_is_rejected(bounded):
+    data = b"\xff\xd8\xff\xe0\x00\x00" + b"\x00" * 64
+    assert bounded(read_exif_header, data) is None
+    assert bounded(exif_prefix_length, data) is not None
+
+
+def test_jpeg_truncated_exif_segment_waits_for_more_bytes():
+    data = jpeg_with_gps()
+    assert exif_prefix_length(data[:40]) is None
+
+
+def test_png_truncated_chunk_gives_no_exif(bounded):
+    data = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4s", 1000, b"tEXt") + b"abc"
+    header = bounded(read_exif_header, data)
+    assert header is None or not header.has_gps
+
+
+@pytest.mark.parametrize("child", [
+    struct.pack(">I4sQ", 1, b"free", 0),  # 64-bit size of 0
+    struct.pack(">I4sQ", 1, b"free", 8),  # 64-bit size smaller than the 16-byte header
+    struct.pack(">I4s", 4, b"free"),  # 32-bit size smaller than the header
+])
+def test_heic_malformed_meta_child_does_not_hang(bounded, child):
+    assert bounded(read_exif_header, heic(child)) is None
+
+
+def test_heic_truncated_meta_child_gives_no_exif(bounded):
+    header = bounded(read_exif_header, heic(struct.pack(">I4s", 1, b"free") + b"\x00\x00"))
+    assert header.format == "heic"
+    assert not header.has_gps
+
+
+def test_heic_malformed_top_level_box_does_not_hang(bounded):
+    data = box(b"ftyp", b"heic\x00\x00\x00\x00") + struct.pack(">I4sQ", 1, b"free", 0)
+    assert bounded(read_exif_header, data) is None
+
+
+def test_box_header_rejects_boxes_smaller_than_their_header():
+    with pytest.raises(ValueError):
+        read_box_header(io.BytesIO(struct.pack(">I4sQ", 1, b"free", 0)))
+    with pytest.raises(ValueError):
+        read_box_header(io.BytesIO(struct.pack(">I4s", 7, b"free")))
+
+
+def test_box_header_truncated_large_size_is_end_of_stream():
+    assert read_box_header(io.BytesIO(struct.pack(">I4s", 1, b"free") + b"\x00")) is None
+
+
+def test_box_header_reads_sizes():
+    stream = io.BytesIO(box(b"moov", b"x" * 10) + struct.pack(">I4sQ", 1, b"mdat", 20) + b"y" * 4)
+    assert read_box_header(stream) == ("moov", 8, 10)
+    stream.seek(18)
+    assert read_box_header(stream) == ("mdat", 34, 4)
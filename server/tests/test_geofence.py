@@ -0,0 +1,129 @@
+"""Grid geofence index against a brute-force geodesic scan, at cell edges, the antimeridian and the poles"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from geofence import GeofenceIndex, distance_m, vincenty_m
+
+geodesic = pytest.importorskip("geopy.distance").geodesic
+
+
+def brute_force(tasks, lats, lons):
+    """(point, task id) pairs inside each geofence by geopy's geodesic, as the API checked before the index"""
+    return {
+        (p, task_id)
+        for p, (lat, lon) in enumerate(zip(lats, lons))
+        for task_id, t_lat, t_lon, radius in tasks
+        if geodesic((lat, lon), (t_lat, t_lon)).meters <= radius
+    }
+
+
+def indexed(index, lats, lons):
+    points, task_ids, _, _ = index.query_batch(lats, lons)
+    return set(zip(points.tolist(), task_ids.tolist()))
+
+
+def ring(tasks, rng, per_task: int = 4):
+    """Points just inside and just outside each geofence, in random directions"""
+    lats, lons = [], []
+    for _, lat, lon, radius in tasks:
+        for factor in (0.995, 1.005) * (per_task // 2):
+            point = geodesic(meters=radius * factor).destination((lat, lon), bearing=rng.uniform(0, 360))
+            lats.append(point.latitude)
+            lons.append(point.longitude)
+    return np.array(lats), np.array(lons)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_index_matches_geodesic_scan(seed):
+    rng = np.random.default_rng(seed)
+    tasks = [
+        (f"t{i}", rng.uniform(-70, 70), rng.uniform(-180, 180), float(rng.choice([30, 100, 750, 5000, 40000])))
+        for i in range(20)
+    ]
+    # Clustered tasks so neighbouring cells, and both radius classes of a cell, hold candidates
+    tasks += [(f"c{i}", 48.85 + rng.normal(0, 0.01), 2.35 + rng.normal(0, 0.01), float(rng.uniform(10, 3000)))
+              for i in range(20)]
+    lats, lons = ring(tasks, rng)
+    index = GeofenceIndex(tasks)
+    assert indexed(index, lats, lons) == brute_force(tasks, lats, lons)
+
+
+def test_grid_cell_edges():
+    # Points walked across a task's cell boundaries in small steps along each axis
+    tasks = [("edge", 0.0, 0.0, 1000.0), ("edge-small", 0.004, 0.004, 200.0)]
+    steps = np.linspace(-0.02, 0.02, 81)
+    lats = np.concatenate([steps, np.zeros_like(steps), steps])
+    lons = np.concatenate([np.zeros_like(steps), steps, steps])
+    assert indexed(GeofenceIndex(tasks), lats, lons) == brute_force(tasks, lats, lons)
+
+
+def test_antimeridian_and_poles():
+    tasks = [
+        ("east", 10.0, 179.9995, 500.0),
+        ("west", -33.0, -179.999, 300.0),
+        ("north", 89.9999, 0.0, 100.0),
+        ("south", -89.9995, 45.0, 200.0),
+    ]
+    lats = np.array([10.0, 10.0, -33.0, 89.9999, 89.9995, -89.9999, 0.0])
+    lons = np.array([-179.9995, -179.99, 179.999, 180.0, -90.0, -135.0, 0.0])
+    index = GeofenceIndex(tasks)
+    assert indexed(index, lats, lons) == brute_force(tasks, lats, lons)
+    assert {(0, "east"), (2, "west"), (3, "north")} <= indexed(index, lats, lons)
+
+
+def test_query_is_nearest_first_with_radii():
+    index = GeofenceIndex([("big", 40.0, -74.0, 5000.0), ("small", 40.001, -74.0, 500.0)])
+    matches = index.query(40.001, -74.0)
+    assert [m.task_id for m in matches] == ["small", "big"]
+    assert [m.radius_m for m in matches] == [500.0, 5000.0]
+    assert matches[1].distance_m == pytest.approx(distance_m(40.001, -74.0, 40.0, -74.0))
+
+
+def test_changes_are_seen_by_the_next_query():
+    index = GeofenceIndex([("a", 0.0, 0.0, 100.0)])
+    assert [m.task_id for m in index.query(0.0, 0.0)] == ["a"]
+    index.add("a", 1.0, 1.0, 100.0)
+    index.add("b", 0.0, 0.0005, 100.0)
+    assert [m.task_id for m in index.query(0.0, 0.0)] == ["b"]
+    index.remove("b")
+    assert index.query(0.0, 0.0) == []
+    assert len(index) == 1
+
+
+def test_invalid_geofences_are_refused():
+    with pytest.raises(ValueError):
+        GeofenceIndex([("bad", 91.0, 0.0, 10.0)])
+    with pytest.raises(ValueError):
+        GeofenceIndex().add("bad", 0.0, 0.0, -1.0)
+
+
+def test_results_stay_consistent_while_tasks_change():
+    # Every reported id and radius must belong to the geofence that matched, even mid-rebuild
+    rng = np.random.default_rng(7)
+    fences = {f"t{i}": (rng.uniform(-1, 1), rng.uniform(-1, 1), float(rng.uniform(1000, 50000))) for i in range(50)}
+    index = GeofenceIndex((task_id, *fence) for task_id, fence in fences.items())
+    lats, lons = rng.uniform(-1, 1, 200), rng.uniform(-1, 1, 200)
+    stop = threading.Event()
+
+    def churn():
+        names = list(fences)
+        while not stop.is_set():
+            task_id = names[rng.integers(len(names))]
+            index.remove(task_id)
+            index.add(task_id, *fences[task_id])
+
+    thread = threading.Thread(target=churn)
+    thread.start()
+    try:
+        for _ in range(10):
+            points, task_ids, distances, radii = index.query_batch(lats, lons)
+            fence_lat, fence_lon, fence_radius = np.array([fences[task_id] for task_id in task_ids]).reshape(-1, 3).T
+            np.testing.assert_array_equal(radii, fence_radius)
+            np.testing.assert_allclose(distances, vincenty_m(lats[points], lons[points], fence_lat, fence_lon))
+            assert (distances <= radii).all()
+    finally:
+        stop.set()
+        thread.join()
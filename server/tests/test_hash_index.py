@@ -0,0 +1,95 @@
+"""Multi-index hashing lookups against a brute-force Hamming scan"""
+
+import numpy as np
+import pytest
+
+from hash_index import PerceptualHashIndex, popcount64
+
+MASK64 = (1 << 64) - 1
+
+
+def flip(value: int, bits, rng) -> int:
+    for position in rng.choice(64, size=bits, replace=False):
+        value ^= 1 << int(position)
+    return value
+
+
+def corpus(rng, count: int = 3000):
+    """Random hashes, near-duplicates of a few query hashes at every distance, and all-ones chunks"""
+    queries = [int(q) for q in rng.integers(0, 1 << 63, size=6, dtype=np.uint64)] + [MASK64, 0, 0xFFFF << 48]
+    hashes = [int(h) for h in rng.integers(0, MASK64, size=count, dtype=np.uint64, endpoint=True)]
+    for query in queries:
+        for distance in range(0, 14):
+            hashes += [flip(query, distance, rng) for _ in range(3)]
+    order = rng.permutation(len(hashes))
+    return [hashes[i] for i in order], queries
+
+
+def brute_force(hashes, query: int, radius: int):
+    distances = popcount64(np.bitwise_xor(np.array(hashes, dtype=np.uint64), np.uint64(query)))
+    return {(row_id, int(d)) for row_id, d in enumerate(distances.tolist(), start=1) if d <= radius}
+
+
+def searched(index, query: int, radius: int):
+    row_ids, distances = index._search(query, radius)
+    assert len(set(row_ids.tolist())) == len(row_ids), "rows found through several chunks must be deduplicated"
+    return set(zip(row_ids.tolist(), distances.tolist()))
+
+
+@pytest.fixture
+def hashes():
+    return corpus(np.random.default_rng(4))
+
+
+@pytest.mark.parametrize("chunks", [2, 4, 8])
+def test_search_equals_brute_force(tmp_path, hashes, chunks):
+    hashes, queries = hashes
+    index = PerceptualHashIndex(str(tmp_path / "hashes.sqlite"), chunks=chunks)
+    index.add_many(np.array([[h, 0, 0] for h in hashes], dtype=np.uint64))
+    # Rebuilt from disk, so every row is in the sorted chunk tables
+    index = PerceptualHashIndex(str(tmp_path / "hashes.sqlite"), chunks=chunks)
+    assert not index._tail_ids
+    for query in queries:
+        for radius in (0, 3, 8, 10):
+            assert searched(index, query, radius) == brute_force(hashes, query, radius)
+
+
+def test_search_covers_tables_and_tail(tmp_path, monkeypatch, hashes):
+    hashes, queries = hashes
+    monkeypatch.setattr(PerceptualHashIndex, "MERGE_THRESHOLD", 500)
+    index = PerceptualHashIndex(str(tmp_path / "hashes.sqlite"))
+    for start in range(0, len(hashes), 700):
+        index.add_many(np.array([[h, 0, 0] for h in hashes[start:start + 700]], dtype=np.uint64))
+    index.add(hashes[0] ^ 1)
+    hashes = hashes + [hashes[0] ^ 1]
+    assert len(index._ids) and index._tail_ids
+    for query in queries + [hashes[0]]:
+        assert searched(index, query, 8) == brute_force(hashes, query, 8)
+
+
+def test_query_returns_closest_first_with_rows(tmp_path):
+    index = PerceptualHashIndex(str(tmp_path / "hashes.sqlite"))
+    base = MASK64  # sign bit set: stored as a negative int64
+    index.add(base ^ 0b111, user_id="far", submission_id="s3")
+    index.add(base, user_id="same", submission_id="s1")
+    index.add(base ^ 0b1, user_id="near", submission_id="s2")
+    index.add(base ^ 0xFFFF, user_id="outside", submission_id="s4")
+    matches = index.query(base)
+    assert [(m.user_id, m.distance) for m in matches] == [("same", 0), ("near", 1), ("far", 3)]
+    assert matches[0].phash == base and matches[0].submission_id == "s1"
+    assert [m.user_id for m in index.query(base, limit=2)] == ["same", "near"]
+    assert index.query(base ^ 0xFFFFFFFF, max_distance=4) == []
+
+
+def test_rows_written_by_another_process_are_found(tmp_path):
+    path = str(tmp_path / "hashes.sqlite")
+    reader = PerceptualHashIndex(path)
+    writer = PerceptualHashIndex(path)
+    writer.add(0x1234_5678_9ABC_DEF0, submission_id="other")
+    assert [m.submission_id for m in reader.query(0x1234_5678_9ABC_DEF1)] == ["other"]
+    assert len(reader) == 1
+
+
+def test_chunks_must_divide_the_hash():
+    with pytest.raises(ValueError):
+        PerceptualHashIndex(":memory:", chunks=5)
@@ -0,0 +1,165 @@
+"""Job leases, retries, callbacks and purging in the durable job queue, and the loops that drive it"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from job_queue import (CALLBACK_FAILED, CALLBACK_PENDING, DONE, FAILED, QUEUED,
+                       RUNNING, JobQueue, QueueFull)
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def queue(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.sqlite"), max_queued=3, lease_seconds=60, max_attempts=3,
+                    max_callback_attempts=2)
+    yield jobs
+    jobs.close()
+
+
+def submit(queue: JobQueue, task_type: str = "tree_planting", priority: int = 0, now: float = NOW, **kwargs) -> str:
+    return queue.submit("photo", task_type, {"user_id": "u"}, None, priority=priority, now=now, **kwargs)
+
+
+def test_claims_highest_priority_then_oldest(queue):
+    first = submit(queue, now=NOW)
+    urgent = submit(queue, priority=5, now=NOW + 1)
+    second = submit(queue, now=NOW + 2)
+    assert [queue.claim(now=NOW + 3).id for _ in range(3)] == [urgent, first, second]
+    assert queue.claim(now=NOW + 3) is None
+
+
+def test_expired_lease_is_claimed_again(queue):
+    job_id = submit(queue)
+    assert queue.claim(now=NOW).attempts == 1
+    assert queue.claim(now=NOW + 59) is None
+    job = queue.claim(now=NOW + 60)
+    assert (job.id, job.status, job.attempts) == (job_id, RUNNING, 2)
+
+
+def test_job_is_abandoned_after_max_attempts_of_expired_leases(queue):
+    job_id = submit(queue)
+    for attempt in range(3):
+        assert queue.claim(now=NOW + attempt * 60).id == job_id
+    assert queue.claim(now=NOW + 180) is None
+    job = queue.get(job_id)
+    assert job.status == FAILED
+    assert "Abandoned after 3 attempts" in job.error
+
+
+def test_failed_attempt_is_retried_with_backoff(queue):
+    job_id = submit(queue)
+    queue.claim(now=NOW)
+    assert queue.fail(job_id, "boom", now=NOW)
+    assert queue.get(job_id).status == QUEUED
+    assert queue.claim(now=NOW + 1) is None  # backoff of 2 s after the first attempt
+    assert queue.claim(now=NOW + 2).id == job_id
+    assert queue.fail(job_id, "boom", now=NOW + 2)
+    assert queue.claim(now=NOW + 5) is None  # 4 s after the second
+    assert queue.claim(now=NOW + 6).id == job_id
+    assert not queue.fail(job_id, "boom again", now=NOW + 6)
+    job = queue.get(job_id)
+    assert (job.status, job.error, job.attempts) == (FAILED, "boom again", 3)
+
+
+def test_release_does_not_use_up_an_attempt(queue):
+    job_id = submit(queue)
+    queue.claim(now=NOW)
+    queue.release(job_id, delay=5, now=NOW)
+    assert queue.claim(now=NOW + 4) is None
+    assert queue.claim(now=NOW + 5).attempts == 1
+
+
+def test_full_queue_refuses_new_jobs_but_not_finished_ones(queue):
+    for _ in range(3):
+        submit(queue)
+    with pytest.raises(QueueFull):
+        submit(queue)
+    done_id = submit(queue, result={"is_valid": False})
+    assert queue.get(done_id).status == DONE
+    assert queue.counts() == {QUEUED: 3, RUNNING: 0, DONE: 1, FAILED: 0}
+
+
+def test_callbacks_are_leased_retried_and_given_up(queue):
+    job_id = submit(queue, callback_url="http://example.test/cb")
+    assert queue.claim_callbacks(now=NOW) == []  # not finished yet
+    queue.claim(now=NOW)
+    queue.complete(job_id, {"is_valid": True}, now=NOW)
+
+    assert [job.id for job in queue.claim_callbacks(now=NOW)] == [job_id]
+    assert queue.claim_callbacks(now=NOW + 59) == []  # leased to the first claimer
+    queue.record_callback(job_id, delivered=False, now=NOW)
+    assert queue.get(job_id).callback_status == CALLBACK_PENDING
+    assert queue.claim_callbacks(now=NOW + 1) == []
+    assert [job.id for job in queue.claim_callbacks(now=NOW + 2)] == [job_id]
+    queue.record_callback(job_id, delivered=False, now=NOW + 2)
+    job = queue.get(job_id)
+    assert (job.callback_status, job.callback_attempts) == (CALLBACK_FAILED, 2)
+
+
+def test_purge_keeps_recent_and_undelivered_jobs(queue, tmp_path):
+    upload = tmp_path / "upload.jpg"
+    upload.write_bytes(b"jpeg")
+    old = queue.submit("photo", "t", {}, str(upload), result={"ok": 1}, now=NOW)
+    recent = submit(queue, result={"ok": 1}, now=NOW + 3000)
+    pending = submit(queue, result={"ok": 1}, callback_url="http://example.test/cb", now=NOW)
+    delivered = submit(queue, result={"ok": 1}, callback_url="http://example.test/cb", now=NOW)
+    queue.record_callback(delivered, delivered=True, now=NOW)
+    unfinished = submit(queue, now=NOW)
+
+    assert queue.purge(3600, now=NOW + 3601) == 2
+    assert queue.get(old) is None and queue.get(delivered) is None
+    assert not upload.exists()
+    assert all(queue.get(job_id) is not None for job_id in (recent, pending, unfinished))
+    assert queue.get(pending).callback_status == CALLBACK_PENDING
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    # The API opens its stores relative to the working directory on import
+    monkeypatch.chdir(tmp_path)
+    import photo_verification_api
+    monkeypatch.setitem(photo_verification_api.config, "job_poll_interval", 0.01)
+    return photo_verification_api
+
+
+class LockedQueue:
+    """Stands in for a JobQueue whose database is locked for the first few calls"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def _call(self, result):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise sqlite3.OperationalError("database is locked")
+        return result
+
+    def claim(self):
+        return self._call(None)
+
+    def claim_callbacks(self):
+        return self._call([])
+
+    def purge(self, older_than_s):
+        return self._call(0)
+
+
+@pytest.mark.parametrize("loop", ["_consume_jobs", "_deliver_callbacks"])
+def test_background_loops_survive_queue_errors(api, monkeypatch, loop):
+    locked = LockedQueue(failures=2)
+    monkeypatch.setattr(api, "_jobs", lambda: locked)
+
+    async def scenario():
+        task = asyncio.create_task(getattr(api, loop)())
+        while locked.calls < 4 and not task.done():
+            await asyncio.sleep(0.01)
+        assert not task.done()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
@@ -0,0 +1,86 @@
+"""Single-pass hashes against the imagehash reference that stored index rows were built with"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+from perceptual_hash import compute_hashes, hash_images
+
+imagehash = pytest.importorskip("imagehash")
+
+
+def scene(width: int, height: int, seed: int, noise: float = 0.0) -> Image.Image:
+    """Gradient sky, ground and a few blurred shapes, deterministic per seed"""
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 1, height)[:, None, None]
+    pixels = np.broadcast_to(np.array([90, 140, 220]) * (1 - y) + np.array([200, 220, 240]) * y, (height, width, 3))
+    image = Image.fromarray(pixels.astype(np.uint8))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, height * 2 // 3, width, height), fill=(70, 110, 50))
+    for _ in range(8):
+        x0, y0 = rng.integers(0, width), rng.integers(0, height)
+        size = rng.integers(min(width, height) // 16 + 1, min(width, height) // 3 + 2)
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        draw.ellipse((x0, y0, x0 + size, y0 + size), fill=color)
+    image = image.filter(ImageFilter.GaussianBlur(max(1, min(width, height) // 100)))
+    if noise:
+        pixels = np.asarray(image, dtype=np.float64) + rng.normal(0, noise, (height, width, 3))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+
+def reference(image: Image.Image):
+    return tuple(int(str(fn(image)), 16) for fn in (imagehash.phash, imagehash.dhash, imagehash.whash))
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+SIZES = [(640, 480), (1632, 1224), (1224, 1632), (3000, 2000), (333, 777)]
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("seed,noise", [(0, 0.0), (1, 6.0), (2, 16.0)])
+def test_hashes_track_imagehash(size, seed, noise):
+    image = scene(*size, seed, noise)
+    phash, dhash, whash = reference(image)
+    hashes = compute_hashes(image)
+    # Resampled exactly as imagehash does; only blocks tying with the median may differ
+    assert distance(hashes.whash, whash) <= 2
+    # pHash and dHash come from the wHash working copy rather than the full frame
+    assert distance(hashes.phash, phash) <= 2
+    assert distance(hashes.dhash, dhash) <= 6
+
+
+@pytest.mark.parametrize("size", [(256, 256), (512, 512), (24, 20), (31, 64)])
+def test_hashes_equal_imagehash_without_a_working_resize(size):
+    # Square power-of-two images are their own working copy; tiny ones are hashed directly
+    image = scene(*size, seed=3, noise=4.0)
+    hashes = compute_hashes(image)
+    assert (hashes.phash, hashes.dhash, hashes.whash) == reference(image)
+
+
+def test_hex_matches_imagehash_format():
+    image = scene(256, 256, seed=3, noise=4.0)
+    assert compute_hashes(image).hex() == {
+        "phash": str(imagehash.phash(image)),
+        "dhash": str(imagehash.dhash(image)),
+        "whash": str(imagehash.whash(image)),
+    }
+
+
+def test_batch_hashes_match_single_hashes():
+    images = [scene(400, 300, seed) for seed in range(3)]
+    encoded = []
+    for image in images:
+        out = io.BytesIO()
+        image.save(out, format="PNG")
+        encoded.append(out.getvalue())
+    hashes, ok = hash_images(encoded + [b"not an image"], workers=2)
+    assert ok.tolist() == [True, True, True, False]
+    for row, image in zip(hashes, images):
+        single = compute_hashes(image)
+        assert tuple(int(v) for v in row) == (single.phash, single.dhash, single.whash)
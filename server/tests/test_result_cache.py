@@ -0,0 +1,52 @@
+"""In-process and SQLite-shared caches of image-only results"""
+
+import pytest
+
+from result_cache import ResultCache, SharedResultCache
+
+
+@pytest.fixture
+def shared(tmp_path):
+    caches = []
+
+    def open_cache(**kwargs):
+        cache = SharedResultCache(str(tmp_path / "result_cache.sqlite"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield open_cache
+    for cache in caches:
+        cache.close()
+
+
+def test_entries_are_seen_by_every_worker(shared):
+    first, second = shared(), shared()
+    assert second.get("abc") is None
+    first.update("abc", {"metadata": {"Make": "Cam"}})
+    second.update("abc", {"context": {"tree_planting": (True, [])}})
+    assert first.get("abc") == {"metadata": {"Make": "Cam"}, "context": {"tree_planting": (True, [])}}
+    assert (first.hits, first.misses, second.hits, second.misses) == (1, 0, 0, 1)
+
+
+def test_least_recently_used_entries_are_evicted(shared):
+    cache = shared(max_bytes=200)
+    for key in ("a", "b", "c"):
+        cache.update(key, {"value": key * 60})
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert cache.size_bytes <= 200
+
+
+def test_expired_entries_miss(shared):
+    cache = shared(ttl_seconds=-1)
+    cache.update("abc", {"metadata": {}})
+    assert cache.get("abc") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("make", [ResultCache, None])
+def test_cached_values_are_copies(shared, make):
+    cache = make() if make is not None else shared()
+    cache.update("abc", {"metadata": {"Make": "Cam"}})
+    cache.get("abc")["metadata"]["Make"] = "Other"
+    assert cache.get("abc")["metadata"]["Make"] == "Cam"
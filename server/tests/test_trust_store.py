@@ -0,0 +1,90 @@
+"""Decayed trust counts and the tier they select"""
+
+import pytest
+
+import trust_store
+from trust_store import FAST, FULL, TrustRecord, TrustStore, choose_tier
+
+DAY = 86400.0
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    trust = TrustStore(str(tmp_path / "trust.sqlite"), half_life_days=10)
+    yield trust
+    trust.close()
+
+
+def test_unknown_user_has_no_counts_and_no_trust(store):
+    record = store.get("new", now=NOW)
+    assert (record.passes, record.failures, record.flags) == (0.0, 0.0, 0.0)
+    assert record.score == 0.0
+
+
+def test_counts_halve_every_half_life(store):
+    for _ in range(8):
+        store.record("u", passed=True, now=NOW)
+    store.record("u", passed=False, duplicate=True, manipulated=True, now=NOW)
+    assert store.get("u", now=NOW + 10 * DAY).passes == pytest.approx(4.0)
+    later = store.get("u", now=NOW + 20 * DAY)
+    assert (later.passes, later.failures, later.duplicates, later.manipulations) == pytest.approx((2.0, 0.25, 0.25, 0.25))
+    # Reading does not decay the stored row twice
+    assert store.get("u", now=NOW + 20 * DAY).passes == pytest.approx(2.0)
+
+
+def test_record_decays_before_adding(store):
+    store.record("u", passed=True, now=NOW)
+    record = store.record("u", passed=True, now=NOW + 10 * DAY)
+    assert record.passes == pytest.approx(1.5)
+    assert store.get("u", now=NOW + 10 * DAY).passes == pytest.approx(1.5)
+
+
+def test_clock_going_backwards_does_not_grow_counts(store):
+    store.record("u", passed=True, now=NOW)
+    assert store.get("u", now=NOW - DAY).passes == pytest.approx(1.0)
+
+
+def test_counts_are_shared_between_store_instances(tmp_path):
+    path = str(tmp_path / "trust.sqlite")
+    first, second = TrustStore(path), TrustStore(path)
+    first.record("u", passed=True, now=NOW)
+    second.record("u", passed=False, now=NOW)
+    record = first.get("u", now=NOW)
+    first.close()
+    second.close()
+    assert (record.passes, record.failures) == (1.0, 1.0)
+
+
+def test_score_weights_flags_and_prior():
+    assert TrustRecord("u", passes=8).score == pytest.approx(8 / 10)
+    assert TrustRecord("u", passes=8, duplicates=1).score == pytest.approx(8 / 15)
+
+
+@pytest.fixture
+def no_audit(monkeypatch):
+    monkeypatch.setattr(trust_store.random, "random", lambda: 0.99)
+
+
+def test_long_clean_history_gets_the_fast_tier(no_audit):
+    assert choose_tier(TrustRecord("u", passes=12)) == FAST
+
+
+@pytest.mark.parametrize("record", [
+    TrustRecord("u", passes=9),  # too few passes
+    TrustRecord("u", passes=12, failures=2),  # score under 0.8
+    TrustRecord("u", passes=40, manipulations=0.5),  # a recent flag
+])
+def test_short_or_flagged_history_gets_full_checks(no_audit, record):
+    assert choose_tier(record) == FULL
+
+
+def test_thresholds_come_from_config(no_audit):
+    config = {"trust_fast_path_min_passes": 3, "trust_fast_path_min_score": 0.5}
+    assert choose_tier(TrustRecord("u", passes=3), config) == FAST
+
+
+def test_trusted_users_are_audited(monkeypatch):
+    monkeypatch.setattr(trust_store.random, "random", lambda: 0.01)
+    assert choose_tier(TrustRecord("u", passes=100)) == FULL
+    assert choose_tier(TrustRecord("u", passes=100), {"trust_audit_rate": 0.0}) == FAST
@@ -0,0 +1,138 @@
+"""Streaming multipart ingestion: early format and EXIF rejection, in memory and spilled to disk"""
+
+import asyncio
+import io
+import os
+import struct
+
+import piexif
+import pytest
+from PIL import Image
+
+from upload_ingest import IngestedFile, UploadIngestor, UploadRejected
+
+BOUNDARY = "test-boundary"
+
+
+def multipart(filename: str, data: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def jpeg(gps: bool, size: int = 256) -> bytes:
+    ifds = {"0th": {piexif.ImageIFD.Make: b"Cam"}}
+    if gps:
+        ifds["GPS"] = {
+            piexif.GPSIFD.GPSLatitudeRef: b"N",
+            piexif.GPSIFD.GPSLatitude: ((40, 1), (42, 1), (4608, 100)),
+            piexif.GPSIFD.GPSLongitudeRef: b"W",
+            piexif.GPSIFD.GPSLongitude: ((74, 1), (0, 1), (2160, 100)),
+        }
+    out = io.BytesIO()
+    Image.effect_noise((size, size), 64).convert("RGB").save(out, format="JPEG", exif=piexif.dump(ifds))
+    return out.getvalue()
+
+
+def mp4() -> bytes:
+    ftyp = b"isom\x00\x00\x02\x00isom"
+    return struct.pack(">I4s", 8 + len(ftyp), b"ftyp") + ftyp + struct.pack(">I4s", 8 + 64, b"mdat") + b"\x00" * 64
+
+
+def require_gps(upload: IngestedFile) -> None:
+    if upload.exif is None or not upload.exif.has_gps:
+        raise UploadRejected(422, "No GPS coordinates found in photo metadata", "missing_gps")
+
+
+def ingest(ingestor: UploadIngestor, filename: str, data: bytes, chunk_size: int):
+    """Feed the upload in chunk_size pieces; returns the form or rejection and how many body bytes were read"""
+    body = multipart(filename, data)
+    sent = [0]
+
+    async def stream():
+        for start in range(0, len(body), chunk_size):
+            sent[0] = start + chunk_size
+            yield body[start:start + chunk_size]
+
+    headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+    try:
+        result = asyncio.run(ingestor.ingest(headers, stream()))
+    except UploadRejected as e:
+        result = e
+    return result, min(sent[0], len(body)), len(body)
+
+
+def photo_ingestor(spill_threshold_bytes: int) -> UploadIngestor:
+    return UploadIngestor(
+        max_file_size=10 * 1024 * 1024,
+        allowed_formats=["jpeg", "png", "heic"],
+        spill_threshold_bytes=spill_threshold_bytes,
+        on_exif=require_gps
+    )
+
+
+@pytest.mark.parametrize("spill_threshold_bytes", [0, 1024 * 1024])
+@pytest.mark.parametrize("chunk_size", [4, 64, 4096])
+def test_non_image_is_rejected_before_the_body_ends(spill_threshold_bytes, chunk_size):
+    result, read, total = ingest(photo_ingestor(spill_threshold_bytes), "notes.jpg", b"plain text, not a photo" * 512, chunk_size)
+    assert isinstance(result, UploadRejected)
+    assert result.reason == "not_an_image"
+    assert read < total
+
+
+@pytest.mark.parametrize("spill_threshold_bytes", [0, 1024 * 1024])
+@pytest.mark.parametrize("chunk_size", [4, 64, 4096])
+def test_missing_gps_is_rejected_before_the_body_ends(spill_threshold_bytes, chunk_size):
+    result, read, total = ingest(photo_ingestor(spill_threshold_bytes), "photo.jpg", jpeg(gps=False), chunk_size)
+    assert isinstance(result, UploadRejected)
+    assert result.reason == "missing_gps"
+    assert read < total
+
+
+@pytest.mark.parametrize("chunk_size", [4, 4096])
+def test_spilled_photo_with_gps_is_accepted(chunk_size):
+    data = jpeg(gps=True)
+    form, _, _ = ingest(photo_ingestor(0), "photo.jpg", data, chunk_size)
+    upload = form.files[0]
+    try:
+        assert upload.format == "jpeg"
+        assert upload.exif.has_gps
+        assert upload.data is None
+        with open(upload.temp_path, "rb") as f:
+            assert f.read() == data
+        assert upload._head is None
+    finally:
+        upload.discard()
+
+
+def test_rejected_spill_leaves_no_temp_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    result, _, _ = ingest(photo_ingestor(0), "photo.jpg", jpeg(gps=False), 4)
+    assert isinstance(result, UploadRejected)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("chunk_size", [4, 4096])
+def test_spilled_video_is_sniffed_from_small_chunks(chunk_size):
+    ingestor = UploadIngestor(max_file_size=1024 * 1024, allowed_formats=["mp4", "mov"], spill_threshold_bytes=0)
+    form, _, _ = ingest(ingestor, "clip.mp4", mp4(), chunk_size)
+    upload = form.files[0]
+    try:
+        assert upload.format == "mp4"
+        assert upload._head is None
+    finally:
+        upload.discard()
+
+    result, read, total = ingest(ingestor, "clip.mp4", jpeg(gps=True), chunk_size)
+    assert isinstance(result, UploadRejected)
+    assert result.reason == "unsupported_format"
+    assert read < total
+
+
+def test_tiny_spilled_file_is_sniffed_at_the_end():
+    ingestor = UploadIngestor(max_file_size=1024, allowed_formats=["jpeg"], spill_threshold_bytes=0)
+    result, _, _ = ingest(ingestor, "tiny.jpg", b"GIF89a", 2)
+    assert isinstance(result, UploadRejected)
+    assert result.reason == "unsupported_format"
@@ -0,0 +1,107 @@
+"""MP4/QuickTime metadata parsing, including malformed and truncated box trees"""
+
+import struct
+
+import pytest
+
+from video_metadata import read_video_metadata
+
+# 2024-01-01 00:00:00 UTC in seconds since 1904
+CREATED = 1704067200 + 2082844800
+
+
+def box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def ftyp(brand: bytes = b"isom") -> bytes:
+    return box(b"ftyp", brand + b"\x00\x00\x02\x00" + brand)
+
+
+def mvhd(duration_s: int = 10, timescale: int = 1000) -> bytes:
+    return box(b"mvhd", b"\x00\x00\x00\x00" + struct.pack(">IIII", CREATED, CREATED, timescale, duration_s * timescale))
+
+
+def xyz(location: str) -> bytes:
+    text = location.encode("latin-1")
+    return box(b"\xa9xyz", struct.pack(">HH", len(text), 0) + text)
+
+
+def apple_meta(items) -> bytes:
+    keys = b"".join(struct.pack(">I4s", 8 + len(name), b"mdta") + name for name, _ in items)
+    ilst = b"".join(
+        box(struct.pack(">I", i + 1), box(b"data", b"\x00\x00\x00\x01\x00\x00\x00\x00" + value))
+        for i, (_, value) in enumerate(items)
+    )
+    hdlr = box(b"hdlr", b"\x00" * 8 + b"mdta" + b"\x00" * 13)
+    return box(b"meta", hdlr + box(b"keys", b"\x00\x00\x00\x00" + struct.pack(">I", len(items)) + keys) + box(b"ilst", ilst))
+
+
+@pytest.fixture
+def write(tmp_path):
+    def write_file(data: bytes) -> str:
+        path = tmp_path / "clip.mp4"
+        path.write_bytes(data)
+        return str(path)
+    return write_file
+
+
+def test_reads_duration_time_and_location(write):
+    path = write(ftyp() + box(b"moov", mvhd() + box(b"udta", xyz("+40.7128-074.0060/"))) + box(b"mdat", b"\x00" * 32))
+    metadata = read_video_metadata(path)
+    assert metadata.format == "mp4"
+    assert metadata.duration_s == 10
+    assert metadata.created_at is not None
+    assert (metadata.latitude, metadata.longitude) == (40.7128, -74.006)
+
+
+def test_reads_quicktime_keys(write):
+    meta = apple_meta([(b"com.apple.quicktime.location.ISO6709", b"+51.5074-000.1278+010.000/")])
+    metadata = read_video_metadata(write(ftyp(b"qt  ") + box(b"moov", mvhd() + meta)))
+    assert metadata.format == "mov"
+    assert (metadata.latitude, metadata.longitude) == (51.5074, -0.1278)
+
+
+@pytest.mark.parametrize("child", [
+    struct.pack(">I4sQ", 1, b"free", 0),  # size=1 with a 64-bit size of 0
+    struct.pack(">I4sQ", 1, b"free", 12),  # size=1 with a 64-bit size under the 16-byte header
+    struct.pack(">I4s", 4, b"free"),  # 32-bit size under the 8-byte header
+])
+def test_undersized_moov_child_does_not_hang(bounded, write, child):
+    metadata = bounded(read_video_metadata, write(ftyp() + box(b"moov", child)))
+    assert metadata.format == "mp4"
+    assert metadata.created_at is None
+
+
+def test_undersized_top_level_box_does_not_hang(bounded, write):
+    assert bounded(read_video_metadata, write(ftyp() + struct.pack(">I4sQ", 1, b"free", 0))) is None
+
+
+def test_undersized_ilst_item_does_not_hang(bounded, write):
+    hdlr = box(b"hdlr", b"\x00" * 8 + b"mdta" + b"\x00" * 13)
+    keys = box(b"keys", struct.pack(">II", 0, 1) + struct.pack(">I4s", 12, b"mdta") + b"name")
+    meta = box(b"meta", hdlr + keys + box(b"ilst", struct.pack(">I4sQ", 1, b"\x00\x00\x00\x01", 0)))
+    metadata = bounded(read_video_metadata, write(ftyp() + box(b"moov", mvhd() + meta)))
+    assert metadata.duration_s == 10
+    assert metadata.latitude is None
+
+
+def test_zero_sized_keys_with_huge_count_do_not_hang(bounded, write):
+    hdlr = box(b"hdlr", b"\x00" * 8 + b"mdta" + b"\x00" * 13)
+    keys = box(b"keys", struct.pack(">II", 0, 0xFFFFFFFF) + struct.pack(">I4s", 0, b"mdta"))
+    meta = box(b"meta", hdlr + keys + box(b"ilst"))
+    metadata = bounded(read_video_metadata, write(ftyp() + box(b"moov", mvhd() + meta)))
+    assert metadata.duration_s == 10
+
+
+@pytest.mark.parametrize("cut", [12, 20, 30, 40, 60])
+def test_truncated_files_do_not_raise(bounded, write, cut):
+    data = ftyp() + box(b"moov", mvhd() + box(b"udta", xyz("+40.7128-074.0060/")))
+    metadata = bounded(read_video_metadata, write(data[:len(ftyp()) + cut]))
+    assert metadata is None or metadata.format == "mp4"
+
+
+def test_truncated_large_size_is_end_of_file(bounded, write):
+    metadata = bounded(read_video_metadata, write(ftyp() + struct.pack(">I4s", 1, b"moov") + b"\x00\x00"))
+    assert metadata.format == "mp4"
+    assert metadata.duration_s is None
@@ -0,0 +1,68 @@
+"""Background watermark rendering: pixel limits, reduced decodes and status bookkeeping"""
+
+import io
+import logging
+from datetime import datetime
+
+import pytest
+from PIL import Image, ImageFile
+
+import watermark
+from watermark import FAILED, READY, WatermarkQueue
+
+
+def encode(width: int, height: int, format: str) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (40, 120, 60)).save(out, format=format)
+    return out.getvalue()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    watermarks = WatermarkQueue({
+        "watermark_dir": str(tmp_path / "watermarks"),
+        "max_image_pixels": 400 * 400,
+        "watermark_max_pixels": 200 * 200,
+    })
+    yield watermarks
+    watermarks.shutdown()
+
+
+def render(watermarks: WatermarkQueue, data: bytes) -> str:
+    item_id = watermarks.submit("user", datetime(2026, 1, 1), data=data)
+    watermarks.shutdown()  # waits for the queued job
+    return item_id
+
+
+def test_small_upload_keeps_its_size(queue):
+    item_id = render(queue, encode(160, 120, "JPEG"))
+    assert queue.status(item_id) == READY
+    with Image.open(queue.store.path(item_id)) as stored:
+        assert stored.size == (160, 120)
+
+
+@pytest.mark.parametrize("format", ["JPEG", "PNG"])
+def test_large_upload_is_reduced(queue, format):
+    item_id = render(queue, encode(360, 240, format))
+    assert queue.status(item_id) == READY
+    with Image.open(queue.store.path(item_id)) as stored:
+        assert stored.size == (180, 120)
+
+
+def test_upload_over_the_pixel_limit_is_not_decoded(queue, monkeypatch, caplog):
+    def fail_load(self):
+        raise AssertionError("decoded a refused image")
+
+    data = encode(500, 400, "PNG")
+    monkeypatch.setattr(ImageFile.ImageFile, "load", fail_load)
+    with caplog.at_level(logging.WARNING, logger="watermark"):
+        item_id = render(queue, data)
+    assert queue.status(item_id) == FAILED
+    assert not queue.store.exists(item_id)
+    assert "pixel limit" in caplog.text
+
+
+def test_failed_ids_are_bounded(queue, monkeypatch):
+    monkeypatch.setattr(watermark, "MAX_FAILED_IDS", 3)
+    ids = [render(queue, b"not an image " + bytes([i])) for i in range(5)]
+    assert [queue.status(item_id) for item_id in ids] == [None, None, FAILED, FAILED, FAILED]
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Row-band tiling for full-resolution image statistics
+Splits a frame into horizontal bands of about tile_pixels pixels so the
+temporary buffers of ELA, noise and mask classification are the size of
+one band whatever the input resolution. Band edges fall on 8-row JPEG
+block boundaries and filters read a halo of neighbouring rows, so the
+results match the full-frame computation
+"""
+
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# Default working-set budget per band (pixels)
+DEFAULT_TILE_PIXELS = 4 * 1024 * 1024
+JPEG_BLOCK = 8
+
+
+def row_bands(height: int, width: int, tile_pixels: int, align: int = JPEG_BLOCK) -> List[Tuple[int, int]]:
+    """[(top, bottom)) row ranges of at most ~tile_pixels each, tops aligned to align rows"""
+    if height * width <= tile_pixels:
+        return [(0, height)]
+    rows = max(align, tile_pixels // max(1, width) // align * align)
+    return [(top, min(height, top + rows)) for top in range(0, height, rows)]
+
+
+def ela_bands(gray: np.ndarray, quality: int, tile_pixels: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    (top row, |gray - JPEG(gray)|) for each band. Bands are whole rows of
+    JPEG blocks, and grayscale JPEG blocks are coded independently, so the
+    differences equal those of recompressing the full frame
+    """
+    for top, bottom in row_bands(gray.shape[0], gray.shape[1], tile_pixels):
+        band = gray[top:bottom]
+        ok, encoded = cv2.imencode(".jpg", band, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise ValueError(f"JPEG encoding failed at quality {quality}")
+        compressed = cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+        if compressed is None:
+            raise ValueError(f"JPEG decoding failed at quality {quality}")
+        yield top, cv2.absdiff(band, compressed)
+
+
+def blur_residual_mean(gray: np.ndarray, tile_pixels: int, ksize: int = 5) -> float:
+    """Mean of |gray - GaussianBlur(gray)|, blurring each band with a halo of ksize // 2 rows"""
+    height = gray.shape[0]
+    halo = ksize // 2
+    total = 0.0
+    for top, bottom in row_bands(height, gray.shape[1], tile_pixels, align=1):
+        low, high = max(0, top - halo), min(height, bottom + halo)
+        band = gray[low:high]
+        blurred = cv2.GaussianBlur(band, (ksize, ksize), 0)
+        inner = slice(top - low, bottom - low)
+        total += cv2.sumElems(cv2.absdiff(band[inner], blurred[inner]))[0]
+    return total / gray.size
+
+
+class GridMeans:
+    """Per-cell means over a rows x cols grid, accumulated band by band"""
+
+    def __init__(self, height: int, width: int, rows: int, cols: int):
+        self.row_edges = np.linspace(0, height, min(rows, height) + 1).round().astype(np.int64)
+        self.col_edges = np.linspace(0, width, min(cols, width) + 1).round().astype(np.int64)
+        self.sums = np.zeros((len(self.row_edges) - 1, len(self.col_edges) - 1), dtype=np.float64)
+
+    def add(self, top: int, band: np.ndarray) -> None:
+        bottom = top + band.shape[0]
+        for cell_row in range(len(self.row_edges) - 1):
+            start, end = max(top, self.row_edges[cell_row]), min(bottom, self.row_edges[cell_row + 1])
+            if start < end:
+                column_sums = band[start - top:end - top].sum(axis=0, dtype=np.float64)
+                self.sums[cell_row] += np.add.reduceat(column_sums, self.col_edges[:-1])
+
+    def means(self) -> np.ndarray:
+        counts = np.outer(np.diff(self.row_edges), np.diff(self.col_edges))
+        return self.sums / counts
+
+
+def needs_tiling(image: np.ndarray, tile_pixels: Optional[int]) -> bool:
+    """Whether an image is larger than one band (tile_pixels of 0 or None disables tiling)"""
+    return bool(tile_pixels) and image.shape[0] * image.shape[1] > tile_pixels
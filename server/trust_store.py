@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Per-user trust scores for progressive verification strictness
+Each user's passes, failures, duplicates and manipulation flags are kept as
+exponentially decayed counts in SQLite, updated in place from every result,
+so old behaviour fades out and a lookup is a single row read
+"""
+
+import os
+import time
+import random
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Verification tiers
+FAST = "fast"  # EXIF, geofence and perceptual hashes only
+FULL = "full"  # every check
+
+# A duplicate or manipulation flag counts as this many failures
+FLAG_WEIGHT = 5.0
+# Pseudo-failures that keep new users' scores low until they have a history
+PRIOR_FAILURES = 2.0
+
+
+@dataclass
+class TrustRecord:
+    """Decayed counts for one user, as of updated_at"""
+    user_id: str
+    passes: float = 0.0
+    failures: float = 0.0
+    duplicates: float = 0.0
+    manipulations: float = 0.0
+    updated_at: float = 0.0
+
+    @property
+    def flags(self) -> float:
+        return self.duplicates + self.manipulations
+
+    @property
+    def score(self) -> float:
+        """Share of passes, with flags weighted up (0-1, 0 for new users)"""
+        penalties = self.failures + FLAG_WEIGHT * self.flags + PRIOR_FAILURES
+        return self.passes / (self.passes + penalties)
+
+    def decayed(self, now: float, half_life: float) -> "TrustRecord":
+        """The counts as they stand at now"""
+        factor = 0.5 ** (max(0.0, now - self.updated_at) / half_life) if half_life else 1.0
+        return TrustRecord(
+            user_id=self.user_id,
+            passes=self.passes * factor,
+            failures=self.failures * factor,
+            duplicates=self.duplicates * factor,
+            manipulations=self.manipulations * factor,
+            updated_at=now
+        )
+
+
+class TrustStore:
+    """SQLite-backed trust records, safe to share between worker processes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS user_trust (
+            user_id TEXT PRIMARY KEY,
+            passes REAL NOT NULL,
+            failures REAL NOT NULL,
+            duplicates REAL NOT NULL,
+            manipulations REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """
+
+    def __init__(self, db_path: str, half_life_days: float = 30.0):
+        self.db_path = db_path
+        self.half_life = half_life_days * 86400
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit, so updates can take the write lock up front
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(self.SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, user_id: str, now: Optional[float] = None) -> TrustRecord:
+        """The user's decayed counts (all zero for unknown users)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._load(user_id).decayed(now, self.half_life)
+
+    def record(self,
+               user_id: str,
+               passed: bool,
+               duplicate: bool = False,
+               manipulated: bool = False,
+               now: Optional[float] = None) -> TrustRecord:
+        """Decay the user's counts to now and add one verification outcome"""
+        now = time.time() if now is None else now
+        with self._lock:
+            # IMMEDIATE: concurrent workers updating one user must not interleave
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                record = self._load(user_id).decayed(now, self.half_life)
+                record.passes += 1.0 if passed else 0.0
+                record.failures += 0.0 if passed else 1.0
+                record.duplicates += 1.0 if duplicate else 0.0
+                record.manipulations += 1.0 if manipulated else 0.0
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO user_trust "
+                    "(user_id, passes, failures, duplicates, manipulations, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, record.passes, record.failures, record.duplicates,
+                     record.manipulations, record.updated_at)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return record
+
+    def _load(self, user_id: str) -> TrustRecord:
+        row = self._conn.execute(
+            "SELECT passes, failures, duplicates, manipulations, updated_at "
+            "FROM user_trust WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return TrustRecord(user_id=user_id)
+        return TrustRecord(user_id, *row)
+
+
+def choose_tier(record: TrustRecord, config: Dict = None) -> str:
+    """
+    FAST for users with a long, clean recent history, FULL otherwise. A
+    share of fast-path candidates (trust_audit_rate) still get full checks
+    so trusted accounts keep being sampled
+    """
+    config = config or {}
+    trusted = (
+        record.passes >= config.get("trust_fast_path_min_passes", 10)
+        and record.score >= config.get("trust_fast_path_min_score", 0.8)
+        and record.flags < config.get("trust_fast_path_max_flags", 0.5)
+    )
+    if not trusted or random.random() < config.get("trust_audit_rate", 0.05):
+        return FULL
+    return FAST
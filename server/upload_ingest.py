@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Streaming multipart ingestion for photo and video uploads
+Reads the request body chunk by chunk and checks every file as it arrives:
+magic bytes against allowed_formats, the max_file_size cap and, as soon
+as the header is in, the EXIF block. Uploads that cannot pass are rejected
+before the rest of the body (usually the pixel data) has been received
+"""
+
+import os
+import logging
+import tempfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+from exif_header import ExifHeader, exif_prefix_length, read_exif_header
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes needed to tell the formats below apart
+SNIFF_BYTES = 12
+# Give up on finding EXIF before the pixel data after this much header
+EXIF_SCAN_LIMIT = 1024 * 1024
+# Allowance for form fields and multipart framing on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Aliases accepted in allowed_formats
+FORMAT_ALIASES = {"jpg": "jpeg", "jpe": "jpeg", "tif": "tiff", "heif": "heic", "m4v": "mp4", "qt": "mov"}
+
+VIDEO_FORMATS = ("mp4", "mov")
+# Formats whose EXIF exif_prefix_length can place while the upload streams in
+_EARLY_EXIF_FORMATS = ("jpeg", "png")
+# ftyp major brands of MP4-family recordings (QuickTime is "qt  ")
+_MP4_BRANDS = (b"isom", b"iso2", b"iso4", b"iso5", b"iso6", b"mp41", b"mp42", b"avc1",
+               b"M4V ", b"3gp4", b"3gp5", b"3gp6", b"3g2a", b"MSNV", b"XAVC")
+
+
+class UploadRejected(Exception):
+    """An upload that fails a check at ingest, with the HTTP status to answer"""
+
+    def __init__(self, status_code: int, detail: str, reason: str, metadata: Optional[Dict] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.reason = reason
+        self.metadata = metadata or {}  # header metadata read before the rejection
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Image or video format from the file's magic bytes, or None if it is not one we know"""
+    if head[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"hevc", b"mif1", b"msf1", b"avif"):
+        return "avif" if head[8:12] == b"avif" else "heic"
+    if head[4:8] == b"ftyp" and head[8:12] == b"qt  ":
+        return "mov"
+    if head[4:8] == b"ftyp" and head[8:12] in _MP4_BRANDS:
+        return "mp4"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"  # also most camera RAW exports (DNG, CR2, NEF, ARW)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:2] == b"BM":
+        return "bmp"
+    return None
+
+
+def normalize_formats(formats: Iterable[str]) -> List[str]:
+    return sorted({FORMAT_ALIASES.get(f.lower(), f.lower()) for f in formats})
+
+
+@dataclass
+class IngestedFile:
+    """One file part of the upload, held in memory or spilled to a temp file"""
+    field_name: str
+    filename: str
+    content_type: str
+    format: Optional[str] = None
+    size: int = 0
+    exif: Optional[ExifHeader] = None
+    exif_checked: bool = False
+    rejection: Optional[UploadRejected] = None
+    temp_path: Optional[str] = None
+    _buffer: Optional[bytearray] = field(default_factory=bytearray, repr=False)  # bytes once complete
+    _temp_file: Optional[object] = field(default=None, repr=False)
+    _head: Optional[bytearray] = field(default=None, repr=False)  # leading bytes kept after a spill for the header checks
+
+    @property
+    def data(self) -> Optional[bytes]:
+        return self._buffer if self.temp_path is None else None
+
+    @property
+    def upload(self) -> Tuple[Optional[bytes], Optional[str]]:
+        """(bytes, None), or (None, temp_path) when the file spilled to disk"""
+        return self.data, self.temp_path
+
+    def discard(self) -> None:
+        """Drop the contents, deleting any temp file"""
+        self._buffer = None
+        self._head = None
+        if self._temp_file is not None:
+            self._temp_file.close()
+            self._temp_file = None
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+        self.temp_path = None
+
+
+@dataclass
+class IngestedForm:
+    """Text fields and files of a multipart upload"""
+    fields: Dict[str, str]
+    files: List[IngestedFile]
+
+
+class UploadIngestor:
+    """
+    Incremental multipart reader with per-file checks
+
+    With fail_fast (single uploads) the first rejection is raised straight
+    away, so the response goes out while the client is still sending. In
+    batch mode a rejected file is recorded on IngestedFile.rejection, its
+    remaining bytes are skipped and the other files carry on.
+
+    on_exif runs once per file as soon as its EXIF header is known (None
+    when the file has none) and may raise UploadRejected.
+    """
+
+    def __init__(self,
+                 max_file_size: int,
+                 allowed_formats: Iterable[str],
+                 spill_threshold_bytes: int,
+                 max_files: int = 1,
+                 fail_fast: bool = True,
+                 on_exif: Optional[Callable[[IngestedFile], None]] = None):
+        self.max_file_size = max_file_size
+        self.allowed_formats = normalize_formats(allowed_formats)
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self.max_files = max_files
+        self.fail_fast = fail_fast
+        self.on_exif = on_exif
+
+    async def ingest(self, headers, stream) -> IngestedForm:
+        """Read a multipart body from its headers and an async iterator of chunks"""
+        content_type, params = parse_options_header(headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadRejected(400, "Expected a multipart/form-data upload", "not_multipart")
+
+        # Refuse bodies that cannot fit before reading any of them
+        content_length = headers.get("content-length")
+        limit = self.max_file_size * self.max_files + FORM_OVERHEAD_BYTES
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            raise UploadRejected(413, f"Upload exceeds the {self.max_file_size} byte limit", "too_large")
+
+        state = _ParseState(self)
+        parser = MultipartParser(params[b"boundary"], state.callbacks())
+        try:
+            async for chunk in stream:
+                parser.write(chunk)
+            parser.finalize()
+            for upload in state.files:
+                state.finish(upload)
+        except BaseException:
+            for upload in state.files:
+                upload.discard()
+            raise
+        return IngestedForm(fields=state.fields, files=state.files)
+
+
+class _ParseState:
+    """Callbacks for python-multipart and the per-file checks they drive"""
+
+    def __init__(self, ingestor: UploadIngestor):
+        self.ingestor = ingestor
+        self.fields: Dict[str, str] = {}
+        self.files: List[IngestedFile] = []
+        self.current: Optional[IngestedFile] = None
+        self.field_name = ""
+        self.field_value = bytearray()
+        self.header_name = b""
+        self.header_value = b""
+        self.part_headers: Dict[bytes, bytes] = {}
+
+    def callbacks(self) -> Dict[str, Callable]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self.current = None
+        self.part_headers = {}
+        self.field_value = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.part_headers[self.header_name.lower()] = self.header_value
+        self.header_name = b""
+        self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.part_headers.get(b"content-disposition", b""))
+        self.field_name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if b"filename" not in options:
+            return
+        if len(self.files) >= self.ingestor.max_files:
+            raise UploadRejected(413, f"At most {self.ingestor.max_files} files per upload", "too_many_files")
+        self.current = IngestedFile(
+            field_name=self.field_name,
+            filename=options[b"filename"].decode("utf-8", errors="replace"),
+            content_type=self.part_headers.get(b"content-type", b"").decode("latin-1")
+        )
+        self.files.append(self.current)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        upload = self.current
+        if upload is None:
+            if len(self.field_value) + end - start > FORM_OVERHEAD_BYTES:
+                raise UploadRejected(413, f"Form field {self.field_name!r} is too large", "field_too_large")
+            self.field_value += data[start:end]
+            return
+        if upload.rejection is not None:
+            return
+        try:
+            self._append(upload, data[start:end])
+        except UploadRejected as e:
+            self.reject(upload, e)
+
+    def on_part_end(self) -> None:
+        if self.current is None:
+            self.fields[self.field_name] = self.field_value.decode("utf-8", errors="replace")
+        self.current = None
+
+    def reject(self, upload: IngestedFile, rejection: UploadRejected) -> None:
+        upload.discard()
+        if self.ingestor.fail_fast:
+            raise rejection
+        upload.rejection = rejection
+
+    def _append(self, upload: IngestedFile, chunk: bytes) -> None:
+        ingestor = self.ingestor
+        upload.size += len(chunk)
+        if upload.size > ingestor.max_file_size:
+            raise UploadRejected(413, f"File exceeds the {ingestor.max_file_size} byte limit", "too_large")
+
+        if upload._temp_file is not None:
+            upload._temp_file.write(chunk)
+            if upload._head is None:
+                return
+            upload._head += chunk
+            self._check_header(upload, upload._head)
+            if not self._needs_head(upload):
+                upload._head = None
+            return
+        upload._buffer += chunk
+
+        self._check_header(upload, upload._buffer)
+        if len(upload._buffer) > ingestor.spill_threshold_bytes:
+            self._spill(upload)
+
+    def _check_header(self, upload: IngestedFile, head: bytearray) -> None:
+        """Format and EXIF checks on the leading bytes of the file received so far"""
+        if upload.format is None and len(head) >= SNIFF_BYTES:
+            self._check_format(upload, head)
+        if not upload.exif_checked:
+            prefix = exif_prefix_length(head)
+            if prefix is not None:
+                self._check_exif(upload, read_exif_header(head[:prefix]))
+            elif len(head) > EXIF_SCAN_LIMIT:
+                upload.exif_checked = True  # no early answer; verification reads it later
+
+    @staticmethod
+    def _needs_head(upload: IngestedFile) -> bool:
+        """Whether more leading bytes could still settle the format or EXIF checks"""
+        return upload.format is None or (not upload.exif_checked and upload.format in _EARLY_EXIF_FORMATS)
+
+    def _check_format(self, upload: IngestedFile, head: bytes) -> None:
+        upload.format = sniff_format(bytes(head[:SNIFF_BYTES]))
+        allowed = set(self.ingestor.allowed_formats)
+        video = allowed <= set(VIDEO_FORMATS)
+        kind = "video" if video else "image" if not allowed & set(VIDEO_FORMATS) else "file"
+        if upload.format is None:
+            if video:
+                raise UploadRejected(400, "File must be a video", "not_a_video")
+            if kind == "file":
+                raise UploadRejected(400, "File must be an image or a video", "not_media")
+            raise UploadRejected(400, "File must be an image", "not_an_image")
+        if upload.format not in self.ingestor.allowed_formats:
+            raise UploadRejected(
+                415,
+                f"Unsupported {kind} format '{upload.format}'; allowed: {', '.join(self.ingestor.allowed_formats)}",
+                "unsupported_format"
+            )
+
+    def _check_exif(self, upload: IngestedFile, header: Optional[ExifHeader]) -> None:
+        upload.exif_checked = True
+        upload.exif = header
+        if self.ingestor.on_exif is not None:
+            self.ingestor.on_exif(upload)
+
+    def _spill(self, upload: IngestedFile) -> None:
+        suffix = f".{upload.filename.rsplit('.', 1)[-1]}" if "." in upload.filename else ""
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        temp_file.write(upload._buffer)
+        upload._temp_file = temp_file
+        upload.temp_path = temp_file.name
+        # A spill from the first chunks (spill_threshold_bytes 0) still gets the early checks
+        upload._head = upload._buffer if self._needs_head(upload) else None
+        upload._buffer = None
+
+    def finish(self, upload: IngestedFile) -> None:
+        """Checks that need the whole file: tiny files, and EXIF the stream could not place"""
+        if upload._temp_file is not None:
+            upload._temp_file.close()
+            upload._temp_file = None
+        head, upload._head = upload._head, None
+        if upload.rejection is not None:
+            return
+        if upload._buffer is not None:
+            upload._buffer = bytes(upload._buffer)
+        try:
+            if upload.format is None:
+                self._check_format(upload, upload._buffer if upload.temp_path is None else head)
+            if not upload.exif_checked and upload.format not in VIDEO_FORMATS:
+                self._check_exif(upload, read_exif_header(upload.temp_path or upload._buffer))
+        except UploadRejected as e:
+            self.reject(upload, e)
+
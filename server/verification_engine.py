@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Execution backend for photo verification
+Runs the CPU-bound PhotoVerificationService off the event loop in a bounded
+worker pool, with admission control and per-task timeouts. Process workers
+receive in-memory uploads through shared memory rather than pickled bytes
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+
+from photo_verification import PhotoVerificationService, TaskRequirements, VerificationResult
+from shared_uploads import SharedSegment, SharedUploadPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "execution_backend": "process",  # "process" or "thread"
+    "worker_pool_size": os.cpu_count() or 2,
+    "max_queue_depth": 32,  # requests waiting beyond the busy workers
+    "verification_timeout": 30,  # seconds
+    "video_verification_timeout": 120,  # seconds, for verify_video
+    "retry_after_seconds": 5,
+    "warm_up_workers": True,  # preload heavy modules in each worker before traffic
+    "shared_memory_handoff": True,  # process backend: hand uploads over in shared memory
+    "shared_memory_max_age": 300,  # seconds before an unreleased segment is reaped as leaked
+}
+
+# Each pool worker owns one warm service instance, created by the initializer
+_worker_service: Optional[PhotoVerificationService] = None
+
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    """Pool initializer: build the worker's service once"""
+    global _worker_service
+    _worker_service = PhotoVerificationService(config)
+    if config.get("warm_up_workers"):
+        try:
+            _worker_service.warm_up()
+        except Exception as e:
+            logger.warning(f"Worker warm-up failed: {e}")
+
+
+def _worker_ready() -> int:
+    """No-op task used to spawn and warm the workers ahead of traffic"""
+    return os.getpid()
+
+
+def _with_queue_wait(result: VerificationResult, submitted_at: Optional[float], started_at: float) -> VerificationResult:
+    """Add the time the task waited for a worker to its stage timings"""
+    if submitted_at is not None and result.timings is not None:
+        result.timings = {"queue_wait": max(0.0, started_at - submitted_at), **result.timings}
+    return result
+
+
+def _verify_in_worker(image_path: str,
+                      task_requirements: TaskRequirements,
+                      user_id: str,
+                      submission_time: datetime,
+                      collect_timings: bool = False,
+                      submitted_at: Optional[float] = None,
+                      tier: Optional[str] = None) -> VerificationResult:
+    """Run one verification on the worker's service"""
+    started_at = time.time()
+    result = _worker_service.verify_photo(
+        image_path=image_path,
+        task_requirements=task_requirements,
+        user_id=user_id,
+        submission_time=submission_time,
+        collect_timings=collect_timings,
+        tier=tier
+    )
+    return _with_queue_wait(result, submitted_at, started_at)
+
+
+def _verify_bytes_in_worker(data: bytes,
+                            task_requirements: TaskRequirements,
+                            user_id: str,
+                            submission_time: datetime,
+                            collect_timings: bool = False,
+                            submitted_at: Optional[float] = None,
+                            tier: Optional[str] = None) -> VerificationResult:
+    """Run one in-memory verification on the worker's service"""
+    started_at = time.time()
+    result = _worker_service.verify_photo_bytes(
+        data=data,
+        task_requirements=task_requirements,
+        user_id=user_id,
+        submission_time=submission_time,
+        collect_timings=collect_timings,
+        tier=tier
+    )
+    return _with_queue_wait(result, submitted_at, started_at)
+
+
+def _verify_shared_in_worker(segment: SharedSegment,
+                             task_requirements: TaskRequirements,
+                             user_id: str,
+                             submission_time: datetime,
+                             collect_timings: bool = False,
+                             submitted_at: Optional[float] = None,
+                             tier: Optional[str] = None) -> VerificationResult:
+    """Run one verification of an upload in shared memory on the worker's service"""
+    started_at = time.time()
+    result = _worker_service.verify_photo_shared(
+        segment=segment,
+        task_requirements=task_requirements,
+        user_id=user_id,
+        submission_time=submission_time,
+        collect_timings=collect_timings,
+        tier=tier
+    )
+    return _with_queue_wait(result, submitted_at, started_at)
+
+
+def _verify_video_in_worker(video_path: str,
+                            task_requirements: TaskRequirements,
+                            user_id: str,
+                            submission_time: datetime,
+                            collect_timings: bool = False,
+                            submitted_at: Optional[float] = None) -> VerificationResult:
+    """Run one video verification on the worker's service"""
+    started_at = time.time()
+    result = _worker_service.verify_video(
+        video_path=video_path,
+        task_requirements=task_requirements,
+        user_id=user_id,
+        submission_time=submission_time,
+        collect_timings=collect_timings
+    )
+    return _with_queue_wait(result, submitted_at, started_at)
+
+
+class EngineOverloaded(Exception):
+    """Raised when the pool and its queue are full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Verification queue is full")
+        self.retry_after = retry_after
+
+
+class VerificationTimeout(Exception):
+    """Raised when a verification exceeds verification_timeout"""
+
+
+class VerificationEngine:
+    """Bounded worker pool that verifies photos without blocking the event loop"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.backend = self.config["execution_backend"]
+        self.pool_size = max(1, int(self.config["worker_pool_size"]))
+        self.max_queue_depth = max(0, int(self.config["max_queue_depth"]))
+        self.timeout = self.config.get("verification_timeout")
+        self.retry_after = int(self.config["retry_after_seconds"])
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        # Threads share the caller's memory already
+        self.shared_uploads = SharedUploadPool(
+            max_age=self.config["shared_memory_max_age"]
+        ) if self.backend == "process" and self.config["shared_memory_handoff"] else None
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of admitted tasks (running plus queued)"""
+        return self.pool_size + self.max_queue_depth
+
+    @property
+    def in_flight(self) -> int:
+        """Tasks admitted and not yet finished"""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Tasks admitted but waiting for a free worker"""
+        return max(0, self._in_flight - self.pool_size)
+
+    @property
+    def shared_segments(self) -> int:
+        """Uploads currently held in shared memory for the workers"""
+        return len(self.shared_uploads) if self.shared_uploads is not None else 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.backend == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    initializer=_init_worker,
+                    initargs=(self.config,)
+                )
+            elif self.backend == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.pool_size,
+                    initializer=_init_worker,
+                    initargs=(self.config,)
+                )
+            else:
+                raise ValueError(f"Unknown execution backend: {self.backend}")
+        return self._executor
+
+    def start(self) -> None:
+        """Spawn the workers now so the first requests do not pay for it"""
+        executor = self._get_executor()
+        futures = [executor.submit(_worker_ready) for _ in range(self.pool_size)]
+        for future in futures:
+            future.result()
+        logger.info(f"Verification engine started: {self.pool_size} {self.backend} workers")
+
+    def shutdown(self) -> None:
+        """Stop the workers, dropping queued tasks and finishing running ones"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self.shared_uploads is not None:
+            self.shared_uploads.close()
+
+    def admit(self) -> None:
+        """Reserve a slot for one task or raise EngineOverloaded"""
+        if self._in_flight >= self.capacity:
+            raise EngineOverloaded(self.retry_after)
+        self._in_flight += 1
+
+    def release(self) -> None:
+        """Return a slot reserved by admit()"""
+        self._in_flight -= 1
+
+    async def verify_photo(self,
+                           image_path: str,
+                           task_requirements: TaskRequirements,
+                           user_id: str,
+                           submission_time: datetime,
+                           collect_timings: bool = False,
+                           tier: Optional[str] = None) -> VerificationResult:
+        """
+        Verify one photo on the pool, enforcing admission and the timeout.
+        tier, when already chosen, saves the worker its trust lookup
+        """
+        self.admit()
+        return await self._run(
+            _verify_in_worker, image_path, task_requirements, user_id, submission_time,
+            collect_timings, time.time() if collect_timings else None, tier
+        )
+
+    async def verify_photo_bytes(self,
+                                 data: bytes,
+                                 task_requirements: TaskRequirements,
+                                 user_id: str,
+                                 submission_time: datetime,
+                                 collect_timings: bool = False,
+                                 tier: Optional[str] = None) -> VerificationResult:
+        """
+        Verify an in-memory upload on the pool. Process workers read it from
+        shared memory when it can be placed there, otherwise it is pickled
+        """
+        self.admit()
+        segment = self._share(data)
+        if segment is None:
+            return await self._run(
+                _verify_bytes_in_worker, data, task_requirements, user_id, submission_time,
+                collect_timings, time.time() if collect_timings else None, tier
+            )
+        return await self._run(
+            _verify_shared_in_worker, segment, task_requirements, user_id, submission_time,
+            collect_timings, time.time() if collect_timings else None, tier,
+            on_done=lambda: self.shared_uploads.release(segment)
+        )
+
+    async def verify_video(self,
+                           video_path: str,
+                           task_requirements: TaskRequirements,
+                           user_id: str,
+                           submission_time: datetime,
+                           collect_timings: bool = False) -> VerificationResult:
+        """
+        Verify one video file on the pool. It takes one worker like a photo,
+        with the longer video_verification_timeout
+        """
+        self.admit()
+        return await self._run(
+            _verify_video_in_worker, video_path, task_requirements, user_id, submission_time,
+            collect_timings, time.time() if collect_timings else None,
+            timeout=self.config.get("video_verification_timeout", self.timeout)
+        )
+
+    def _share(self, data: bytes) -> Optional[SharedSegment]:
+        if self.shared_uploads is None:
+            return None
+        try:
+            return self.shared_uploads.put(data)
+        except Exception as e:
+            logger.warning(f"Could not place upload in shared memory, sending it pickled: {e}")
+            return None
+
+    async def _run(self,
+                   fn: Callable[..., VerificationResult],
+                   *args,
+                   on_done: Optional[Callable[[], None]] = None,
+                   timeout: Optional[float] = None) -> VerificationResult:
+        """
+        Run an already admitted task, releasing its slot (and calling
+        on_done) when the worker is done. timeout overrides the engine's
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            task = self._get_executor().submit(fn, *args)
+        except Exception:
+            self.release()
+            if on_done is not None:
+                on_done()
+            raise
+        # The slot stays taken until the worker is actually free, even if the
+        # caller has stopped waiting
+        if on_done is not None:
+            task.add_done_callback(lambda _: on_done())
+        task.add_done_callback(lambda _: loop.call_soon_threadsafe(self.release))
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(task)), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            # Succeeds only for tasks still waiting in the queue
+            task.cancel()
+            raise VerificationTimeout(
+                f"Verification exceeded {timeout}s"
+            ) from None
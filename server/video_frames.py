@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Frame sampling and temporal checks for video verification
+Reads a clip through OpenCV's FFmpeg backend keeping only the sampled
+frames. Short gaps are skipped with grab(), which decodes a frame without
+converting or copying it out; gaps longer than seek_after_s are seeked,
+which jumps to the nearest keyframe and decodes forward from there. Only
+the current frame is ever held, so memory does not depend on clip length
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from lazy_imports import lazy_import
+from hash_index import popcount64
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VideoInfo:
+    """Stream properties as the container reports them"""
+    width: int
+    height: int
+    fps: float
+    frame_count: int  # 0 when the container does not say
+    duration_s: Optional[float]
+
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "fps": round(self.fps, 3),
+            "frame_count": self.frame_count,
+            "stream_duration_s": self.duration_s,
+        }
+
+
+@dataclass
+class SampledFrame:
+    """One decoded sample"""
+    index: int  # frame number in the stream
+    timestamp_s: float  # presentation time
+    bgr: np.ndarray
+
+
+class FrameSampler:
+    """
+    Samples a video at one frame every interval_s seconds, stretched so a
+    long clip yields at most max_frames samples
+    """
+
+    def __init__(self,
+                 path: str,
+                 interval_s: float = 1.0,
+                 max_frames: int = 120,
+                 seek_after_s: float = 0.5):
+        self.path = path
+        self._capture = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+        if not self._capture.isOpened():
+            self._capture.release()
+            raise ValueError("Could not open video stream")
+
+        fps = self._capture.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = max(0, int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0))
+        self.info = VideoInfo(
+            width=int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            fps=fps,
+            frame_count=frame_count,
+            duration_s=frame_count / fps if fps > 0 and frame_count else None
+        )
+        self.max_frames = max(1, max_frames)
+        # Assume 30 fps when the container gives no rate
+        rate = fps if fps > 0 else 30.0
+        interval = interval_s
+        if self.info.duration_s:
+            interval = max(interval, self.info.duration_s / self.max_frames)
+        self.step = max(1, round(interval * rate))
+        self.seek_after = max(1, round(seek_after_s * rate))
+        # Frames pulled through grab()/read() and seeks made, for timings counters
+        self.grabbed = 0
+        self.seeks = 0
+
+    def __enter__(self) -> "FrameSampler":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._capture.release()
+
+    def plan(self) -> List[int]:
+        """Frame numbers that will be sampled (open-ended streams: the first max_frames steps)"""
+        last = self.info.frame_count or self.step * self.max_frames
+        return list(range(0, last, self.step))[:self.max_frames]
+
+    def __iter__(self) -> Iterator[SampledFrame]:
+        position = 0  # frame number the next grab() decodes
+        for target in self.plan():
+            gap = target - position
+            if gap > self.seek_after and self._capture.set(cv2.CAP_PROP_POS_FRAMES, target):
+                self.seeks += 1
+                position = target
+            while position < target:
+                if not self._capture.grab():
+                    return
+                self.grabbed += 1
+                position += 1
+            ok, frame = self._capture.read()
+            if not ok:
+                return
+            self.grabbed += 1
+            position += 1
+            timestamp = self._capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if timestamp <= 0 and self.info.fps > 0:
+                timestamp = target / self.info.fps
+            yield SampledFrame(index=target, timestamp_s=timestamp, bgr=frame)
+
+
+def temporal_consistency(phashes: List[int],
+                         timestamps: List[float],
+                         cut_distance: int = 24) -> Dict[str, Any]:
+    """
+    Continuity of consecutive samples: a cut is a pHash jump of more than
+    cut_distance bits (the scene changed between two samples of what
+    should be one take) or a timestamp that does not move forward (the
+    stream was stitched). consistency is the share of continuous steps
+    """
+    if len(phashes) < 2:
+        return {"cuts": [], "distances": [], "consistency": 1.0}
+    values = np.array(phashes, dtype=np.uint64)
+    distances = popcount64(np.bitwise_xor(values[1:], values[:-1]))
+    backwards = np.diff(np.array(timestamps, dtype=np.float64)) <= 0
+    breaks = (distances > cut_distance) | backwards
+    return {
+        "cuts": [round(timestamps[i + 1], 3) for i in np.flatnonzero(breaks)],
+        "distances": distances.tolist(),
+        "consistency": float(1.0 - breaks.mean()),
+    }
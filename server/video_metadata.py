@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Capture metadata of MP4 / QuickTime videos
+Walks the ISOBMFF box tree for the creation time, duration and recording
+location that phones write into the moov box (the video equivalent of
+EXIF). Only box headers and the moov payload are read, never the media
+data, so the cost does not grow with the clip's length
+"""
+
+import io
+import re
+import struct
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from exif_header import read_box_header
+
+logger = logging.getLogger(__name__)
+
+# Seconds between the QuickTime epoch (1904-01-01) and the Unix epoch
+_QUICKTIME_EPOCH_OFFSET = 2082844800
+# Top-level boxes to step over before giving up on finding moov
+_MAX_TOP_LEVEL_BOXES = 64
+# Children of one box (and QuickTime metadata keys) read before giving up
+_MAX_CHILD_BOXES = 256
+# A moov box this large is not a phone recording's; refuse to load it
+MAX_MOOV_BYTES = 32 * 1024 * 1024
+
+# Decimal-degree ISO 6709 position as phones write it, e.g. "+40.7128-074.0060+010.0/"
+_ISO6709 = re.compile(r"([+-]\d{1,2}(?:\.\d+)?)([+-]\d{1,3}(?:\.\d+)?)")
+
+_APPLE_LOCATION_KEY = "com.apple.quicktime.location.ISO6709"
+_APPLE_CREATION_KEY = "com.apple.quicktime.creationdate"
+
+
+@dataclass
+class VideoMetadata:
+    """Capture fields of one video; None where the container has none"""
+    format: str
+    created_at: Optional[datetime] = None  # naive local time, like EXIF DateTime
+    duration_s: Optional[float] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Metadata in the shape the photo checks read ("DateTime", "GPS_Decimal")"""
+        metadata: Dict[str, Any] = {"format": self.format}
+        if self.created_at is not None:
+            metadata["DateTime"] = self.created_at
+        if self.duration_s is not None:
+            metadata["duration_s"] = self.duration_s
+        if self.latitude is not None and self.longitude is not None:
+            metadata["GPS_Decimal"] = {"latitude": self.latitude, "longitude": self.longitude}
+        return metadata
+
+
+def read_video_metadata(source: str) -> Optional[VideoMetadata]:
+    """Metadata of an MP4 or QuickTime file, None when it is not one or is malformed"""
+    try:
+        with open(source, "rb") as stream:
+            head = stream.read(12)
+            if head[4:8] != b"ftyp":
+                return None
+            stream.seek(0)
+            moov = _load_moov(stream)
+    except (struct.error, ValueError, OSError) as e:
+        logger.warning(f"Malformed video header: {e}")
+        return None
+
+    metadata = VideoMetadata(format="mov" if head[8:12] == b"qt  " else "mp4")
+    if moov is None:
+        return metadata
+    try:
+        _parse_moov(moov, metadata)
+    except (struct.error, ValueError, IndexError) as e:
+        logger.warning(f"Malformed video metadata: {e}")
+    return metadata
+
+
+def _load_moov(stream: BinaryIO) -> Optional[bytes]:
+    """Payload of the top-level moov box, wherever it sits relative to mdat"""
+    for _ in range(_MAX_TOP_LEVEL_BOXES):
+        position = stream.tell()
+        box = read_box_header(stream)
+        if box is None:
+            return None
+        box_type, payload_start, payload_size = box
+        if box_type == "moov":
+            if payload_size > MAX_MOOV_BYTES:
+                raise ValueError(f"moov box of {payload_size} bytes")
+            return stream.read(payload_size)
+        _advance(stream, position, payload_start + payload_size)
+    return None
+
+
+def _children(payload: bytes) -> Dict[str, bytes]:
+    """Child boxes of a container payload by type (first of each)"""
+    stream = io.BytesIO(payload)
+    children: Dict[str, bytes] = {}
+    for _ in range(_MAX_CHILD_BOXES):
+        position = stream.tell()
+        if position >= len(payload):
+            break
+        box = read_box_header(stream)
+        if box is None:
+            break
+        box_type, payload_start, payload_size = box
+        children.setdefault(box_type, payload[payload_start:payload_start + payload_size])
+        _advance(stream, position, payload_start + payload_size)
+    return children
+
+
+def _advance(stream: BinaryIO, position: int, next_position: int) -> None:
+    """Seek to the next box, refusing to go back to or before the current one"""
+    if next_position <= position:
+        raise ValueError(f"Box at offset {position} does not advance")
+    stream.seek(next_position)
+
+
+def _parse_moov(moov: bytes, metadata: VideoMetadata) -> None:
+    boxes = _children(moov)
+    if "mvhd" in boxes:
+        created, metadata.duration_s = _parse_mvhd(boxes["mvhd"])
+        metadata.created_at = created
+    if "udta" in boxes:
+        xyz = _children(boxes["udta"]).get("\xa9xyz")
+        if xyz is not None:
+            # 16-bit string length and language code, then the text
+            (length,) = struct.unpack_from(">H", xyz)
+            _set_location(metadata, xyz[4:4 + length].decode("latin-1"))
+    if "meta" in boxes:
+        apple = _apple_metadata(boxes["meta"])
+        if _APPLE_LOCATION_KEY in apple:
+            _set_location(metadata, apple[_APPLE_LOCATION_KEY])
+        if _APPLE_CREATION_KEY in apple:
+            # Local capture time with its UTC offset, preferred over the UTC mvhd time
+            try:
+                created = datetime.fromisoformat(apple[_APPLE_CREATION_KEY])
+                metadata.created_at = created.astimezone().replace(tzinfo=None) if created.tzinfo else created
+            except ValueError:
+                pass
+
+
+def _parse_mvhd(mvhd: bytes) -> Tuple[Optional[datetime], Optional[float]]:
+    """(creation time as naive local time, duration in seconds)"""
+    if mvhd[0] == 1:
+        created, _, timescale, duration = struct.unpack_from(">QQIQ", mvhd, 4)
+    else:
+        created, _, timescale, duration = struct.unpack_from(">IIII", mvhd, 4)
+    created_at = None
+    # Encoders that do not know the time write 0 (1904)
+    if created > _QUICKTIME_EPOCH_OFFSET:
+        utc = datetime.fromtimestamp(created - _QUICKTIME_EPOCH_OFFSET, tz=timezone.utc)
+        created_at = utc.astimezone().replace(tzinfo=None)
+    return created_at, (duration / timescale if timescale else None)
+
+
+def _apple_metadata(meta: bytes) -> Dict[str, str]:
+    """String values of a QuickTime meta box (keys + ilst), by key name"""
+    # ISO meta boxes are FullBoxes; QuickTime ones start straight with hdlr
+    if meta[4:8] != b"hdlr":
+        meta = meta[4:]
+    boxes = _children(meta)
+    if "keys" not in boxes or "ilst" not in boxes:
+        return {}
+
+    keys = boxes["keys"]
+    (count,) = struct.unpack_from(">I", keys, 4)
+    names = []
+    pos = 8
+    for _ in range(min(count, _MAX_CHILD_BOXES)):
+        size, _namespace = struct.unpack_from(">I4s", keys, pos)
+        if size < 8:
+            raise ValueError(f"QuickTime metadata key of {size} bytes")
+        names.append(keys[pos + 8:pos + size].decode("utf-8", errors="replace"))
+        pos += size
+
+    values = {}
+    stream = io.BytesIO(boxes["ilst"])
+    for _ in range(_MAX_CHILD_BOXES):
+        position = stream.tell()
+        box = read_box_header(stream)
+        if box is None:
+            break
+        item_type, payload_start, payload_size = box
+        # ilst items are typed by the 1-based key index
+        index = int.from_bytes(item_type.encode("latin-1"), "big") - 1
+        data = _children(boxes["ilst"][payload_start:payload_start + payload_size]).get("data")
+        # data: type indicator and locale, then the value; type 1 is UTF-8
+        if data is not None and 0 <= index < len(names) and data[:4] == b"\x00\x00\x00\x01":
+            values[names[index]] = data[8:].decode("utf-8", errors="replace")
+        _advance(stream, position, payload_start + payload_size)
+    return values
+
+
+def _set_location(metadata: VideoMetadata, iso6709: str) -> None:
+    match = _ISO6709.match(iso6709.strip())
+    if match is None:
+        return
+    latitude, longitude = float(match.group(1)), float(match.group(2))
+    if abs(latitude) <= 90 and abs(longitude) <= 180:
+        metadata.latitude, metadata.longitude = latitude, longitude
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Background watermarking of verified uploads
+Watermarks are rendered off the request path by a small thread pool and
+written to a content-addressed directory: the ID is the SHA-256 of the
+upload bytes and the watermark text, so it is known before rendering
+starts and resubmitting the same photo reuses the stored file
+"""
+
+import os
+import io
+import math
+import queue
+import hashlib
+import logging
+import warnings
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# Tried in order; the first one Pillow can open is used for every size
+FONT_CANDIDATES = (
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "arial.ttf",
+    "Arial.ttf",
+)
+
+# Text height as a fraction of the image's shorter side, within these bounds
+TEXT_SCALE = 0.025
+MIN_FONT_SIZE = 10
+MAX_FONT_SIZE = 160
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+# Failed watermark IDs remembered for status lookups, oldest forgotten first
+MAX_FAILED_IDS = 1024
+
+
+def watermark_text(user_id: str, timestamp: datetime) -> str:
+    return f"User: {user_id} | {timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+def watermark_id(source_digest: str, text: str) -> str:
+    """Content address of a watermarked upload"""
+    return hashlib.sha256(f"{source_digest}\n{text}".encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _font_path(candidates: Tuple[str, ...] = FONT_CANDIDATES) -> Optional[str]:
+    for candidate in candidates:
+        try:
+            ImageFont.truetype(candidate, MIN_FONT_SIZE)
+            return candidate
+        except OSError:
+            continue
+    logger.warning("No TrueType font found for watermarks, using Pillow's default font")
+    return None
+
+
+@lru_cache(maxsize=32)
+def get_font(size: int) -> ImageFont.ImageFont:
+    """Watermark font at this pixel size, loaded once per size"""
+    path = _font_path()
+    if path is not None:
+        return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single bitmap size
+        return ImageFont.load_default()
+
+
+def font_size_for(width: int, height: int) -> int:
+    """Font size scaled to the image, rounded to even sizes to keep the font cache small"""
+    size = int(min(width, height) * TEXT_SCALE) & ~1
+    return max(MIN_FONT_SIZE, min(MAX_FONT_SIZE, size))
+
+
+def render_overlay(text: str, font_size: int) -> Image.Image:
+    """
+    RGBA tile holding the watermark text on a semi-transparent background,
+    sized to the text rather than the image
+    """
+    font = get_font(font_size)
+    padding = max(2, font_size // 4)
+    left, top, right, bottom = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0, 0), text, font=font)
+    tile = Image.new("RGBA", (right - left + 2 * padding, bottom - top + 2 * padding), (0, 0, 0, 128))
+    ImageDraw.Draw(tile).text((padding - left, padding - top), text, fill=(255, 255, 255, 255), font=font)
+    return tile
+
+
+def apply_watermark(image: Image.Image, text: str) -> Image.Image:
+    """
+    Composite the watermark into the bottom-right corner of image, in place
+    where the mode allows it. Only the tile-sized region is blended
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    tile = render_overlay(text, font_size_for(*image.size))
+    margin = max(4, tile.height // 2)
+    x = max(0, image.width - tile.width - margin)
+    y = max(0, image.height - tile.height - margin)
+    box = (x, y, min(image.width, x + tile.width), min(image.height, y + tile.height))
+    region = image.crop(box).convert("RGBA")
+    region.alpha_composite(tile.crop((0, 0, box[2] - x, box[3] - y)))
+    image.paste(region.convert("RGB"), box[:2])
+    return image
+
+
+class WatermarkStore:
+    """Watermarked JPEGs under directory/ab/<id>.jpg"""
+
+    def __init__(self, directory: str, quality: int = 90):
+        self.directory = directory
+        self.quality = quality
+
+    @staticmethod
+    def valid_id(item_id: str) -> bool:
+        return len(item_id) == 64 and all(c in "0123456789abcdef" for c in item_id)
+
+    def path(self, item_id: str) -> str:
+        return os.path.join(self.directory, item_id[:2], f"{item_id}.jpg")
+
+    def exists(self, item_id: str) -> bool:
+        return os.path.exists(self.path(item_id))
+
+    def save(self, item_id: str, image: Image.Image) -> str:
+        """Write atomically, so readers never see a partial file"""
+        path = self.path(item_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            image.save(temp_path, format="JPEG", quality=self.quality)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        return path
+
+
+class WatermarkQueue:
+    """
+    Bounded queue of watermark jobs rendered by daemon threads
+
+    Jobs take either the upload bytes or a spool file the queue owns and
+    deletes once the job is done. When the queue is full new jobs are
+    dropped with a warning rather than slowing the caller down.
+
+    Images over max_image_pixels are never decoded (the service refuses
+    them too), and ones over watermark_max_pixels are watermarked at a
+    reduced size, decoded that way where the format allows it.
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.store = WatermarkStore(
+            config.get("watermark_dir", "data/watermarks"),
+            quality=config.get("watermark_quality", 90)
+        )
+        self.workers = max(1, int(config.get("watermark_workers", 1)))
+        self.max_image_pixels = config.get("max_image_pixels", 120_000_000)
+        self.max_pixels = config.get("watermark_max_pixels", 24_000_000)
+        self.spool_dir = os.path.join(self.store.directory, "spool")
+        self._jobs: "queue.Queue" = queue.Queue(maxsize=max(1, int(config.get("watermark_max_pending", 64))))
+        self._pending = set()
+        self._failed: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    @property
+    def pending(self) -> int:
+        return self._jobs.qsize()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"watermark-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the threads after the jobs already queued"""
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def submit(self,
+               user_id: str,
+               timestamp: datetime,
+               data: Union[bytes, bytearray, memoryview, None] = None,
+               path: Optional[str] = None) -> Optional[str]:
+        """
+        Queue a watermark for an upload held in memory (data) or on disk
+        (path, which is linked into the queue's spool so the caller may
+        delete it straight away). Returns the watermark ID, or None when the
+        job was dropped. Hashes the upload, so call it off the event loop
+        """
+        text = watermark_text(user_id, timestamp)
+        digest = _sha256_file(path) if data is None else hashlib.sha256(data).hexdigest()
+        item_id = watermark_id(digest, text)
+
+        with self._lock:
+            if item_id in self._pending or self.store.exists(item_id):
+                return item_id
+            self._pending.add(item_id)
+            self._failed.pop(item_id, None)
+
+        source = data if data is not None else self._spool(path, item_id)
+        try:
+            self._jobs.put_nowait((item_id, text, source))
+        except queue.Full:
+            logger.warning(f"Watermark queue full, dropping watermark {item_id}")
+            with self._lock:
+                self._pending.discard(item_id)
+            if isinstance(source, str):
+                _unlink(source)
+            return None
+        self.start()
+        return item_id
+
+    def status(self, item_id: str) -> Optional[str]:
+        """PENDING, READY, FAILED, or None for an unknown ID"""
+        if self.store.exists(item_id):
+            return READY
+        with self._lock:
+            if item_id in self._pending:
+                return PENDING
+            return FAILED if item_id in self._failed else None
+
+    def _spool(self, path: str, item_id: str) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        spool_path = os.path.join(self.spool_dir, item_id)
+        try:
+            os.link(path, spool_path)
+        except OSError:  # different filesystem, or links unsupported
+            with open(path, "rb") as src, open(spool_path, "wb") as dst:
+                while chunk := src.read(1024 * 1024):
+                    dst.write(chunk)
+        return spool_path
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            item_id, text, source = job
+            try:
+                self._render(item_id, text, source)
+                failed = False
+            except Exception as e:
+                logger.warning(f"Could not add watermark {item_id}: {e}")
+                failed = True
+            finally:
+                if isinstance(source, str):
+                    _unlink(source)
+            with self._lock:
+                # Stored files are found on disk; only failures need remembering
+                self._pending.discard(item_id)
+                if failed:
+                    self._failed[item_id] = None
+                    while len(self._failed) > MAX_FAILED_IDS:
+                        self._failed.popitem(last=False)
+
+    def _render(self, item_id: str, text: str, source: Union[bytes, str]) -> None:
+        with warnings.catch_warnings():
+            # The pixel limits below are checked from the header before decoding
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(source) if not isinstance(source, str) else source)
+        with image:
+            width, height = image.size
+            if self.max_image_pixels and width * height > self.max_image_pixels:
+                raise ValueError(f"{width}x{height} image is over the {self.max_image_pixels} pixel limit")
+            self.store.save(item_id, apply_watermark(_reduced(image, self.max_pixels), text))
+
+
+def _reduced(image: Image.Image, max_pixels: Optional[int]) -> Image.Image:
+    """
+    image brought within max_pixels by the smallest power-of-two factor:
+    JPEGs by DCT scaling in the decoder (Image.draft), others after decoding
+    """
+    width, height = image.size
+    factor = 1
+    while max_pixels and width * height > max_pixels * factor * factor:
+        factor *= 2
+    if factor == 1:
+        return image
+    image.draft("RGB", (math.ceil(width / factor), math.ceil(height / factor)))
+    remaining = factor * image.size[0] // width
+    return image.reduce(remaining) if remaining > 1 else image
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass